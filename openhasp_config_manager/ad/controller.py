@@ -1,4 +1,3 @@
-import asyncio
 import traceback
 from typing import Dict, TYPE_CHECKING, Any
 
@@ -58,6 +57,8 @@ class OpenHaspController(ADAPI):
             self._lwt_task.cancel()
             self._lwt_task = None
         await self.teardown_plate_setup()
+        # release the connections to the plate and its MQTT broker
+        await self.plate_controller.client.close()
 
     async def teardown_plate_setup(self):
         self.state_updater.clear()
@@ -79,8 +80,7 @@ class OpenHaspController(ADAPI):
         timeout = 10
 
         # ensure the plate is online
-        loop = asyncio.get_event_loop()
-        res = await loop.run_in_executor(None, self.__online_check)
+        res = await self.__online_check()
         if not res:
             self.log(f"Plate '{self._name}' is not online yet, retrying in {timeout}...")
             await util_ad_timer.schedule(self, PLATE_SETUP_TIMER, self.__failsafe_plate_setup, timeout)
@@ -100,9 +100,9 @@ class OpenHaspController(ADAPI):
             self.log(f"Failed to setup plate '{self._name}', retrying in {timeout}: {type(ex)}: {ex} {tb}", level="ERROR")
             # await util_ad_timer.schedule(self, PLATE_SETUP_TIMER, self.__failsafe_plate_setup, timeout)
 
-    def __online_check(self) -> bool:
+    async def __online_check(self) -> bool:
         try:
-            self.plate_controller.client.get_files()
+            await self.plate_controller.client.get_files_async()
             return True
         except Exception:
             return False
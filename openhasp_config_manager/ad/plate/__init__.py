@@ -220,7 +220,7 @@ class PlateController:
         """
         Reboots the device
         """
-        return self.client.reboot()
+        return await self.client.reboot_async()
 
     async def wakeup(self):
         """
@@ -252,7 +252,7 @@ class PlateController:
             invert=None,
             calibration=None,
         )
-        self.client.set_gui_config(gui_config)
+        await self.client.set_gui_config_async(gui_config)
 
     async def set_gui_config(
         self, idle1: int = None, idle2: int = None, rotate: int = None, cursor: int = None, bckl: int = None
@@ -1,3 +1,4 @@
+import asyncio
 from pathlib import Path
 
 from appdaemon import ADAPI
@@ -45,14 +46,16 @@ class DeploymentController:
         """
         self.app.log(f"DEPLOY: Deploying configuration of {self.device.name}...")
 
-        devices = self._config_manager.analyze()
+        # analyzing, processing and uploading are blocking, so they run in a thread to keep the event loop
+        # (and MQTT handling) responsive
+        devices = await asyncio.to_thread(self._config_manager.analyze)
         device_names = list(map(lambda x: x.name, devices))
         self.app.log(f"DEPLOY: Analysis finished, found: {', '.join(device_names)}, processing...")
         self.device = next(filter(lambda x: x.name == self._name, devices))
         self.app.log(f"DEPLOY: Device is: {self.device.name}, processing...")
-        self._config_manager.process(self.device)
+        await asyncio.to_thread(self._config_manager.process, self.device)
         self.app.log(f"DEPLOY: Finished processing {self.device.name}, uploading files...")
-        changed = self._uploader.upload(self.device, purge, show_diff)
+        changed = await asyncio.to_thread(self._uploader.upload, self.device, purge, show_diff)
         self.app.log(f"DEPLOY: {self.device.name} Done! Changed: {changed}")
         return changed
 
@@ -1,20 +1,9 @@
-import asyncio
 from pathlib import Path
 
 import click
 
-from openhasp_config_manager.cli.cmd import c_cmd
-from openhasp_config_manager.cli.deploy import c_deploy
-from openhasp_config_manager.cli.generate import c_generate
-from openhasp_config_manager.cli.gui import c_gui
-from openhasp_config_manager.cli.listen import c_listen
-from openhasp_config_manager.cli.logs import c_logs
-from openhasp_config_manager.cli.screenshot import c_screenshot
-from openhasp_config_manager.cli.shell import c_shell
-from openhasp_config_manager.cli.state import c_state
-from openhasp_config_manager.cli.upload import c_upload
-from openhasp_config_manager.cli.vars import c_vars
 from openhasp_config_manager.gui.util import echo
+from openhasp_config_manager.processing.template_cache import DEFAULT_TEMPLATE_CACHE_CAPACITY
 
 PARAM_CFG_DIR = "cfg_dir"
 PARAM_OUTPUT_DIR = "output_dir"
@@ -27,6 +16,15 @@ PARAM_PATH = "path"
 PARAM_OBJECT = "object"
 PARAM_STATE = "state"
 PARAM_MQTT_PATH = "mqtt_path"
+PARAM_JOBS = "jobs"
+PARAM_INCREMENTAL = "incremental"
+PARAM_TEMPLATE_CACHE_SIZE = "template_cache_size"
+PARAM_PERSIST_TEMPLATES = "persist_templates"
+PARAM_CACHE_STATS = "cache_stats"
+PARAM_TRUST_CACHE = "trust_cache"
+PARAM_VERIFY_SAMPLE = "verify_sample"
+PARAM_CONCURRENCY = "concurrency"
+PARAM_DRY_RUN = "dry_run"
 
 DEFAULT_CONFIG_PATH = Path("./openhasp-configs")
 DEFAULT_OUTPUT_PATH = Path("./output")
@@ -80,9 +78,65 @@ CMD_OPTION_NAMES = {
         "names": ["--path", "-p"],
         "help": """The MQTT sub-path (hasp/<device>/<path>) to listen to.""",
     },
+    PARAM_JOBS: {
+        "names": ["--jobs", "-j"],
+        "help": """
+            Number of devices to generate in parallel, using a pool of worker processes.
+            Use 0 to use one process per available CPU core.
+        """,
+    },
+    PARAM_INCREMENTAL: {
+        "names": ["--incremental", "-I"],
+        "help": """Only generate output files whose input files have changed since the last run.""",
+    },
+    PARAM_TEMPLATE_CACHE_SIZE: {
+        "names": ["--template-cache-size"],
+        "help": """Maximum number of compiled templates (and related data) to keep in memory.""",
+    },
+    PARAM_PERSIST_TEMPLATES: {
+        "names": ["--persist-templates"],
+        "help": """Store compiled templates in the output directory, to speed up subsequent runs.""",
+    },
+    PARAM_CACHE_STATS: {
+        "names": ["--cache-stats"],
+        "help": """Print usage statistics of the template caches when done.""",
+    },
+    PARAM_TRUST_CACHE: {
+        "names": ["--trust-cache", "-T"],
+        "help": """
+            Skip downloading files from the target device, if they have not changed since they were last uploaded
+            and their size on the device matches.
+        """,
+    },
+    PARAM_VERIFY_SAMPLE: {
+        "names": ["--verify-sample"],
+        "help": """Number of randomly chosen files to download and verify anyway, when using --trust-cache.""",
+    },
+    PARAM_CONCURRENCY: {
+        "names": ["--concurrency"],
+        "help": """
+            Number of devices to upload to at the same time.
+            Requests to a single device are always sent one after another.
+        """,
+    },
+    PARAM_DRY_RUN: {
+        "names": ["--dry-run"],
+        "help": """Only print the planned changes and their estimated upload size, without changing the devices.""",
+    },
 }
 
 
+def _run(coroutine):
+    """
+    Runs the given coroutine in a new event loop.
+    :param coroutine: the coroutine to run
+    :return: the result of the coroutine
+    """
+    import asyncio
+
+    return asyncio.run(coroutine)
+
+
 def get_option_names(parameter: str) -> list:
     """
     Returns a list of all valid console parameter names for a given parameter
@@ -103,6 +157,9 @@ def get_option_help(parameter: str) -> str:
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
+# Note: the implementation of each command is only imported once the command is invoked,
+#  to keep the startup of the CLI fast. Avoid importing anything but lightweight modules here.
+
 
 @click.group(context_settings=CONTEXT_SETTINGS)
 @click.version_option()
@@ -138,6 +195,8 @@ def gui(config_dir: Path, output_dir: Path):
     """
     Launches the GUI of openhasp-config-manager.
     """
+    from openhasp_config_manager.cli.gui import c_gui
+
     c_gui(config_dir, output_dir)
 
 
@@ -157,11 +216,46 @@ def gui(config_dir: Path, output_dir: Path):
     help=get_option_help(PARAM_OUTPUT_DIR),
 )
 @click.option(*get_option_names(PARAM_DEVICE), required=False, default=None, help=get_option_help(PARAM_DEVICE))
-def generate(config_dir: Path, output_dir: Path, device: str):
+@click.option(
+    *get_option_names(PARAM_JOBS), required=False, default=1, type=click.IntRange(min=0), help=get_option_help(PARAM_JOBS)
+)
+@click.option(*get_option_names(PARAM_INCREMENTAL), is_flag=True, help=get_option_help(PARAM_INCREMENTAL))
+@click.option(
+    *get_option_names(PARAM_TEMPLATE_CACHE_SIZE),
+    required=False,
+    default=DEFAULT_TEMPLATE_CACHE_CAPACITY,
+    type=click.IntRange(min=1),
+    help=get_option_help(PARAM_TEMPLATE_CACHE_SIZE),
+)
+@click.option(*get_option_names(PARAM_PERSIST_TEMPLATES), is_flag=True, help=get_option_help(PARAM_PERSIST_TEMPLATES))
+@click.option(*get_option_names(PARAM_CACHE_STATS), is_flag=True, help=get_option_help(PARAM_CACHE_STATS))
+def generate(
+    config_dir: Path,
+    output_dir: Path,
+    device: str,
+    jobs: int,
+    incremental: bool,
+    template_cache_size: int,
+    persist_templates: bool,
+    cache_stats: bool,
+):
     """
     Generates the output files for all devices in the given config directory.
     """
-    asyncio.run(c_generate(config_dir, output_dir, device))
+    from openhasp_config_manager.cli.generate import c_generate
+
+    _run(
+        c_generate(
+            config_dir,
+            output_dir,
+            device,
+            jobs,
+            incremental,
+            template_cache_size,
+            persist_templates,
+            cache_stats,
+        )
+    )
 
 
 @cli.command(name="deploy")
@@ -182,11 +276,74 @@ def generate(config_dir: Path, output_dir: Path, device: str):
 @click.option(*get_option_names(PARAM_DEVICE), required=False, default=None, help=get_option_help(PARAM_DEVICE))
 @click.option(*get_option_names(PARAM_PURGE), is_flag=True, help=get_option_help(PARAM_PURGE))
 @click.option(*get_option_names(PARAM_SHOW_DIFF), is_flag=True, help=get_option_help(PARAM_SHOW_DIFF))
-def deploy(config_dir: Path, output_dir: Path, device: str, purge: bool, diff: bool):
+@click.option(*get_option_names(PARAM_TRUST_CACHE), is_flag=True, help=get_option_help(PARAM_TRUST_CACHE))
+@click.option(
+    *get_option_names(PARAM_VERIFY_SAMPLE),
+    required=False,
+    default=0,
+    type=click.IntRange(min=0),
+    help=get_option_help(PARAM_VERIFY_SAMPLE),
+)
+@click.option(
+    *get_option_names(PARAM_CONCURRENCY),
+    required=False,
+    default=1,
+    type=click.IntRange(min=1),
+    help=get_option_help(PARAM_CONCURRENCY),
+)
+@click.option(*get_option_names(PARAM_DRY_RUN), is_flag=True, help=get_option_help(PARAM_DRY_RUN))
+@click.option(
+    *get_option_names(PARAM_JOBS), required=False, default=1, type=click.IntRange(min=0), help=get_option_help(PARAM_JOBS)
+)
+@click.option(*get_option_names(PARAM_INCREMENTAL), is_flag=True, help=get_option_help(PARAM_INCREMENTAL))
+@click.option(
+    *get_option_names(PARAM_TEMPLATE_CACHE_SIZE),
+    required=False,
+    default=DEFAULT_TEMPLATE_CACHE_CAPACITY,
+    type=click.IntRange(min=1),
+    help=get_option_help(PARAM_TEMPLATE_CACHE_SIZE),
+)
+@click.option(*get_option_names(PARAM_PERSIST_TEMPLATES), is_flag=True, help=get_option_help(PARAM_PERSIST_TEMPLATES))
+@click.option(*get_option_names(PARAM_CACHE_STATS), is_flag=True, help=get_option_help(PARAM_CACHE_STATS))
+def deploy(
+    config_dir: Path,
+    output_dir: Path,
+    device: str,
+    purge: bool,
+    diff: bool,
+    trust_cache: bool,
+    verify_sample: int,
+    concurrency: int,
+    dry_run: bool,
+    jobs: int,
+    incremental: bool,
+    template_cache_size: int,
+    persist_templates: bool,
+    cache_stats: bool,
+):
     """
     Combines the generation and upload of a configuration.
     """
-    asyncio.run(c_deploy(config_dir, output_dir, device, purge, diff))
+    from openhasp_config_manager.cli.deploy import c_deploy
+
+    _run(
+        c_deploy(
+            config_dir,
+            output_dir,
+            device,
+            purge,
+            diff,
+            jobs,
+            incremental,
+            template_cache_size,
+            persist_templates,
+            cache_stats,
+            trust_cache,
+            verify_sample,
+            concurrency,
+            dry_run,
+        )
+    )
 
 
 @cli.command(name="upload")
@@ -207,11 +364,39 @@ def deploy(config_dir: Path, output_dir: Path, device: str, purge: bool, diff: b
 @click.option(*get_option_names(PARAM_DEVICE), required=False, default=None, help=get_option_help(PARAM_DEVICE))
 @click.option(*get_option_names(PARAM_PURGE), is_flag=True, help=get_option_help(PARAM_PURGE))
 @click.option(*get_option_names(PARAM_SHOW_DIFF), is_flag=True, help=get_option_help(PARAM_SHOW_DIFF))
-def upload(config_dir: Path, output_dir: Path, device: str, purge: bool, diff: bool):
+@click.option(*get_option_names(PARAM_TRUST_CACHE), is_flag=True, help=get_option_help(PARAM_TRUST_CACHE))
+@click.option(
+    *get_option_names(PARAM_VERIFY_SAMPLE),
+    required=False,
+    default=0,
+    type=click.IntRange(min=0),
+    help=get_option_help(PARAM_VERIFY_SAMPLE),
+)
+@click.option(
+    *get_option_names(PARAM_CONCURRENCY),
+    required=False,
+    default=1,
+    type=click.IntRange(min=1),
+    help=get_option_help(PARAM_CONCURRENCY),
+)
+@click.option(*get_option_names(PARAM_DRY_RUN), is_flag=True, help=get_option_help(PARAM_DRY_RUN))
+def upload(
+    config_dir: Path,
+    output_dir: Path,
+    device: str,
+    purge: bool,
+    diff: bool,
+    trust_cache: bool,
+    verify_sample: int,
+    concurrency: int,
+    dry_run: bool,
+):
     """
     Uploads the previously generated configuration to their corresponding devices.
     """
-    asyncio.run(c_upload(config_dir, output_dir, device, purge, diff))
+    from openhasp_config_manager.cli.upload import c_upload
+
+    _run(c_upload(config_dir, output_dir, device, purge, diff, trust_cache, verify_sample, concurrency, dry_run))
 
 
 @cli.command(name="logs")
@@ -227,7 +412,9 @@ def logs(config_dir: Path, device: str):
     """
     Prints the logs of a device.
     """
-    asyncio.run(c_logs(config_dir, device))
+    from openhasp_config_manager.cli.logs import c_logs
+
+    _run(c_logs(config_dir, device))
 
 
 @cli.command(name="shell")
@@ -243,7 +430,9 @@ def shell(config_dir: Path, device: str):
     """
     Connects to the telnet server of a device.
     """
-    asyncio.run(c_shell(config_dir, device))
+    from openhasp_config_manager.cli.shell import c_shell
+
+    _run(c_shell(config_dir, device))
 
 
 @cli.command(name="listen")
@@ -260,7 +449,9 @@ def listen(config_dir: Path, device: str, path: str):
     """
     Sends a state update request to a device.
     """
-    asyncio.run(c_listen(config_dir, device, path))
+    from openhasp_config_manager.cli.listen import c_listen
+
+    _run(c_listen(config_dir, device, path))
 
 
 @cli.command(name="cmd")
@@ -281,7 +472,9 @@ def cmd(config_dir: Path, device: str, command: str, payload: str):
     The list of possible commands can be found on the official openHASP
     documentation: https://www.openhasp.com/latest/commands
     """
-    asyncio.run(c_cmd(config_dir, device, command, payload))
+    from openhasp_config_manager.cli.cmd import c_cmd
+
+    _run(c_cmd(config_dir, device, command, payload))
 
 
 @cli.command(name="state")
@@ -299,7 +492,9 @@ def state(config_dir: Path, device: str, object: str, state: str):
     """
     Sends a state update request to a device.
     """
-    asyncio.run(c_state(config_dir, device, object, state))
+    from openhasp_config_manager.cli.state import c_state
+
+    _run(c_state(config_dir, device, object, state))
 
 
 @cli.command(name="vars")
@@ -315,7 +510,9 @@ def vars(config_dir: Path, path: str):
     """
     Prints the variables accessible in a given path.
     """
-    asyncio.run(c_vars(config_dir, path))
+    from openhasp_config_manager.cli.vars import c_vars
+
+    _run(c_vars(config_dir, path))
 
 
 @cli.command(name="screenshot")
@@ -338,4 +535,6 @@ def screenshot(config_dir: Path, device: str, output_dir: Path):
     """
     Requests a screenshot from the given device and stores it to the given output directory.
     """
-    asyncio.run(c_screenshot(config_dir, device, output_dir))
+    from openhasp_config_manager.cli.screenshot import c_screenshot
+
+    _run(c_screenshot(config_dir, device, output_dir))
@@ -1,13 +1,13 @@
 from pathlib import Path
 
-from openhasp_config_manager.cli.common import _create_config_manager, _analyze_and_filter, _cmd
+from openhasp_config_manager.cli.common import _create_config_manager, _resolve_devices, _cmd
 from openhasp_config_manager.gui.util import success, error
 
 
 async def c_cmd(config_dir: Path, device: str, command: str, payload: str):
     try:
         config_manager = _create_config_manager(config_dir, Path("./nonexistent"))
-        filtered_devices, ignored_devices = _analyze_and_filter(config_manager=config_manager, device_filter=device)
+        filtered_devices = _resolve_devices(config_manager=config_manager, device_filter=device)
 
         if len(filtered_devices) <= 0:
             raise Exception(f"No device matches the filter: {device}")
@@ -17,3 +17,7 @@ async def c_cmd(config_dir: Path, device: str, command: str, payload: str):
         success("Done!")
     except Exception as ex:
         error(str(ex))
+    finally:
+        from openhasp_config_manager.openhasp_client.mqtt_client import close_mqtt_publishers
+
+        await close_mqtt_publishers()
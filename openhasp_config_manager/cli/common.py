@@ -1,13 +1,21 @@
+import os
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Tuple, List
+from typing import TYPE_CHECKING, Dict, Tuple, List, Optional
 
-from openhasp_config_manager.gui.util import info
-from openhasp_config_manager.manager import ConfigManager
+from openhasp_config_manager.gui.util import info, error, success, echo
 from openhasp_config_manager.openhasp_client.model.device import Device
-from openhasp_config_manager.processing.variables import VariableManager
+from openhasp_config_manager.processing.template_cache import CacheStats, TemplateCacheConfig
 
+if TYPE_CHECKING:
+    from openhasp_config_manager.manager import ConfigManager
 
-async def _generate(config_manager: ConfigManager, device: Device):
+# Note: the manager and the template rendering stack are only imported once they are needed,
+#  so that commands which only communicate with devices start quickly.
+
+
+async def _generate(config_manager: "ConfigManager", device: Device):
     info(f"Generating output for '{device.name}'...")
     try:
         config_manager.process(device)
@@ -15,7 +23,89 @@ async def _generate(config_manager: ConfigManager, device: Device):
         raise Exception(f"Error generating output for {device.name}: {ex.__class__.__name__} {ex}")
 
 
-async def _upload(device: Device, output_dir: Path, purge: bool, show_diff: bool):
+async def _generate_all(config_manager: "ConfigManager", devices: List[Device], jobs: int = 1) -> Dict[str, CacheStats]:
+    """
+    Generates the output for all given devices.
+
+    If jobs is greater than 1, devices are processed in parallel using a pool of worker processes.
+    Errors are reported per device, in the order of the given device list, once all devices
+    have been processed.
+
+    :param config_manager: the config manager to use
+    :param devices: the devices to generate the output for
+    :param jobs: the number of worker processes to use, 0 to use one per available CPU core
+    :return: the combined usage statistics of the template caches of all processes, by cache name
+    """
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor
+
+    from openhasp_config_manager.processing.template_rendering import (
+        configure_template_cache,
+        get_template_cache_config,
+        get_template_cache_stats,
+    )
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(devices))
+
+    if jobs <= 1:
+        for device in devices:
+            await _generate(config_manager, device)
+        return get_template_cache_stats()
+
+    info(f"Generating output for {len(devices)} devices using {jobs} processes...")
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=configure_template_cache,
+        initargs=(get_template_cache_config(),),
+    ) as executor:
+        futures = [loop.run_in_executor(executor, _process_in_worker, config_manager, device) for device in devices]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+
+    failed_device_names = []
+    # the latest statistics of each worker process, by process id
+    worker_stats: Dict[int, Dict[str, CacheStats]] = {}
+    for device, result in zip(devices, results):
+        if isinstance(result, BaseException):
+            error(f"Error generating output for {device.name}: {result.__class__.__name__} {result}")
+            failed_device_names.append(device.name)
+        else:
+            pid, stats = result
+            worker_stats[pid] = stats
+            success(f"Generated output for '{device.name}'")
+
+    if len(failed_device_names) > 0:
+        raise Exception(f"Error generating output for: {', '.join(failed_device_names)}")
+
+    combined_stats: Dict[str, CacheStats] = {}
+    for stats in worker_stats.values():
+        for name, cache_stats in stats.items():
+            combined_stats[name] = combined_stats.get(name, CacheStats()) + cache_stats
+    return combined_stats
+
+
+def _process_in_worker(config_manager: "ConfigManager", device: Device) -> Tuple[int, Dict[str, CacheStats]]:
+    """
+    Generates the output for a single device within a worker process.
+    :return: the id of the worker process and the usage statistics of its template caches
+    """
+    from openhasp_config_manager.processing.template_rendering import get_template_cache_stats
+
+    config_manager.process(device)
+    return os.getpid(), get_template_cache_stats()
+
+
+async def _upload(
+    device: Device,
+    output_dir: Path,
+    purge: bool,
+    show_diff: bool,
+    trust_cache: bool = False,
+    verify_sample: int = 0,
+    dry_run: bool = False,
+):
     from openhasp_config_manager.openhasp_client.openhasp import OpenHaspClient
     from openhasp_config_manager.uploader import ConfigUploader
 
@@ -23,12 +113,35 @@ async def _upload(device: Device, output_dir: Path, purge: bool, show_diff: bool
     uploader = ConfigUploader(output_dir, client)
 
     info(f"Uploading files to device '{device.name}'...")
-    return uploader.upload(device, purge, show_diff)
+    return uploader.upload(device, purge, show_diff, trust_cache, verify_sample, dry_run)
 
 
-async def _deploy(config_manager: ConfigManager, device: Device, output_dir: Path, purge: bool, show_diff: bool):
+async def _deploy(
+    config_manager: "ConfigManager",
+    device: Device,
+    output_dir: Path,
+    purge: bool,
+    show_diff: bool,
+    trust_cache: bool = False,
+    verify_sample: int = 0,
+    dry_run: bool = False,
+):
     await _generate(config_manager, device)
-    changed = await _upload(device, output_dir, purge, show_diff)
+    await _upload_and_apply(device, output_dir, purge, show_diff, trust_cache, verify_sample, dry_run)
+
+
+async def _upload_and_apply(
+    device: Device,
+    output_dir: Path,
+    purge: bool,
+    show_diff: bool,
+    trust_cache: bool = False,
+    verify_sample: int = 0,
+    dry_run: bool = False,
+):
+    changed = await _upload(device, output_dir, purge, show_diff, trust_cache, verify_sample, dry_run)
+    if dry_run:
+        return
     # _cmd(config_dir, device="touch_down_1", command="reboot", payload="")
     # _reload(config_dir, device)
     if changed:
@@ -38,6 +151,132 @@ async def _deploy(config_manager: ConfigManager, device: Device, output_dir: Pat
         info(f"No changes detected for {device.name}, device is already up-to-date")
 
 
+@dataclass
+class UploadResult:
+    """
+    The outcome of uploading the output of a single device.
+    """
+
+    device: Device
+    changed: bool = False
+    error: Optional[str] = None
+    duration: float = 0.0
+
+
+async def _upload_all(
+    devices: List[Device],
+    output_dir: Path,
+    purge: bool,
+    show_diff: bool,
+    trust_cache: bool = False,
+    verify_sample: int = 0,
+    concurrency: int = 1,
+    apply: bool = False,
+    dry_run: bool = False,
+) -> List[UploadResult]:
+    """
+    Uploads the output of all given devices.
+
+    Up to "concurrency" devices are handled at the same time. Requests to a single plate are always
+    serialized (even if multiple devices use the same address), because its webserver can only handle
+    one request at a time. Errors are reported per device, in a summary table, once all devices
+    have been handled.
+
+    :param devices: the devices to upload
+    :param output_dir: the output directory
+    :param purge: whether to remove files from the devices, which are not part of the generated output
+    :param show_diff: whether to show a diff for changed files
+    :param trust_cache: whether to skip downloading files, which have not changed since they were last uploaded
+    :param verify_sample: number of randomly chosen files to verify anyway, when trust_cache is used
+    :param concurrency: the maximum number of devices to handle at the same time
+    :param apply: whether to reboot devices that have changed, to apply the changes
+    :param dry_run: whether to only print the planned changes, without changing the devices
+    :return: the result for each device, in the order of the given device list
+    """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    plate_locks: Dict[str, asyncio.Lock] = {}
+    finished = 0
+
+    async def _upload_device(device: Device) -> UploadResult:
+        nonlocal finished
+        result = UploadResult(device=device)
+        plate_lock = plate_locks.setdefault(device.config.openhasp_config_manager.device.ip, asyncio.Lock())
+        async with plate_lock, semaphore:
+            info(f"Uploading files to device '{device.name}'...")
+            start = time.perf_counter()
+            try:
+                # the webservice client is blocking, so each device is handled in a thread of its own
+                result.changed = await asyncio.to_thread(
+                    _upload_blocking, device, output_dir, purge, show_diff, trust_cache, verify_sample, apply, dry_run
+                )
+            except Exception as ex:
+                result.error = f"{ex.__class__.__name__} {ex}"
+            result.duration = time.perf_counter() - start
+
+        finished += 1
+        progress = f"[{finished}/{len(devices)}]"
+        if result.error is None:
+            success(f"{progress} {device.name}: {'changed' if result.changed else 'up-to-date'}")
+        else:
+            error(f"{progress} {device.name}: {result.error}")
+        return result
+
+    results = list(await asyncio.gather(*[_upload_device(device) for device in devices]))
+    _print_upload_summary(results)
+
+    failed_device_names = [r.device.name for r in results if r.error is not None]
+    if len(failed_device_names) > 0:
+        raise Exception(f"Error uploading to: {', '.join(failed_device_names)}")
+
+    return results
+
+
+def _upload_blocking(
+    device: Device,
+    output_dir: Path,
+    purge: bool,
+    show_diff: bool,
+    trust_cache: bool,
+    verify_sample: int,
+    apply: bool,
+    dry_run: bool = False,
+) -> bool:
+    """
+    Uploads the output of a single device and, if requested, reboots it if anything has changed.
+    :return: True if the device has changed, false otherwise
+    """
+    from openhasp_config_manager.openhasp_client.openhasp import OpenHaspClient
+    from openhasp_config_manager.uploader import ConfigUploader
+
+    client = OpenHaspClient(device)
+    uploader = ConfigUploader(output_dir, client)
+    changed = uploader.upload(device, purge, show_diff, trust_cache, verify_sample, dry_run)
+    if apply and changed:
+        info(f"Rebooting {device.name} to apply changes")
+        client.reboot()
+    return changed
+
+
+def _print_upload_summary(results: List[UploadResult]):
+    rows = [("Device", "Result", "Duration")]
+    for result in results:
+        if result.error is not None:
+            status = "failed"
+        elif result.changed:
+            status = "changed"
+        else:
+            status = "up-to-date"
+        rows.append((result.device.name, status, f"{result.duration:.1f}s"))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for index, row in enumerate(rows):
+        echo("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+        if index == 0:
+            echo("  ".join("-" * width for width in widths))
+
+
 async def _reload(device: Device):
     from openhasp_config_manager.openhasp_client.openhasp import OpenHaspClient
 
@@ -62,17 +301,43 @@ async def _cmd(device: Device, command: str, payload: str):
     await client.command(command, payload)
 
 
-def _create_config_manager(config_dir, output_dir) -> ConfigManager:
+def _configure_template_cache(output_dir: Path, capacity: int, persist: bool):
+    """
+    Configures the caches used for template rendering.
+    :param output_dir: the output directory
+    :param capacity: the maximum number of entries of each cache
+    :param persist: whether to store compiled templates within the output directory
+    """
+    from openhasp_config_manager.manager import CACHE_FOLDER_NAME, TEMPLATE_CACHE_FOLDER_NAME
+    from openhasp_config_manager.processing.template_rendering import configure_template_cache
+
+    directory = Path(output_dir, CACHE_FOLDER_NAME, TEMPLATE_CACHE_FOLDER_NAME) if persist else None
+    configure_template_cache(TemplateCacheConfig(capacity=capacity, directory=directory))
+
+
+def _print_template_cache_stats(stats: Dict[str, CacheStats]):
+    for name, cache_stats in stats.items():
+        info(
+            f"Template cache '{name}': {cache_stats.hits} hits, {cache_stats.misses} misses, "
+            f"{cache_stats.evictions} evictions, {cache_stats.size} entries (capacity: {cache_stats.capacity})"
+        )
+
+
+def _create_config_manager(config_dir, output_dir, incremental: bool = False) -> "ConfigManager":
+    from openhasp_config_manager.manager import ConfigManager
+    from openhasp_config_manager.processing.variables import VariableManager
+
     variable_manager = VariableManager(cfg_root=config_dir)
     config_manager = ConfigManager(
         cfg_root=config_dir,
         output_root=output_dir,
         variable_manager=variable_manager,
+        incremental=incremental,
     )
     return config_manager
 
 
-def _analyze_and_filter(config_manager: ConfigManager, device_filter: str or None) -> Tuple[List[Device], List[Device]]:
+def _analyze_and_filter(config_manager: "ConfigManager", device_filter: str or None) -> Tuple[List[Device], List[Device]]:
     """
 
     :param config_manager:
@@ -94,3 +359,15 @@ def _analyze_and_filter(config_manager: ConfigManager, device_filter: str or Non
         filtered_devices = devices
 
     return filtered_devices, ignored_devices
+
+
+def _resolve_devices(config_manager: "ConfigManager", device_filter: str or None) -> List[Device]:
+    """
+    Resolves the devices matching the given filter by only reading their config files.
+    Use this instead of _analyze_and_filter() for commands which only communicate with devices.
+
+    :param config_manager: the config manager to use
+    :param device_filter: the name of the device, None to match all devices
+    :return: the matching devices (without any components)
+    """
+    return config_manager.read_devices(device_filter)
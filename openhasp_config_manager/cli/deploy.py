@@ -1,12 +1,39 @@
 from pathlib import Path
 
-from openhasp_config_manager.cli.common import _create_config_manager, _analyze_and_filter, _deploy
+from openhasp_config_manager.cli.common import (
+    _create_config_manager,
+    _analyze_and_filter,
+    _deploy,
+    _generate_all,
+    _upload_and_apply,
+    _upload_all,
+    _configure_template_cache,
+    _print_template_cache_stats,
+)
 from openhasp_config_manager.gui.util import warn, success, error
+from openhasp_config_manager.processing.template_cache import DEFAULT_TEMPLATE_CACHE_CAPACITY
+from openhasp_config_manager.processing.template_rendering import get_template_cache_stats
 
 
-async def c_deploy(config_dir: Path, output_dir: Path, device: str, purge: bool, diff: bool):
+async def c_deploy(
+    config_dir: Path,
+    output_dir: Path,
+    device: str,
+    purge: bool,
+    diff: bool,
+    jobs: int = 1,
+    incremental: bool = False,
+    template_cache_size: int = DEFAULT_TEMPLATE_CACHE_CAPACITY,
+    persist_templates: bool = False,
+    cache_stats: bool = False,
+    trust_cache: bool = False,
+    verify_sample: int = 0,
+    concurrency: int = 1,
+    dry_run: bool = False,
+):
     try:
-        config_manager = _create_config_manager(config_dir, output_dir)
+        _configure_template_cache(output_dir, template_cache_size, persist_templates)
+        config_manager = _create_config_manager(config_dir, output_dir, incremental)
         filtered_devices, ignored_devices = _analyze_and_filter(config_manager=config_manager, device_filter=device)
 
         if len(filtered_devices) <= 0:
@@ -19,14 +46,48 @@ async def c_deploy(config_dir: Path, output_dir: Path, device: str, purge: bool,
             ignored_devices_names = list(map(lambda x: x.name, ignored_devices))
             warn(f"Skipping devices: {', '.join(ignored_devices_names)}")
 
-        for device in filtered_devices:
-            await _deploy(
-                config_manager=config_manager,
-                device=device,
-                output_dir=output_dir,
-                purge=purge,
-                show_diff=diff,
-            )
+        if jobs == 1 and concurrency == 1:
+            for device in filtered_devices:
+                await _deploy(
+                    config_manager=config_manager,
+                    device=device,
+                    output_dir=output_dir,
+                    purge=purge,
+                    show_diff=diff,
+                    trust_cache=trust_cache,
+                    verify_sample=verify_sample,
+                    dry_run=dry_run,
+                )
+            stats = get_template_cache_stats()
+        else:
+            # generate the output of all devices up front, so it can be done in parallel
+            stats = await _generate_all(config_manager, filtered_devices, jobs)
+            if concurrency == 1:
+                for device in filtered_devices:
+                    await _upload_and_apply(
+                        device=device,
+                        output_dir=output_dir,
+                        purge=purge,
+                        show_diff=diff,
+                        trust_cache=trust_cache,
+                        verify_sample=verify_sample,
+                        dry_run=dry_run,
+                    )
+            else:
+                await _upload_all(
+                    devices=filtered_devices,
+                    output_dir=output_dir,
+                    purge=purge,
+                    show_diff=diff,
+                    trust_cache=trust_cache,
+                    verify_sample=verify_sample,
+                    dry_run=dry_run,
+                    concurrency=concurrency,
+                    apply=True,
+                )
+
+        if cache_stats:
+            _print_template_cache_stats(stats)
 
         success("Done!")
     except Exception as ex:
@@ -1,12 +1,29 @@
 from pathlib import Path
 
-from openhasp_config_manager.cli.common import _create_config_manager, _analyze_and_filter, _generate
+from openhasp_config_manager.cli.common import (
+    _create_config_manager,
+    _analyze_and_filter,
+    _generate_all,
+    _configure_template_cache,
+    _print_template_cache_stats,
+)
 from openhasp_config_manager.gui.util import warn, success, error
+from openhasp_config_manager.processing.template_cache import DEFAULT_TEMPLATE_CACHE_CAPACITY
 
 
-async def c_generate(config_dir: Path, output_dir: Path, device: str):
+async def c_generate(
+    config_dir: Path,
+    output_dir: Path,
+    device: str,
+    jobs: int = 1,
+    incremental: bool = False,
+    template_cache_size: int = DEFAULT_TEMPLATE_CACHE_CAPACITY,
+    persist_templates: bool = False,
+    cache_stats: bool = False,
+):
     try:
-        config_manager = _create_config_manager(config_dir, output_dir)
+        _configure_template_cache(output_dir, template_cache_size, persist_templates)
+        config_manager = _create_config_manager(config_dir, output_dir, incremental)
         filtered_devices, ignored_devices = _analyze_and_filter(config_manager=config_manager, device_filter=device)
 
         if len(filtered_devices) <= 0:
@@ -19,8 +36,9 @@ async def c_generate(config_dir: Path, output_dir: Path, device: str):
             ignored_devices_names = list(map(lambda x: x.name, ignored_devices))
             warn(f"Skipping devices: {', '.join(ignored_devices_names)}")
 
-        for device in filtered_devices:
-            await _generate(config_manager, device)
+        stats = await _generate_all(config_manager, filtered_devices, jobs)
+        if cache_stats:
+            _print_template_cache_stats(stats)
 
         success("Done!")
     except Exception as ex:
@@ -3,13 +3,14 @@ import sys
 import threading
 from pathlib import Path
 
-import qt_themes
-from PyQt6.QtWidgets import QApplication
 
-from openhasp_config_manager.gui.qt.util import setup_global_async_loop, get_global_async_loop
+def c_gui(config_dir: Path, output_dir: Path):
+    # the GUI dependencies are optional, so they are only imported when the GUI is actually launched
+    import qt_themes
+    from PyQt6.QtWidgets import QApplication
 
+    from openhasp_config_manager.gui.qt.util import setup_global_async_loop, get_global_async_loop
 
-def c_gui(config_dir: Path, output_dir: Path):
     app = QApplication(sys.argv)
     qt_themes.set_theme("one_dark_two")
 
@@ -1,7 +1,7 @@
 import asyncio
 from pathlib import Path
 
-from openhasp_config_manager.cli.common import _create_config_manager, _analyze_and_filter
+from openhasp_config_manager.cli.common import _create_config_manager, _resolve_devices
 from openhasp_config_manager.gui.util import success, error, info
 from openhasp_config_manager.openhasp_client.openhasp import OpenHaspClient
 
@@ -9,12 +9,15 @@ from openhasp_config_manager.openhasp_client.openhasp import OpenHaspClient
 async def c_listen(config_dir: Path, device: str, path: str):
     try:
         config_manager = _create_config_manager(config_dir, Path("./nonexistent"))
-        filtered_devices, ignored_devices = _analyze_and_filter(config_manager=config_manager, device_filter=device)
+        filtered_devices = _resolve_devices(config_manager=config_manager, device_filter=device)
         if len(filtered_devices) <= 0:
             raise Exception(f"No device matches the filter: {device}")
         info(f"Listening to '.../{path}' on devices: {', '.join(map(lambda x: x.name, filtered_devices))}")
+        # keep the clients, so their callbacks are not cancelled when they are garbage collected
+        clients = []
         for device in filtered_devices:
             client = OpenHaspClient(device)
+            clients.append(client)
 
             async def on_message(topic: str, payload: bytes):
                 info(f"{topic}: {payload.decode('utf-8')}")
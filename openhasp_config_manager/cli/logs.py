@@ -1,6 +1,6 @@
 from pathlib import Path
 
-from openhasp_config_manager.cli.common import _create_config_manager, _analyze_and_filter
+from openhasp_config_manager.cli.common import _create_config_manager, _resolve_devices
 from openhasp_config_manager.gui.util import error, info
 from openhasp_config_manager.openhasp_client.openhasp import OpenHaspClient
 
@@ -8,7 +8,7 @@ from openhasp_config_manager.openhasp_client.openhasp import OpenHaspClient
 async def c_logs(config_dir: Path, device: str):
     try:
         config_manager = _create_config_manager(config_dir, Path("./nonexistent"))
-        filtered_devices, ignored_devices = _analyze_and_filter(config_manager=config_manager, device_filter=device)
+        filtered_devices = _resolve_devices(config_manager=config_manager, device_filter=device)
         if len(filtered_devices) <= 0:
             raise Exception(f"No device matches the filter: {device}")
         if len(filtered_devices) > 1:
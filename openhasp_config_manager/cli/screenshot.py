@@ -1,13 +1,13 @@
 from pathlib import Path
 
-from openhasp_config_manager.cli.common import _create_config_manager, _analyze_and_filter
+from openhasp_config_manager.cli.common import _create_config_manager, _resolve_devices
 from openhasp_config_manager.gui.util import error, success, info
 
 
 async def c_screenshot(config_dir: Path, device: str, output: Path):
     try:
         config_manager = _create_config_manager(config_dir, Path("./nonexistent"))
-        filtered_devices, ignored_devices = _analyze_and_filter(config_manager=config_manager, device_filter=device)
+        filtered_devices = _resolve_devices(config_manager=config_manager, device_filter=device)
 
         if len(filtered_devices) <= 0:
             raise Exception(f"No device matches the filter: {device}")
@@ -18,7 +18,7 @@ async def c_screenshot(config_dir: Path, device: str, output: Path):
             client = OpenHaspClient(device)
             try:
                 info(f"Taking screenshot of device '{device.name}'...")
-                screenshot = client.take_screenshot()
+                screenshot = await client.take_screenshot_async()
                 image_file_path = Path(output, f"{device.name}.bmp")
                 image_file_path.write_bytes(screenshot)
             except Exception as ex:
@@ -27,3 +27,7 @@ async def c_screenshot(config_dir: Path, device: str, output: Path):
         success("Done!")
     except Exception as ex:
         error(str(ex))
+    finally:
+        from openhasp_config_manager.openhasp_client.async_webservice_client import close_async_sessions
+
+        await close_async_sessions()
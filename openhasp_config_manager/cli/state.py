@@ -2,7 +2,7 @@ import json
 from pathlib import Path
 from typing import Dict
 
-from openhasp_config_manager.cli.common import _create_config_manager, _analyze_and_filter
+from openhasp_config_manager.cli.common import _create_config_manager, _resolve_devices
 from openhasp_config_manager.gui.util import success, error
 from openhasp_config_manager.openhasp_client.openhasp import OpenHaspClient
 
@@ -14,7 +14,7 @@ async def c_state(config_dir: Path, device: str, object: str, state: str):
             raise Exception("State must be a JSON object.")
 
         config_manager = _create_config_manager(config_dir, Path("./nonexistent"))
-        filtered_devices, ignored_devices = _analyze_and_filter(config_manager=config_manager, device_filter=device)
+        filtered_devices = _resolve_devices(config_manager=config_manager, device_filter=device)
         if len(filtered_devices) <= 0:
             raise Exception(f"No device matches the filter: {device}")
         for device in filtered_devices:
@@ -23,3 +23,7 @@ async def c_state(config_dir: Path, device: str, object: str, state: str):
         success("Done!")
     except Exception as ex:
         error(str(ex))
+    finally:
+        from openhasp_config_manager.openhasp_client.mqtt_client import close_mqtt_publishers
+
+        await close_mqtt_publishers()
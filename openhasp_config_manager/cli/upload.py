@@ -1,10 +1,20 @@
 from pathlib import Path
 
-from openhasp_config_manager.cli.common import _create_config_manager, _analyze_and_filter, _upload
+from openhasp_config_manager.cli.common import _create_config_manager, _analyze_and_filter, _upload, _upload_all
 from openhasp_config_manager.gui.util import warn, success, error
 
 
-async def c_upload(config_dir: Path, output_dir: Path, device: str, purge: bool, diff: bool):
+async def c_upload(
+    config_dir: Path,
+    output_dir: Path,
+    device: str,
+    purge: bool,
+    diff: bool,
+    trust_cache: bool = False,
+    verify_sample: int = 0,
+    concurrency: int = 1,
+    dry_run: bool = False,
+):
     try:
         config_manager = _create_config_manager(config_dir, output_dir)
         filtered_devices, ignored_devices = _analyze_and_filter(config_manager=config_manager, device_filter=device)
@@ -19,8 +29,13 @@ async def c_upload(config_dir: Path, output_dir: Path, device: str, purge: bool,
             ignored_devices_names = list(map(lambda x: x.name, ignored_devices))
             warn(f"Skipping devices: {', '.join(ignored_devices_names)}")
 
-        for device in filtered_devices:
-            await _upload(device, output_dir, purge, diff)
+        if concurrency == 1:
+            for device in filtered_devices:
+                await _upload(device, output_dir, purge, diff, trust_cache, verify_sample, dry_run)
+        else:
+            await _upload_all(
+                filtered_devices, output_dir, purge, diff, trust_cache, verify_sample, concurrency, dry_run=dry_run
+            )
 
         success("Done!")
     except Exception as ex:
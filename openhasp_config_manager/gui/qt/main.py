@@ -81,7 +81,7 @@ class MainWindow(QMainWindow):
         # device_processor = self.config_manager.create_device_processor(device)
         # device_validator = self.config_manager.create_device_validator(device)
         self.relevant_components = self.config_manager.find_relevant_components(device)
-        boot_cmd_component: CmdComponent = next(filter(lambda x: x.name == "boot.cmd", self.relevant_components), None)
+        boot_cmd_component = self.config_manager.get_component_index(device).get("boot.cmd", CmdComponent)
         self.select_cmd_component(session, boot_cmd_component)
 
     def select_cmd_component(self, session: PlateSession, cmd_component: CmdComponent):
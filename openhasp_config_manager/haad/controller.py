@@ -58,6 +58,8 @@ class OpenHaspController(HaadController):
             self._lwt_task.cancel()
             self._lwt_task = None
         await self.teardown_plate_setup()
+        # release the connections to the plate and its MQTT broker
+        await self.plate_controller.client.close()
 
     async def teardown_plate_setup(self):
         self.state_updater.clear()
@@ -80,8 +82,7 @@ class OpenHaspController(HaadController):
         timeout = 10
 
         # ensure the plate is online
-        loop = asyncio.get_event_loop()
-        res = await loop.run_in_executor(None, self.__online_check)
+        res = await self.__online_check()
         if not res:
             self.logger.info(f"Plate '{self._name}' is not online yet, retrying in {timeout}...")
             self._plate_setup_scheduled_task = await self.schedule(
@@ -107,9 +108,9 @@ class OpenHaspController(HaadController):
             #     action=self.__failsafe_plate_setup,
             # )
 
-    def __online_check(self) -> bool:
+    async def __online_check(self) -> bool:
         try:
-            self.plate_controller.client.get_files()
+            await self.plate_controller.client.get_files_async()
             return True
         except Exception:
             return False
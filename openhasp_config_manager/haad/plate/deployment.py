@@ -1,3 +1,4 @@
+import asyncio
 from pathlib import Path
 
 from haad.controller import HaadController
@@ -43,14 +44,16 @@ class DeploymentController:
         """
         self.controller.logger.info(f"DEPLOY: Deploying configuration of {self.device.name}...")
 
-        devices = self._config_manager.analyze()
+        # analyzing, processing and uploading are blocking, so they run in a thread to keep the event loop
+        # (and MQTT handling) responsive
+        devices = await asyncio.to_thread(self._config_manager.analyze)
         device_names = list(map(lambda x: x.name, devices))
         self.controller.logger.info(f"DEPLOY: Analysis finished, found: {', '.join(device_names)}, processing...")
         self.device = next(filter(lambda x: x.name == self._name, devices))
         self.controller.logger.info(f"DEPLOY: Device is: {self.device.name}, processing...")
-        self._config_manager.process(self.device)
+        await asyncio.to_thread(self._config_manager.process, self.device)
         self.controller.logger.info(f"DEPLOY: Finished processing {self.device.name}, uploading files...")
-        changed = self._uploader.upload(self.device, purge, show_diff)
+        changed = await asyncio.to_thread(self._uploader.upload, self.device, purge, show_diff)
         self.controller.logger.info(f"DEPLOY: {self.device.name} Done! Changed: {changed}")
         return changed
 
@@ -1,7 +1,6 @@
-import re
 import shutil
 from pathlib import Path
-from typing import List, Set, Optional
+from typing import TYPE_CHECKING, Dict, List, Set, Optional, Tuple
 
 import orjson
 
@@ -28,14 +27,22 @@ from openhasp_config_manager.openhasp_client.model.configuration.telnet_config i
 from openhasp_config_manager.openhasp_client.model.configuration.wifi_config import WifiConfig
 from openhasp_config_manager.openhasp_client.model.device import Device
 from openhasp_config_manager.openhasp_client.model.openhasp_config_manager_config import OpenhaspConfigManagerConfig
-from openhasp_config_manager.processing.device_processor import DeviceProcessor
-from openhasp_config_manager.processing.jsonl.jsonl import ObjectDimensionsProcessor, ObjectThemeProcessor
+from openhasp_config_manager.processing.build_cache import BuildCache
+from openhasp_config_manager.processing.component_index import ComponentIndex
+from openhasp_config_manager.processing.file_tree import FileInfo, FileTree
+from openhasp_config_manager.processing.output_manifest import MANIFEST_FILE_NAME, OutputManifest, read_output_file
+from openhasp_config_manager.processing.preprocessor.jsonl_preprocessor import JsonlPreProcessor
+from openhasp_config_manager.processing.template_cache import CacheStats
 from openhasp_config_manager.processing.variables import VariableManager
-from openhasp_config_manager.validation.cmd import CmdFileValidator
-from openhasp_config_manager.validation.device_validator import DeviceValidator
-from openhasp_config_manager.validation.jsonl import JsonlObjectValidator
+
+if TYPE_CHECKING:
+    from openhasp_config_manager.processing.device_processor import DeviceProcessor
+    from openhasp_config_manager.validation.device_validator import DeviceValidator
 
 CONFIG_FILE_NAME = "config.json"
+CACHE_FOLDER_NAME = ".cache"
+BUILD_CACHE_FILE_NAME = "build.json"
+TEMPLATE_CACHE_FOLDER_NAME = "templates"
 
 
 def parse_cmd_commands(content) -> List[str]:
@@ -61,11 +68,25 @@ class ConfigManager:
     within a given config directory.
     """
 
-    def __init__(self, cfg_root: Path, output_root: Path, variable_manager: VariableManager):
+    def __init__(self, cfg_root: Path, output_root: Path, variable_manager: VariableManager, incremental: bool = False):
+        """
+        :param cfg_root: the root directory of the configuration
+        :param output_root: the root directory to write generated output files to
+        :param variable_manager: the variable manager to use
+        :param incremental: if True, only output files whose input files changed since the last run are generated
+        """
         self.cfg_root = cfg_root
         self._output_root = output_root
 
         self._variable_manager = variable_manager
+        self._incremental = incremental
+
+        # snapshot of the configuration directory, taken by analyze()
+        self._file_tree: Optional[FileTree] = None
+        # the device and its component index by device name, see get_component_index
+        self._component_indices: Dict[str, Tuple[Device, ComponentIndex]] = {}
+        # shared by all device processors, so that common components are only parsed once
+        self._jsonl_preprocessor = JsonlPreProcessor()
 
     def analyze(self) -> List[Device]:
         """
@@ -75,9 +96,56 @@ class ConfigManager:
 
         :return: list of devices, which can be used in the ConfigManager.process() method
         """
-        self._variable_manager.read()
+        # the configuration directory is only walked once, for both variables and components
+        self._file_tree = FileTree(self.cfg_root).scan()
+        self._variable_manager.read(self._file_tree)
+        self._component_indices.clear()
         return self._analyze(self.cfg_root, self._output_root)
 
+    def read_devices(self, device_filter: Optional[str] = None) -> List[Device]:
+        """
+        Reads only the configuration of devices, without analyzing any components or variables.
+        This is much faster than analyze() and sufficient for communicating with a device.
+
+        :param device_filter: the name of the device to read, None to read all devices
+        :return: list of devices (without any components), sorted by name
+        """
+        devices_path = Path(self.cfg_root, DEVICES_FOLDER_NAME)
+        if device_filter is None:
+            if not devices_path.exists():
+                raise RuntimeError(f"No '{DEVICES_FOLDER_NAME}' sub-folder found in '{self.cfg_root}'.")
+            device_paths = [p for p in devices_path.iterdir() if p.is_dir()]
+        elif device_filter == Path(device_filter).name:
+            device_paths = [p for p in [Path(devices_path, device_filter)] if p.is_dir()]
+        else:
+            # not a plain device name
+            device_paths = []
+
+        result = []
+        for device_path in sorted(device_paths, key=lambda x: x.name):
+            result.append(
+                Device(
+                    path=device_path,
+                    name=device_path.name,
+                    jsonl=[],
+                    cmd=[],
+                    images=[],
+                    fonts=[],
+                    config=self._read_device_config(device_path),
+                    output_dir=Path(self._output_root, device_path.name),
+                )
+            )
+        return result
+
+    def get_file_info(self, path: Path) -> Optional[FileInfo]:
+        """
+        :param path: the path of a file within the configuration directory
+        :return: the stat metadata of the given file recorded by the last analyze(), or None if it is unknown
+        """
+        if self._file_tree is None:
+            return None
+        return self._file_tree.get_file_info(path)
+
     def _analyze(self, cfg_dir_root: Path, output_dir_root: Path) -> List[Device]:
         result: List[Device] = []
 
@@ -90,15 +158,9 @@ class ConfigManager:
                 f"No '{DEVICES_FOLDER_NAME}' sub-folder found in '{cfg_dir_root}'. Please create it and move your "
                 f"device configuration files there."
             )
-        for device_path in devices_path.iterdir():
-            if not device_path.is_dir():
-                continue
-
+        for device_path in self._get_file_tree().list_directories(devices_path):
             device_output_dir = Path(output_dir_root, device_path.name)
-            try:
-                config = self._read_config(device_path)
-            except Exception as ex:
-                raise Exception(f"Error reading config '{device_path}': {ex}")
+            config = self._read_device_config(device_path)
 
             device_components = self._analyze_device(config, device_path)
 
@@ -115,6 +177,7 @@ class ConfigManager:
                 output_dir=device_output_dir,
             )
 
+            self._create_component_index(device)
             result.append(device)
 
         return result
@@ -156,10 +219,10 @@ class ConfigManager:
     def _read_jsonl_components(self, path, prefix) -> List[JsonlComponent]:
         result = []
         suffix = ".jsonl"
-        for file in path.rglob(f"*{suffix}"):
+        for file_info in self._get_file_tree().find_files(path, suffix):
             component = self._create_text_component_from_path(
                 device_cfg_dir_root=path,
-                path=Path(path, file.relative_to(path)).relative_to(path),
+                path=file_info.path.relative_to(path),
                 prefix=prefix,
             )
             if component is not None:
@@ -175,10 +238,10 @@ class ConfigManager:
     def _read_cmd_components(self, path, prefix) -> List[CmdComponent]:
         result = []
         suffix = ".cmd"
-        for file in path.rglob(f"*{suffix}"):
+        for file_info in self._get_file_tree().find_files(path, suffix):
             component = self._create_text_component_from_path(
                 device_cfg_dir_root=path,
-                path=Path(path, file.relative_to(path)).relative_to(path),
+                path=file_info.path.relative_to(path),
                 prefix=prefix,
             )
             if component is not None:
@@ -196,10 +259,10 @@ class ConfigManager:
         result = []
         image_suffixes = [".png", ".bin"]
         for suffix in image_suffixes:
-            for file in path.rglob(f"*{suffix}"):
+            for file_info in self._get_file_tree().find_files(path, suffix):
                 component = self._create_raw_component_from_path(
                     device_cfg_dir_root=path,
-                    path=Path(path, file.relative_to(path)).relative_to(path),
+                    path=file_info.path.relative_to(path),
                     prefix=prefix,
                 )
                 if component is not None:
@@ -207,11 +270,16 @@ class ConfigManager:
                         name=component.name,
                         type=component.type,
                         path=component.path,
-                        content=component.content,
                     )
                     result.append(image_component)
         return result
 
+    def _get_file_tree(self) -> FileTree:
+        if self._file_tree is None:
+            # directories are walked on demand
+            self._file_tree = FileTree(self.cfg_root)
+        return self._file_tree
+
     @staticmethod
     def _create_text_component_from_path(device_cfg_dir_root: Path, path: Path, prefix: str = "") -> Optional[TextComponent]:
         file = Path(device_cfg_dir_root, path)
@@ -245,8 +313,6 @@ class ConfigManager:
             warn(f"Not a file, skipping: {file}")
             return None
 
-        content = file.read_bytes()
-
         name_parts = []
         if len(prefix) > 0:
             name_parts.append(prefix)
@@ -254,14 +320,20 @@ class ConfigManager:
 
         name = "_".join(name_parts)
         suffix = file.suffix
+        # the content is read lazily, on first access
         component = RawComponent(
             name=name,
             type=suffix[1:],
             path=file,
-            content=content,
         )
         return component
 
+    def _read_device_config(self, device_path: Path) -> Optional[Config]:
+        try:
+            return self._read_config(device_path)
+        except Exception as ex:
+            raise Exception(f"Error reading config '{device_path}': {ex}")
+
     def _read_config(self, device_path: Path) -> Optional[Config]:
         config_file = Path(device_path, CONFIG_FILE_NAME)
         if config_file.exists() and config_file.is_file():
@@ -390,16 +462,44 @@ class ConfigManager:
         self._generate_output(device)
 
     def _generate_output(self, device: Device):
-        self._clear_output(device)
+        build_cache = BuildCache(Path(self._output_root, CACHE_FOLDER_NAME, device.name, BUILD_CACHE_FILE_NAME))
+        manifest = OutputManifest(Path(self._output_root, CACHE_FOLDER_NAME, device.name, MANIFEST_FILE_NAME))
+        if self._incremental:
+            build_cache.load()
+            manifest.load()
+        else:
+            self._clear_output(device)
 
-        device_processor = self.create_device_processor(device)
+        device_processor = None
         device_validator = self.create_device_validator(device)
 
         # only include files which are referenced in a cmd file
         relevant_components = self.find_relevant_components(device)
 
+        if self._incremental:
+            self._clear_stale_output(device, relevant_components, build_cache, manifest)
+
+        # the jsonl components of a device can reference objects of each other,
+        # so all of them (and the variables used) need to be considered as dependencies
+        jsonl_dependencies = self._compute_jsonl_dependencies(device)
+
         # let the processor manage each component
         for component in relevant_components:
+            output_file = Path(device.output_dir, component.name)
+            if isinstance(component, JsonlComponent):
+                dependencies = jsonl_dependencies + [component.path]
+            else:
+                dependencies = [component.path]
+
+            if self._incremental and build_cache.is_up_to_date(output_file, dependencies):
+                if manifest.get(component.name) is None:
+                    # f.ex. output generated before manifests were introduced
+                    manifest.add(component.name, read_output_file(output_file))
+                continue
+
+            if device_processor is None:
+                device_processor = self.create_device_processor(device)
+
             try:
                 output_content = device_processor.normalize(device, component)
             except Exception as ex:
@@ -411,16 +511,64 @@ class ConfigManager:
                 raise Exception(f"Validation for {component.path} failed: {ex}")
 
             self._write_output(device, component, output_content)
+            build_cache.update(output_file, dependencies)
+            manifest.add(component.name, self._encode_output(output_content))
+
+        build_cache.save()
+        manifest.save()
+
+    def _compute_jsonl_dependencies(self, device: Device) -> List[Path]:
+        """
+        Computes the list of input files the output of any jsonl component of the given device depends on.
+        :param device: the device
+        :return: list of input files
+        """
+        result = [Path(device.path, CONFIG_FILE_NAME)]
+        result.extend(self._variable_manager.get_var_files(device.path))
+        for component in device.jsonl:
+            result.append(component.path)
+            result.extend(self._variable_manager.get_var_files(component.path))
+
+        # remove duplicates while preserving the order
+        return list(dict.fromkeys(result))
+
+    @staticmethod
+    def _clear_stale_output(
+        device: Device, relevant_components: List[Component], build_cache: BuildCache, manifest: OutputManifest
+    ):
+        """
+        Removes output files of the given device, which are not generated from any of the given components.
+        :param device: the device
+        :param relevant_components: the components which are part of the output
+        :param build_cache: the build cache of the device
+        :param manifest: the output manifest of the device
+        """
+        relevant_component_names = set(map(lambda x: x.name, relevant_components))
+        for entry in manifest.entries:
+            if entry.name not in relevant_component_names:
+                manifest.remove(entry.name)
 
-    def create_device_processor(self, device: Device):
+        if not device.output_dir.exists():
+            return
+
+        for file in device.output_dir.iterdir():
+            if file.name not in relevant_component_names:
+                file.unlink()
+                build_cache.remove(file)
+
+    def create_device_processor(self, device: Device) -> "DeviceProcessor":
         """
         Creates a DeviceProcessor for the given device.
         :param device: the device to create the processor for
         :return: a DeviceProcessor instance
         """
+        # the processing stack (including jinja2) is only needed to generate output
+        from openhasp_config_manager.processing.device_processor import DeviceProcessor
+        from openhasp_config_manager.processing.jsonl.jsonl import ObjectDimensionsProcessor, ObjectThemeProcessor
+
         # prepare DeviceProcessor
         jsonl_processors = [ObjectDimensionsProcessor(), ObjectThemeProcessor()]
-        device_processor = DeviceProcessor(device, jsonl_processors, self._variable_manager)
+        device_processor = DeviceProcessor(device, jsonl_processors, self._variable_manager, self._jsonl_preprocessor)
 
         # feed device specific data to the processor
         # Note: this also includes common components
@@ -430,12 +578,22 @@ class ConfigManager:
 
         return device_processor
 
-    def create_device_validator(self, device: Device):
+    def get_parse_cache_stats(self) -> CacheStats:
+        """
+        :return: the usage statistics of the cache of parsed jsonl components, shared by all devices
+        """
+        return self._jsonl_preprocessor.cache_stats()
+
+    def create_device_validator(self, device: Device) -> "DeviceValidator":
         """
         Creates a DeviceValidator for the given device.
         :param device: the device to create the validator for
         :return: a DeviceValidator instance
         """
+        from openhasp_config_manager.validation.cmd import CmdFileValidator
+        from openhasp_config_manager.validation.device_validator import DeviceValidator
+        from openhasp_config_manager.validation.jsonl import JsonlObjectValidator
+
         # prepare DeviceValidator
         jsonl_validator = JsonlObjectValidator()
         cmd_file_validator = CmdFileValidator()
@@ -454,19 +612,17 @@ class ConfigManager:
         :return: a list of relevant components
         """
         result: List[Component] = []
+        index = self.get_component_index(device)
         cmd_components = device.cmd
         jsonl_components = device.jsonl
-        image_components = device.images
 
-        referenced_cmd_components = self._find_referenced_cmd_components(cmd_components)
+        referenced_cmd_components = self._find_referenced_cmd_components(index, cmd_components)
 
         # find jsonl files referenced in CMD files
-        referenced_jsonl_components: Set[Component] = self._find_referenced_jsonl_components(cmd_components, jsonl_components)
+        referenced_jsonl_components: Set[Component] = self._find_referenced_jsonl_components(index, cmd_components)
 
         # find image files referenced in CMD files and JSONL files
-        referenced_image_components = self._find_referenced_image_components(
-            cmd_components, jsonl_components, image_components
-        )
+        referenced_image_components = self._find_referenced_image_components(index, cmd_components, jsonl_components)
 
         # compute component for jsonl file referenced in config.hasp.pages
         pages_jsonl_component_path = self._compute_component_path_of_pages_config_value(device.path, device.config)
@@ -482,113 +638,80 @@ class ConfigManager:
         result.extend(referenced_image_components)
         return result
 
-    def _find_referenced_cmd_components(self, cmd_components: List[CmdComponent]) -> Set[CmdComponent]:
-        result = set()
+    def get_component_index(self, device: Device) -> ComponentIndex:
+        """
+        :param device: the device
+        :return: the index of the components of the given device, including the references between them
+        """
+        entry = self._component_indices.get(device.name, None)
+        # the index is only valid for the very same device instance, f.ex. not for one returned by another analyze()
+        if entry is None or entry[0] is not device:
+            return self._create_component_index(device)
+        return entry[1]
 
-        system_components = list(filter(lambda x: x.name in SYSTEM_SCRIPTS, cmd_components))
+    def _create_component_index(self, device: Device) -> ComponentIndex:
+        index = ComponentIndex(device.jsonl + device.cmd + device.images + device.fonts)
+        self._component_indices[device.name] = (device, index)
+        return index
+
+    @staticmethod
+    def _find_referenced_cmd_components(index: ComponentIndex, cmd_components: List[CmdComponent]) -> Set[CmdComponent]:
+        result = set()
 
         # TODO: this should also consider the hierarchy, if a cmd component is not a system component, and
         #  it is also not referenced anywhere, the component is not relevant
 
         for component in cmd_components:
-            cmd_references = self._find_cmd_references_in_cmd_component(component)
-            for match in cmd_references:
-                matching_components = list(filter(lambda x: x.name == match, cmd_components))
+            for match in index.get_cmd_references(component):
+                matching_components = index.find_by_name(match, CmdComponent)
                 if len(matching_components) <= 0:
                     found_component_names = ",".join([c.name for c in cmd_components])
                     raise AssertionError(f"Referenced CMD component not found: {match}, only found: {found_component_names}")
                 result.update(matching_components)
 
         # system components should always be included
-        result.update(system_components)
+        for name in SYSTEM_SCRIPTS:
+            result.update(index.find_by_name(name, CmdComponent))
 
         return result
 
     @staticmethod
-    def _find_cmd_references_in_cmd_component(component: TextComponent) -> Set[str]:
-        result = set()
-        pattern = re.compile(r"L:/(.*\.cmd)")
-        for line in component.content.splitlines():
-            matches = re.findall(pattern, line)
-            result.update(matches)
-        return result
-
-    def _find_referenced_jsonl_components(
-        self, cmd_components: List[CmdComponent], jsonl_components: List[JsonlComponent]
-    ) -> Set[JsonlComponent]:
+    def _find_referenced_jsonl_components(index: ComponentIndex, cmd_components: List[CmdComponent]) -> Set[JsonlComponent]:
         referenced_jsonl_components = set()
         for component in cmd_components:
-            jsonl_references = self._find_jsonl_references_in_cmd_component(component)
-            for match in jsonl_references:
-                matching_components = list(filter(lambda x: x.name == match, jsonl_components))
+            for match in index.get_jsonl_references(component):
+                matching_components = index.find_by_name(match, JsonlComponent)
                 if len(matching_components) <= 0:
-                    found_component_names = ",".join([c.name for c in jsonl_components])
+                    found_component_names = ",".join([c.name for c in index.find_by_type("jsonl")])
                     raise AssertionError(f"Referenced JSONL component not found: {match}, only found: {found_component_names}")
                 referenced_jsonl_components.update(matching_components)
 
         return referenced_jsonl_components
 
     @staticmethod
-    def _find_jsonl_references_in_cmd_component(component: TextComponent) -> Set[str]:
-        result = set()
-        pattern = re.compile(r"L:/(.*\.jsonl)")
-        for line in component.content.splitlines():
-            matches = re.findall(pattern, line)
-            result.update(matches)
-        return result
-
     def _find_referenced_image_components(
-        self,
+        index: ComponentIndex,
         cmd_components: List[CmdComponent],
         jsonl_components: List[JsonlComponent],
-        image_components: List[ImageComponent],
     ) -> Set[ImageComponent]:
         """
         Find all image components that are referenced in the given cmd and jsonl components.
+        :param index: the component index of the device
         :param cmd_components:
         :param jsonl_components:
-        :param image_components:
         :return: set of referenced image components
         """
         referenced_image_components = set()
-        for component in cmd_components:
-            image_references = self._find_image_references_in_cmd_component(component)
-            for match in image_references:
-                matching_components = list(filter(lambda x: x.name == match, image_components))
-                if len(matching_components) <= 0:
-                    found_component_names = ",".join([c.name for c in image_components])
-                    raise AssertionError(f"Referenced image component not found: {match}, only found: {found_component_names}")
-                referenced_image_components.update(matching_components)
-
-        for component in jsonl_components:
-            image_references = self._find_image_references_in_jsonl_component(component)
-            for match in image_references:
-                matching_components = list(filter(lambda x: x.name == match, image_components))
+        for component in cmd_components + jsonl_components:
+            for match in index.get_image_references(component):
+                matching_components = index.find_by_name(match, ImageComponent)
                 if len(matching_components) <= 0:
-                    found_component_names = ",".join([c.name for c in image_components])
+                    found_component_names = ",".join([c.name for c in index.find_by_type("png") + index.find_by_type("bin")])
                     raise AssertionError(f"Referenced image component not found: {match}, only found: {found_component_names}")
                 referenced_image_components.update(matching_components)
 
         return referenced_image_components
 
-    @staticmethod
-    def _find_image_references_in_cmd_component(component: TextComponent) -> Set[str]:
-        result = set()
-        pattern = re.compile(r"L:/(.*\.(?:png|bin))")
-        for line in component.content.splitlines():
-            matches = re.findall(pattern, line)
-            result.update(matches)
-        return result
-
-    @staticmethod
-    def _find_image_references_in_jsonl_component(component: TextComponent) -> Set[str]:
-        result = set()
-        pattern = re.compile(r"L:/(.*\.(?:png|bin))")
-        for line in component.content.splitlines():
-            matches = re.findall(pattern, line)
-            result.update(matches)
-        return result
-
     def determine_device_jsonl_component_order_for_cmd(
         self,
         device: Device,
@@ -601,48 +724,36 @@ class ConfigManager:
         :param cmd_component: The cmd component to analyze.
         :return: The ordered list of jsonl components.
         """
-        device_cmd_components = device.cmd
-        device_jsonl_components = device.jsonl
-
         return self._determine_device_jsonl_component_order_for_cmd(
             cmd_component=cmd_component,
-            device_cmd_components=device_cmd_components,
-            device_jsonl_components=device_jsonl_components,
+            index=self.get_component_index(device),
         )
 
     def _determine_device_jsonl_component_order_for_cmd(
         self,
         cmd_component: CmdComponent,
-        device_cmd_components: List[CmdComponent],
-        device_jsonl_components: List[JsonlComponent],
+        index: ComponentIndex,
     ) -> List[JsonlComponent]:
         """
         Determines an ordered list of all referenced jsonl components based on their reference in the given cmd component.
 
         :param cmd_component: The cmd component to analyze.
-        :param device_cmd_components: The list of cmd components to check for references.
-        :param device_jsonl_components: The list of jsonl components to order.
+        :param index: The component index of the device, used to look up referenced components.
         :return: The ordered list of jsonl components.
         """
         jsonl_components = []
 
-        for cmd in cmd_component.commands:
-            if cmd.endswith(".jsonl"):
-                jsonl_component_name = cmd.split("/")[-1]
-                jsonl_component = next(filter(lambda x: x.name == jsonl_component_name, device_jsonl_components), None)
+        for name in index.get_command_references(cmd_component):
+            if name.endswith(".jsonl"):
+                jsonl_component = index.get(name, JsonlComponent)
                 if jsonl_component is None:
-                    raise AssertionError(f"Component {jsonl_component_name} not found in device jsonl components")
+                    raise AssertionError(f"Component {name} not found in device jsonl components")
                 jsonl_components.append(jsonl_component)
-            elif cmd.endswith(".cmd"):
-                cmd_component_name = cmd.split("/")[-1]
-                cmd_component = next(filter(lambda x: x.name == cmd_component_name, device_cmd_components), None)
-                if cmd_component is None:
-                    raise AssertionError(f"Component {cmd_component_name} not found in device cmd components")
-                jsonl_components.extend(
-                    self._determine_device_jsonl_component_order_for_cmd(
-                        cmd_component, device_cmd_components, device_jsonl_components
-                    )
-                )
+            else:
+                referenced_cmd_component = index.get(name, CmdComponent)
+                if referenced_cmd_component is None:
+                    raise AssertionError(f"Component {name} not found in device cmd components")
+                jsonl_components.extend(self._determine_device_jsonl_component_order_for_cmd(referenced_cmd_component, index))
 
         return jsonl_components
 
@@ -659,6 +770,16 @@ class ConfigManager:
         else:
             raise AssertionError(f"Unsupported output type: {type(output_content)}")
 
+    @staticmethod
+    def _encode_output(output_content: str | bytes) -> bytes:
+        """
+        :param output_content: the generated content of an output file
+        :return: the content, as it is uploaded to the device (see read_output_file)
+        """
+        if isinstance(output_content, str):
+            return output_content.encode("utf-8")
+        return output_content
+
     @staticmethod
     def _clear_output(device: Device):
         if device.output_dir.exists():
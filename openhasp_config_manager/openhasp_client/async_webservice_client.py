@@ -0,0 +1,402 @@
+import asyncio
+import logging
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import aiohttp
+import orjson
+
+from openhasp_config_manager.openhasp_client.http_session import (
+    DEFAULT_TIMEOUT,
+    IDEMPOTENT_METHODS,
+    RETRY_STATUS_CODES,
+    RequestStats,
+    RetryConfig,
+)
+from openhasp_config_manager.openhasp_client.model.configuration.debug_config import DebugConfig
+from openhasp_config_manager.openhasp_client.model.configuration.gui_config import GuiConfig
+from openhasp_config_manager.openhasp_client.model.configuration.hasp_config import HaspConfig
+from openhasp_config_manager.openhasp_client.model.configuration.http_config import HttpConfig
+from openhasp_config_manager.openhasp_client.model.configuration.mqtt_config import MqttConfig
+from openhasp_config_manager.openhasp_client.model.configuration.telnet_config import TelnetConfig
+from openhasp_config_manager.openhasp_client.webservice_client import (
+    DELETE,
+    GET,
+    POST,
+    _compute_base_url,
+    _compute_upload_timeout,
+    _debug_config_form,
+    _gui_config_form,
+    _hasp_config_form,
+    _http_config_form,
+    _mqtt_config_form,
+    _parse_file_list,
+    _parse_gui_config,
+    _parse_http_config,
+    _parse_mqtt_config,
+    _telnet_config_form,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AsyncPlateSession:
+    """
+    An aiohttp session to a single plate, the asyncio counterpart of PlateSession.
+
+    The session keeps a single connection alive between requests, so requests of multiple tasks
+    are sent one after another, and retries requests that failed for transient reasons.
+    """
+
+    def __init__(self, username: str, password: str, retry_config: RetryConfig):
+        """
+        :param username: the username used to authenticate
+        :param password: the password used to authenticate
+        :param retry_config: the configuration of retries of failed requests
+        """
+        self._retry_config = retry_config
+        self._session = aiohttp.ClientSession(
+            auth=aiohttp.BasicAuth(username, password),
+            connector=aiohttp.TCPConnector(limit=1),
+        )
+        self._stats = RequestStats()
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        timeout: float = DEFAULT_TIMEOUT,
+        retry: Optional[bool] = None,
+        data_factory: Optional[Callable[[], Any]] = None,
+        **kwargs,
+    ) -> Tuple[Dict[str, str], bytes]:
+        """
+        Sends a request using the session, retrying it if it fails for transient reasons.
+        :param method: the method to use (GET, POST)
+        :param url: the url to use
+        :param timeout: the timeout in seconds of each attempt
+        :param retry: whether to retry the request if it fails for transient reasons, None to only retry
+            idempotent requests, see PlateSession.request()
+        :param data_factory: creates the body of each attempt, for bodies which can only be sent once (f.ex. a multipart
+            form), instead of passing it as "data"
+        :param kwargs: see aiohttp.ClientSession.request()
+        :return: the headers and body of the final response
+        :raises aiohttp.ClientResponseError: if the final response has an error status
+        """
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        retries = self._retry_config.retries if retry else 0
+        attempt = 0
+        while True:
+            if data_factory is not None:
+                kwargs["data"] = data_factory()
+            start = time.perf_counter()
+            status = None
+            try:
+                async with self._session.request(
+                    method, url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs
+                ) as response:
+                    status = response.status
+                    if status not in RETRY_STATUS_CODES or attempt >= retries:
+                        response.raise_for_status()
+                        return dict(response.headers), await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= retries:
+                    raise
+            finally:
+                self._record(method, url, status, time.perf_counter() - start)
+
+            await asyncio.sleep(self._retry_config.backoff_factor * (2**attempt))
+            attempt += 1
+
+    def _record(self, method: str, url: str, status: Optional[int], duration: float):
+        _LOGGER.debug(f"{method} {url} -> {status} in {duration * 1000:.0f}ms")
+        self._stats.requests += 1
+        self._stats.failures += 1 if status is None or status >= 400 else 0
+        self._stats.total_duration += duration
+        self._stats.max_duration = max(self._stats.max_duration, duration)
+
+    def get_stats(self) -> RequestStats:
+        """
+        :return: the timing statistics of all requests (including retries) sent using this session
+        """
+        return RequestStats() + self._stats
+
+    async def close(self):
+        """
+        Closes the connection of this session.
+        """
+        await self._session.close()
+
+
+# sessions are bound to the event loop they have been created in
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, AsyncPlateSession]]" = weakref.WeakKeyDictionary()
+
+
+def get_async_session(
+    base_url: str, username: str, password: str, retry_config: RetryConfig = RetryConfig()
+) -> AsyncPlateSession:
+    """
+    Returns the session used to communicate with the given plate, which is shared
+    by all clients of the plate within the running event loop.
+    :param base_url: the base url of the plate
+    :param username: the username used to authenticate
+    :param password: the password used to authenticate
+    :param retry_config: the configuration of retries of failed requests
+    :return: the session
+    """
+    loop_sessions = _sessions.setdefault(asyncio.get_running_loop(), {})
+    key = (base_url, username, password, retry_config)
+    session = loop_sessions.get(key, None)
+    if session is None:
+        session = AsyncPlateSession(username, password, retry_config)
+        loop_sessions[key] = session
+    return session
+
+
+async def close_async_session(base_url: str, username: str, password: str, retry_config: RetryConfig = RetryConfig()):
+    """
+    Closes the session used to communicate with the given plate within the running event loop, if any.
+    Clients of the plate create a new session with their next request.
+    :param base_url: the base url of the plate
+    :param username: the username used to authenticate
+    :param password: the password used to authenticate
+    :param retry_config: the configuration of retries of failed requests
+    """
+    loop_sessions = _sessions.get(asyncio.get_running_loop(), {})
+    session = loop_sessions.pop((base_url, username, password, retry_config), None)
+    if session is not None:
+        await session.close()
+
+
+async def close_async_sessions():
+    """
+    Closes all sessions created using get_async_session() within the running event loop.
+    """
+    loop_sessions = _sessions.pop(asyncio.get_running_loop(), {})
+    for session in loop_sessions.values():
+        await session.close()
+
+
+class AsyncWebserviceClient:
+    """
+    The asyncio counterpart of WebserviceClient, which does not block the event loop while
+    waiting for the (potentially slow) webserver of a plate.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        username: str,
+        password: str,
+        retry_config: RetryConfig = RetryConfig(),
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        """
+        :param url: the url (or ip) of the plate
+        :param username: the username used to authenticate
+        :param password: the password used to authenticate
+        :param retry_config: the configuration of retries of failed requests
+        :param timeout: the timeout in seconds of each request
+        """
+        self._username = username
+        self._password = password
+        self._retry_config = retry_config
+        self._base_url = _compute_base_url(url)
+        self._timeout = timeout
+
+    def get_request_stats(self) -> RequestStats:
+        """
+        :return: the timing statistics of all requests sent to the plate (by any client) within the running event loop
+        """
+        return self._get_session().get_stats()
+
+    async def close(self):
+        """
+        Closes the session of the plate within the running event loop, which is shared with all other clients
+        of the plate, see close_async_session()
+        """
+        await close_async_session(self._base_url, self._username, self._password, self._retry_config)
+
+    async def reboot(self):
+        """
+        Request a reboot
+        """
+        # the plate may reboot before responding, so the request must not be retried
+        await self._do_request(method=GET, url=self._base_url + "reboot", retry=False)
+
+    async def set_hasp_config(self, config: HaspConfig):
+        """
+        Set the "HASP" configuration
+        :param config: the configuration to set
+        """
+        await self._do_request(method=POST, url=self._base_url + "config", data=_hasp_config_form(config))
+
+    async def get_http_config(self) -> HttpConfig:
+        data = await self._do_request(method=GET, url=self._base_url + "api/config/http/")
+        return _parse_http_config(data)
+
+    async def set_http_config(self, config: HttpConfig):
+        """
+        Set the HTTP configuration
+        :param config: the configuration to set
+        """
+        await self._do_request(method=POST, url=self._base_url + "config", data=_http_config_form(config))
+
+    async def get_mqtt_config(self) -> MqttConfig:
+        data = await self._do_request(method=GET, url=self._base_url + "api/config/mqtt/")
+        return _parse_mqtt_config(data)
+
+    async def set_mqtt_config(self, config: MqttConfig):
+        """
+        Set the MQTT configuration
+        :param config: the configuration to set
+        """
+        await self._do_request(method=POST, url=self._base_url + "config", data=_mqtt_config_form(config))
+
+    async def get_gui_config(self) -> GuiConfig:
+        data = await self._do_request(method=GET, url=self._base_url + "api/config/gui/")
+        return _parse_gui_config(data)
+
+    async def set_gui_config(self, config: GuiConfig):
+        """
+        Set the GUI configuration
+        :param config: the configuration to set
+        """
+        await self._do_request(method=POST, url=self._base_url + "config", data=_gui_config_form(config))
+
+    async def set_telnet_config(self, config: TelnetConfig):
+        """
+        Set the Telnet configuration
+        :param config: the configuration to set
+        """
+        await self._do_request(method=POST, url=self._base_url + "config", data=_telnet_config_form(config))
+
+    async def set_debug_config(self, config: DebugConfig):
+        """
+        Set the Debug configuration
+        :param config: the configuration to set
+        """
+        await self._do_request(method=POST, url=self._base_url + "config", data=_debug_config_form(config))
+
+    async def upload_files(self, files: Dict[str, bytes]):
+        """
+        Upload a collection of files
+        :param files: "target file name"->"file content" mapping
+        """
+        for name, content in files.items():
+            await self.upload_file(name, content)
+
+    async def upload_file(self, name: str, content: bytes):
+        """
+        Upload a single file
+        :param name: the target name of the file on the device
+        :param content: the file content
+        """
+
+        def _create_form() -> aiohttp.FormData:
+            form = aiohttp.FormData()
+            form.add_field(name, content, filename=name, content_type="application/octet-stream")
+            return form
+
+        # a form can only be sent once, so each attempt needs a form of its own
+        await self._do_request(
+            method=POST,
+            url=self._base_url + "edit",
+            form_factory=_create_form,
+            timeout=_compute_upload_timeout(self._timeout, len(content)),
+            # uploads replace the file, so they can safely be repeated
+            retry=True,
+        )
+
+    async def get_files(self) -> List[str]:
+        """
+        Retrieve a list of all file on the device
+        :return: a list of all files on the device
+        """
+        files = await self._list_files()
+        return list(map(lambda x: x["name"], files))
+
+    async def get_file_sizes(self) -> Dict[str, int]:
+        """
+        Retrieve the size of all files on the device, using the same single request as get_files()
+        :return: "file name"->"size in bytes" mapping of all files on the device
+        """
+        files = await self._list_files()
+        return {f["name"]: f.get("size", -1) for f in files}
+
+    async def _list_files(self) -> List[Dict[str, Any]]:
+        response = await self._do_request(method=GET, url=self._base_url + "list?dir=/")
+        return _parse_file_list(response)
+
+    async def get_file_content(self, file_name: str) -> Optional[bytes]:
+        try:
+            return await self._do_request(method=GET, url=self._base_url + file_name)
+        except Exception:
+            return None
+
+    async def delete_file(self, file_name: str):
+        """
+        Delete a file on the device
+        :param file_name: the name of the file
+        """
+        await self._do_request(method=DELETE, url=self._base_url + "edit", data={"path": "/" + file_name})
+
+    async def take_screenshot(self) -> bytes:
+        """
+        Requests a screenshot from the device.
+        :return: the screenshot as a bitmap
+        """
+        return await self._do_request(method=GET, url=self._base_url + "screenshot", params={"q": "0"})
+
+    def _get_session(self) -> AsyncPlateSession:
+        return get_async_session(self._base_url, self._username, self._password, self._retry_config)
+
+    async def _do_request(
+        self,
+        method: str = GET,
+        url: str = "/",
+        params: dict = None,
+        data: Dict[str, Any] = None,
+        form_factory: Callable[[], aiohttp.FormData] = None,
+        timeout: float = None,
+        retry: Optional[bool] = None,
+    ) -> Optional[List | Dict | bytes]:
+        """
+        Executes a http request based on the given parameters
+
+        :param method: the method to use (GET, POST)
+        :param url: the url to use
+        :param params: query parameters that will be appended to the url
+        :param data: form fields, encoded the same way as by the (requests based) WebserviceClient
+        :param form_factory: creates the multipart form to send
+        :param timeout: the timeout of the request, defaults to the timeout of this client
+        :param retry: whether to retry the request if it fails for transient reasons,
+            None to only retry idempotent requests
+        :return: the response parsed as a json, or the raw response content
+        """
+        headers = {}
+        body = None
+        if data is not None:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+            body = urlencode(data, doseq=True)
+
+        response_headers, content = await self._get_session().request(
+            method,
+            url,
+            timeout=self._timeout if timeout is None else timeout,
+            retry=retry,
+            data_factory=form_factory,
+            params=params,
+            data=body,
+            headers=headers,
+        )
+
+        if len(content) > 0:
+            if "application/json" in response_headers.get("Content-Type", ""):
+                return orjson.loads(content)
+            else:
+                return content
+        return None
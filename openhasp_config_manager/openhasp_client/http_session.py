@@ -0,0 +1,200 @@
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 5
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+
+# status codes the webserver of a plate responds with, when it is (temporarily) too busy
+RETRY_STATUS_CODES = [500, 502, 503, 504]
+# methods of requests which are retried by default, as they can safely be sent multiple times
+IDEMPOTENT_METHODS = Retry.DEFAULT_ALLOWED_METHODS
+
+
+@dataclass(frozen=True)
+class RetryConfig:
+    """
+    Configuration of the retries of failed requests to a plate.
+
+    :param retries: the maximum number of retries of a single request
+    :param backoff_factor: the delay between retries, doubled with each retry (0.5s, 1s, 2s, ...)
+    """
+
+    retries: int = DEFAULT_RETRIES
+    backoff_factor: float = DEFAULT_BACKOFF_FACTOR
+
+
+@dataclass
+class RequestStats:
+    """
+    Timing statistics of the requests sent to a plate.
+    """
+
+    requests: int = 0
+    failures: int = 0
+    total_duration: float = 0.0
+    max_duration: float = 0.0
+
+    @property
+    def average_duration(self) -> float:
+        return self.total_duration / self.requests if self.requests > 0 else 0.0
+
+    def __add__(self, other: "RequestStats") -> "RequestStats":
+        return RequestStats(
+            requests=self.requests + other.requests,
+            failures=self.failures + other.failures,
+            total_duration=self.total_duration + other.total_duration,
+            max_duration=max(self.max_duration, other.max_duration),
+        )
+
+
+# the retries of the request currently being sent (by the current thread), see _PlateAdapter
+_request_retries: ContextVar[Optional[Retry]] = ContextVar("_request_retries", default=None)
+
+
+class _PlateAdapter(HTTPAdapter):
+    """
+    A http adapter whose retries can be changed for a single request, see PlateSession.request().
+    """
+
+    @property
+    def max_retries(self) -> Retry:
+        retries = _request_retries.get()
+        return self._max_retries if retries is None else retries
+
+    @max_retries.setter
+    def max_retries(self, value: Retry):
+        self._max_retries = value
+
+
+class PlateSession:
+    """
+    A http session to a single plate, which keeps its connection alive between requests
+    and retries requests that failed for transient reasons.
+
+    The connection pool of the session holds a single connection, so requests of multiple threads
+    are sent one after another, as the webserver of a plate can only handle one request at a time.
+    """
+
+    def __init__(self, username: str, password: str, retry_config: RetryConfig):
+        """
+        :param username: the username used to authenticate
+        :param password: the password used to authenticate
+        :param retry_config: the configuration of retries of failed requests
+        """
+        # only idempotent requests (f.ex. GET, DELETE) are retried by default, see request()
+        self._idempotent_retry = Retry(
+            total=retry_config.retries,
+            backoff_factor=retry_config.backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            # let the caller handle the final response
+            raise_on_status=False,
+        )
+        self._any_method_retry = self._idempotent_retry.new(allowed_methods=None)
+        self._no_retry = Retry(total=0, raise_on_status=False)
+
+        self._session = requests.Session()
+        self._session.auth = (username, password)
+        self._session.mount(
+            "http://",
+            _PlateAdapter(max_retries=self._idempotent_retry, pool_connections=1, pool_maxsize=1, pool_block=True),
+        )
+        self._stats = RequestStats()
+        self._stats_lock = threading.Lock()
+
+    def request(
+        self, method: str, url: str, timeout: float = DEFAULT_TIMEOUT, retry: Optional[bool] = None, **kwargs
+    ) -> requests.Response:
+        """
+        Sends a request using the session.
+        :param method: the method to use (GET, POST)
+        :param url: the url to use
+        :param timeout: the timeout in seconds of each attempt
+        :param retry: whether to retry the request if it fails for transient reasons, None to only retry
+            idempotent requests. Only pass True for requests which can safely be sent multiple times
+            (f.ex. an upload, which replaces the file), False for requests which must not be repeated
+            (f.ex. a reboot, whose response may never arrive)
+        :param kwargs: see requests.Session.request()
+        :return: the response
+        """
+        if retry is None:
+            retries = self._idempotent_retry
+        elif retry:
+            retries = self._any_method_retry
+        else:
+            retries = self._no_retry
+
+        start = time.perf_counter()
+        failed = True
+        status = None
+        token = _request_retries.set(retries)
+        try:
+            response = self._session.request(method, url, timeout=timeout, **kwargs)
+            status = response.status_code
+            failed = not response.ok
+            return response
+        finally:
+            _request_retries.reset(token)
+            duration = time.perf_counter() - start
+            _LOGGER.debug(f"{method} {url} -> {status} in {duration * 1000:.0f}ms")
+            with self._stats_lock:
+                self._stats.requests += 1
+                self._stats.failures += 1 if failed else 0
+                self._stats.total_duration += duration
+                self._stats.max_duration = max(self._stats.max_duration, duration)
+
+    def get_stats(self) -> RequestStats:
+        """
+        :return: the timing statistics of all requests sent using this session
+        """
+        with self._stats_lock:
+            return RequestStats() + self._stats
+
+    def close(self):
+        """
+        Closes the connections of this session.
+        """
+        self._session.close()
+
+
+_sessions: Dict[Tuple[str, str, str, RetryConfig], PlateSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(base_url: str, username: str, password: str, retry_config: RetryConfig = RetryConfig()) -> PlateSession:
+    """
+    Returns the session used to communicate with the given plate, which is shared
+    by all clients of the plate within this process.
+    :param base_url: the base url of the plate
+    :param username: the username used to authenticate
+    :param password: the password used to authenticate
+    :param retry_config: the configuration of retries of failed requests
+    :return: the session
+    """
+    key = (base_url, username, password, retry_config)
+    with _sessions_lock:
+        session = _sessions.get(key, None)
+        if session is None:
+            session = PlateSession(username, password, retry_config)
+            _sessions[key] = session
+        return session
+
+
+def close_sessions():
+    """
+    Closes all sessions created using get_session().
+    """
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
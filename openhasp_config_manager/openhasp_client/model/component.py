@@ -1,6 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional
 
 
 @dataclass
@@ -35,9 +35,70 @@ class JsonlComponent(TextComponent):
         return super().__hash__()
 
 
+class _LazyFileContent:
+    """
+    Descriptor for the content of a component, which is read from the component path on first access
+    if it was not given explicitly.
+
+    Content read from the path is kept apart from content given explicitly, so it can be left out
+    when pickling a component (f.ex. when passing it to a worker process), which reads it again if needed.
+    """
+
+    def __set_name__(self, owner, name: str):
+        self._attribute_name = f"_{name}"
+        self._loaded_attribute_name = f"_loaded_{name}"
+
+    def __get__(self, instance, owner=None) -> Optional[bytes]:
+        if instance is None:
+            return self
+        content = instance.__dict__.get(self._attribute_name, None)
+        if content is None:
+            content = instance.__dict__.get(self._loaded_attribute_name, None)
+        if content is None:
+            content = Path(instance.path).read_bytes()
+            instance.__dict__[self._loaded_attribute_name] = content
+        return content
+
+    def __set__(self, instance, value: Optional[bytes]):
+        if value is self:
+            # the default value of the dataclass field, the content is read on first access
+            value = None
+        instance.__dict__[self._attribute_name] = value
+        instance.__dict__.pop(self._loaded_attribute_name, None)
+
+    def is_loaded(self, instance) -> bool:
+        """
+        :return: True if the content of the given instance is held in memory
+        """
+        return (
+            instance.__dict__.get(self._attribute_name, None) is not None
+            or instance.__dict__.get(self._loaded_attribute_name, None) is not None
+        )
+
+    def without_loaded_content(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        :param state: the attributes of an instance
+        :return: the given attributes, without the content read from the path of the instance
+        """
+        return {key: value for key, value in state.items() if key != self._loaded_attribute_name}
+
+
+_lazy_file_content = _LazyFileContent()
+
+
 @dataclass
 class RawComponent(Component):
-    content: bytes
+    # loaded from the path on first access, if not given
+    content: bytes = field(default=_lazy_file_content, compare=False, repr=False)
+
+    def is_content_loaded(self) -> bool:
+        """
+        :return: True if the content of this component is held in memory
+        """
+        return _lazy_file_content.is_loaded(self)
+
+    def __getstate__(self):
+        return _lazy_file_content.without_loaded_content(self.__dict__)
 
     def __hash__(self):
         return super().__hash__()
@@ -2,23 +2,152 @@ import asyncio
 import json
 import logging
 import uuid
-from typing import Callable, List, Dict, Optional, Awaitable
+import weakref
+from typing import Callable, List, Dict, Optional, Awaitable, Set, Tuple
 
 from aiomqtt import Client, Message
 
+from openhasp_config_manager.openhasp_client.topic_trie import (
+    TopicTrie,
+    has_wildcards,
+    reduce_topic_filters,
+    topic_filter_covers,
+)
+
 _LOGGER = logging.getLogger(__name__)
 
+MQTT_CLIENT_ID = "openhasp-config-manager"
+RECONNECT_INTERVAL_SECONDS = 5
+# time to wait for a message to be published, including reconnects to the broker
+PUBLISH_TIMEOUT_SECONDS = 30
+
+
+def _create_client(host: str, port: int, mqtt_user: str, mqtt_password: str) -> Client:
+    return Client(
+        hostname=host,
+        port=port,
+        username=mqtt_user,
+        password=mqtt_password,
+        identifier=f"{MQTT_CLIENT_ID}-{uuid.uuid4()}",
+    )
+
+
+class MqttPublisher:
+    """
+    A long-lived connection to a broker, used to publish messages.
+
+    The connection is established when the first message is published, and re-established
+    whenever it is lost. Messages published while the connection is down are queued,
+    and sent in order once it has been re-established.
+    """
+
+    def __init__(self, host: str, port: int, mqtt_user: str, mqtt_password: str):
+        self._host = host
+        self._port = port
+        self._mqtt_user = mqtt_user
+        self._mqtt_password = mqtt_password
+
+        self._queue: asyncio.Queue[Tuple[str, Optional[str], asyncio.Future]] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self, topic: str, payload: Optional[str] = None, timeout: float = PUBLISH_TIMEOUT_SECONDS):
+        """
+        Publish a message to a topic, and wait until it has been sent to the broker
+        :param topic: topic to publish to
+        :param payload: payload to publish
+        :param timeout: time in seconds to wait for the message to be sent
+        :raises asyncio.TimeoutError: if the message could not be sent in time, it is discarded in that case
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((topic, payload, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._publisher_task_function())
+        # a cancelled (timed out) message is skipped by the publisher task
+        await asyncio.wait_for(future, timeout)
+
+    def close(self):
+        """
+        Closes the connection to the broker. Messages which have not been sent yet are discarded.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            future.cancel()
+
+    async def _publisher_task_function(self):
+        message = None
+        while True:
+            try:
+                async with _create_client(self._host, self._port, self._mqtt_user, self._mqtt_password) as client:
+                    while True:
+                        if message is None:
+                            message = await self._queue.get()
+                        topic, payload, future = message
+                        if not future.done():
+                            await client.publish(topic, payload=payload)
+                            if not future.done():
+                                future.set_result(None)
+                        message = None
+            except asyncio.CancelledError:
+                if message is not None:
+                    message[2].cancel()
+                break
+            except Exception as ex:
+                # the current message is kept, and sent first once the connection has been re-established
+                _LOGGER.warning(f"Error: {ex}; Reconnecting in {RECONNECT_INTERVAL_SECONDS} seconds ...")
+                await asyncio.sleep(RECONNECT_INTERVAL_SECONDS)
+
+
+# publishers are bound to the event loop they have been created in
+_publishers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, MqttPublisher]]" = weakref.WeakKeyDictionary()
+
+
+def get_mqtt_publisher(host: str, port: int, mqtt_user: str, mqtt_password: str) -> MqttPublisher:
+    """
+    Returns the publisher used to publish messages to the given broker, which is shared
+    by all clients of the broker within the running event loop.
+    :param host: the host of the broker
+    :param port: the port of the broker
+    :param mqtt_user: the username used to authenticate
+    :param mqtt_password: the password used to authenticate
+    :return: the publisher
+    """
+    loop_publishers = _publishers.setdefault(asyncio.get_running_loop(), {})
+    key = (host, port, mqtt_user, mqtt_password)
+    publisher = loop_publishers.get(key, None)
+    if publisher is None:
+        publisher = MqttPublisher(host, port, mqtt_user, mqtt_password)
+        loop_publishers[key] = publisher
+    return publisher
+
+
+async def close_mqtt_publishers():
+    """
+    Closes all publishers created using get_mqtt_publisher() within the running event loop.
+    """
+    loop_publishers = _publishers.pop(asyncio.get_running_loop(), {})
+    for publisher in loop_publishers.values():
+        publisher.close()
+
+
 class MqttClient:
     def __init__(self, host: str, port: int, mqtt_user: str, mqtt_password: str):
-        self._mqtt_client_id = "openhasp-config-manager"
         self._host = host
         self._port = port
         self._mqtt_user = mqtt_user
         self._mqtt_password = mqtt_password
-        self._reconnect_interval_seconds = 5
 
         self._mqtt_client_task: Optional[asyncio.Task] = None
         self._callbacks: Dict[str, List[Callable[[str, bytes], Awaitable[None]]]] = {}
+        # used to find the callbacks of a message, without matching its topic against every registered topic
+        self._topic_trie: TopicTrie[Callable[[str, bytes], Awaitable[None]]] = TopicTrie()
+        # the topics subscribed to at the broker, used as an ordered set
+        self._broker_subscriptions: Dict[str, None] = {}
+        # the topics subscribed to at the broker which contain wildcards, and may therefore cover other topics
+        self._broker_wildcard_subscriptions: Set[str] = set()
+        self._broker_subscriptions_lock = asyncio.Lock()
         self.__mqtt_client: Optional[Client] = None
 
     async def publish(self, topic: str, payload: str | Dict | List = None):
@@ -33,8 +162,9 @@ class MqttClient:
         if self.__mqtt_client is not None:
             await self.__mqtt_client.publish(topic, payload=payload)
         else:
-            async with self._create_mqtt_client() as client:
-                await client.publish(topic, payload=payload)
+            # share a single, long-lived connection with all other clients of the same broker
+            publisher = get_mqtt_publisher(self._host, self._port, self._mqtt_user, self._mqtt_password)
+            await publisher.publish(topic, payload=payload)
 
     async def subscribe(self, topic: str, callback: Callable[[str, bytes], Awaitable[None]]):
         """
@@ -46,9 +176,12 @@ class MqttClient:
             self._callbacks[topic] = []
         if callback not in self._callbacks[topic]:
             self._callbacks[topic].append(callback)
+        self._topic_trie.add(topic, callback)
 
         if self._mqtt_client_task is None:
             await self._start_mqtt_client_task()
+        else:
+            await self._add_broker_subscription(topic)
 
     async def cancel_callback(self, topic: str = None, callback: Callable = None):
         """
@@ -60,25 +193,41 @@ class MqttClient:
             raise ValueError("Must specify either topic, callback or both")
 
         if topic is not None and callback is not None:
-            self._callbacks[topic] = list(filter(lambda x: x != callback, self._callbacks[topic]))
+            self._remove_callback(topic, callback)
 
         elif topic is not None and topic in self._callbacks:
             self._callbacks.pop(topic)
+            self._topic_trie.remove(topic)
         else:
             for topic in self._callbacks.keys():
                 self._callbacks[topic] = list(filter(lambda x: x != callback, self._callbacks[topic]))
+                self._topic_trie.remove(topic, callback)
 
         if not any(self._callbacks.values()):
             await self._stop_mqtt_client_task()
+        else:
+            await self._update_broker_subscriptions()
+
+    def close(self):
+        """
+        Removes all callbacks and closes the connection to the broker
+        """
+        self._callbacks.clear()
+        self._topic_trie = TopicTrie()
+        if self._mqtt_client_task is not None:
+            self._mqtt_client_task.cancel()
+            self._mqtt_client_task = None
+
+    def _remove_callback(self, topic: str, callback: Callable):
+        """
+        Removes a single callback of a topic, without updating the subscriptions at the broker
+        """
+        if topic in self._callbacks:
+            self._callbacks[topic] = list(filter(lambda x: x != callback, self._callbacks[topic]))
+        self._topic_trie.remove(topic, callback)
 
     def _create_mqtt_client(self) -> Client:
-        return Client(
-            hostname=self._host,
-            port=self._port,
-            username=self._mqtt_user,
-            password=self._mqtt_password,
-            identifier=f"{self._mqtt_client_id}-{uuid.uuid4()}",
-        )
+        return _create_client(self._host, self._port, self._mqtt_user, self._mqtt_password)
 
     async def _start_mqtt_client_task(self):
         self._mqtt_client_task = asyncio.ensure_future(self._mqtt_client_task_function())
@@ -94,7 +243,9 @@ class MqttClient:
                 async with self._create_mqtt_client() as client:
                     self.__mqtt_client = client
                     try:
-                        await client.subscribe("hasp/#")
+                        self._broker_subscriptions = {}
+                        self._broker_wildcard_subscriptions = set()
+                        await self._update_broker_subscriptions()
                         async for message in client.messages:
                             await self._handle_message(message)
                     finally:
@@ -102,12 +253,119 @@ class MqttClient:
             except asyncio.CancelledError:
                 break
             except Exception as ex:
-                _LOGGER.warning(f"Error: {ex}; Reconnecting in {self._reconnect_interval_seconds} seconds ...")
-                await asyncio.sleep(self._reconnect_interval_seconds)
+                _LOGGER.warning(f"Error: {ex}; Reconnecting in {RECONNECT_INTERVAL_SECONDS} seconds ...")
+                await asyncio.sleep(RECONNECT_INTERVAL_SECONDS)
+
+    async def _update_broker_subscriptions(self):
+        """
+        Subscribes to (only) the topics with registered callbacks at the broker, so the broker
+        does not send messages nobody is interested in.
+        """
+        async with self._broker_subscriptions_lock:
+            client = self.__mqtt_client
+            if client is None:
+                # subscriptions are updated once connected
+                return
+
+            topics = dict.fromkeys(
+                reduce_topic_filters([topic for topic, callbacks in self._callbacks.items() if len(callbacks) > 0])
+            )
+            added = [topic for topic in topics if topic not in self._broker_subscriptions]
+            removed = [topic for topic in self._broker_subscriptions if topic not in topics]
+            # subscribe first, so no messages are missed when a topic is replaced by a broader one
+            if len(added) > 0:
+                await client.subscribe([(topic, 0) for topic in added])
+            if len(removed) > 0:
+                await client.unsubscribe(removed)
+            self._broker_subscriptions = topics
+            self._broker_wildcard_subscriptions = {topic for topic in topics if has_wildcards(topic)}
+
+    async def _add_broker_subscription(self, topic: str):
+        """
+        Subscribes to a single (newly registered) topic at the broker, unless it is covered by an existing
+        subscription. In contrast to _update_broker_subscriptions(), this only checks the given topic.
+        """
+        async with self._broker_subscriptions_lock:
+            client = self.__mqtt_client
+            if client is None:
+                # subscriptions are updated once connected
+                return
+
+            if topic in self._broker_subscriptions:
+                return
+            if any(topic_filter_covers(other, topic) for other in self._broker_wildcard_subscriptions):
+                return
+
+            # subscribe first, so no messages are missed when topics are replaced by a broader one
+            await client.subscribe([(topic, 0)])
+            self._broker_subscriptions[topic] = None
+            if not has_wildcards(topic):
+                return
+
+            covered = [other for other in self._broker_subscriptions if other != topic and topic_filter_covers(topic, other)]
+            if len(covered) > 0:
+                await client.unsubscribe(covered)
+                for other in covered:
+                    self._broker_subscriptions.pop(other)
+                self._broker_wildcard_subscriptions.difference_update(covered)
+            self._broker_wildcard_subscriptions.add(topic)
 
     async def _handle_message(self, message: Message):
-        for topic, callbacks in self._callbacks.items():
-            if message.topic.matches(topic):
-                for callback in callbacks:
-                    # convert topic to string to avoid exposing the aiomqtt.Topic class to the caller
-                    await callback(str(message.topic), message.payload)
+        # convert topic to string to avoid exposing the aiomqtt.Topic class to the caller
+        topic = str(message.topic)
+        for callback in self._topic_trie.match(topic):
+            await callback(topic, message.payload)
+
+
+# clients are bound to the event loop they have been created in
+_shared_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, MqttClient]]" = weakref.WeakKeyDictionary()
+_reference_counts: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, int]]" = weakref.WeakKeyDictionary()
+
+
+def acquire_mqtt_client(host: str, port: int, mqtt_user: str, mqtt_password: str) -> MqttClient:
+    """
+    Returns the client used to communicate with the given broker, which is shared by all users
+    of the broker (with the same credentials) within the running event loop, so messages of all plates
+    are received using a single connection.
+    Each call must be paired with a call to release_mqtt_client() within the same event loop.
+    :param host: the host of the broker
+    :param port: the port of the broker
+    :param mqtt_user: the username used to authenticate
+    :param mqtt_password: the password used to authenticate
+    :return: the client
+    """
+    loop = asyncio.get_running_loop()
+    loop_clients = _shared_clients.setdefault(loop, {})
+    loop_reference_counts = _reference_counts.setdefault(loop, {})
+    key = (host, port, mqtt_user, mqtt_password)
+    client = loop_clients.get(key, None)
+    if client is None:
+        client = MqttClient(host, port, mqtt_user, mqtt_password)
+        loop_clients[key] = client
+        loop_reference_counts[key] = 0
+    loop_reference_counts[key] += 1
+    return client
+
+
+def release_mqtt_client(client: MqttClient):
+    """
+    Releases a client returned by acquire_mqtt_client(). Once the client has been released by all users,
+    it is closed, together with the publisher of the same broker (see get_mqtt_publisher()).
+    :param client: the client
+    """
+    loop = asyncio.get_running_loop()
+    loop_clients = _shared_clients.get(loop, {})
+    loop_reference_counts = _reference_counts.get(loop, {})
+    key = (client._host, client._port, client._mqtt_user, client._mqtt_password)
+    if loop_clients.get(key, None) is not client:
+        return
+    loop_reference_counts[key] -= 1
+    if loop_reference_counts[key] > 0:
+        return
+    loop_clients.pop(key)
+    loop_reference_counts.pop(key)
+    client.close()
+
+    publisher = _publishers.get(loop, {}).pop(key, None)
+    if publisher is not None:
+        publisher.close()
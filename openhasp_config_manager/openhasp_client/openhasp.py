@@ -1,18 +1,24 @@
 import asyncio
 import logging
-from typing import Dict, List, Any, Callable, Tuple, Optional, Awaitable
+import weakref
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Any, Callable, Tuple, Optional, Awaitable
 
 import orjson
 from openhasp_config_manager.gui.util import info
-from openhasp_config_manager.openhasp_client.image_processor import OpenHaspImageProcessor
 from openhasp_config_manager.openhasp_client.model.configuration.gui_config import GuiConfig
 from openhasp_config_manager.openhasp_client.model.configuration.hasp_config import HaspConfig
 from openhasp_config_manager.openhasp_client.model.configuration.http_config import HttpConfig
 from openhasp_config_manager.openhasp_client.model.configuration.mqtt_config import MqttConfig
 from openhasp_config_manager.openhasp_client.model.device import Device
-from openhasp_config_manager.openhasp_client.mqtt_client import MqttClient
-from openhasp_config_manager.openhasp_client.telnet_client import OpenHaspTelnetClient
-from openhasp_config_manager.openhasp_client.webservice_client import WebserviceClient
+
+if TYPE_CHECKING:
+    from openhasp_config_manager.openhasp_client.async_webservice_client import AsyncWebserviceClient
+    from openhasp_config_manager.openhasp_client.image_processor import OpenHaspImageProcessor
+    from openhasp_config_manager.openhasp_client.mqtt_client import MqttClient
+    from openhasp_config_manager.openhasp_client.telnet_client import OpenHaspTelnetClient
+    from openhasp_config_manager.openhasp_client.http_session import RequestStats
+    from openhasp_config_manager.openhasp_client.webservice_client import WebserviceClient
 
 
 class OpenHaspClient:
@@ -24,28 +30,111 @@ class OpenHaspClient:
         """
         self._device = device
 
-        self._image_processor = OpenHaspImageProcessor()
+        # the clients (and their dependencies) are only created once they are used,
+        # f.ex. sending a command via MQTT does not need the webservice or telnet clients
+        self.__image_processor: Optional["OpenHaspImageProcessor"] = None
+        self.__webservice_client: Optional["WebserviceClient"] = None
+        self.__async_webservice_client: Optional["AsyncWebserviceClient"] = None
+        self.__mqtt_client: Optional["MqttClient"] = None
+        # the callbacks registered by this client at the (shared) MQTT client
+        self.__mqtt_subscriptions: List[Tuple[str, Callable]] = []
+        self.__mqtt_client_finalizer: Optional[weakref.finalize] = None
+        self.__telnet_client: Optional["OpenHaspTelnetClient"] = None
+
+    @property
+    def _image_processor(self) -> "OpenHaspImageProcessor":
+        if self.__image_processor is None:
+            from openhasp_config_manager.openhasp_client.image_processor import OpenHaspImageProcessor
+
+            self.__image_processor = OpenHaspImageProcessor()
+        return self.__image_processor
+
+    @property
+    def _webservice_client(self) -> "WebserviceClient":
+        if self.__webservice_client is None:
+            from openhasp_config_manager.openhasp_client.webservice_client import WebserviceClient
+
+            self.__webservice_client = WebserviceClient(
+                url=self._device.config.openhasp_config_manager.device.ip,
+                username=self._device.config.http.user,
+                password=self._device.config.http.password,
+            )
+        return self.__webservice_client
 
-        self._webservice_client = WebserviceClient(
-            url=device.config.openhasp_config_manager.device.ip,
-            username=self._device.config.http.user,
-            password=self._device.config.http.password,
-        )
+    @property
+    def _async_webservice_client(self) -> "AsyncWebserviceClient":
+        if self.__async_webservice_client is None:
+            from openhasp_config_manager.openhasp_client.async_webservice_client import AsyncWebserviceClient
 
-        self._mqtt_client = MqttClient(
-            host=device.config.mqtt.host,
-            port=device.config.mqtt.port,
-            mqtt_user=device.config.mqtt.user,
-            mqtt_password=device.config.mqtt.password,
-        )
+            self.__async_webservice_client = AsyncWebserviceClient(
+                url=self._device.config.openhasp_config_manager.device.ip,
+                username=self._device.config.http.user,
+                password=self._device.config.http.password,
+            )
+        return self.__async_webservice_client
+
+    @property
+    def _mqtt_client(self) -> "MqttClient":
+        if self.__mqtt_client is None:
+            from openhasp_config_manager.openhasp_client.mqtt_client import MqttClient, acquire_mqtt_client
+
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+
+            if loop is None:
+                # connections are shared within an event loop, so outside of one the client gets a connection of its own
+                self.__mqtt_client = MqttClient(
+                    host=self._device.config.mqtt.host,
+                    port=self._device.config.mqtt.port,
+                    mqtt_user=self._device.config.mqtt.user,
+                    mqtt_password=self._device.config.mqtt.password,
+                )
+            else:
+                # all clients of plates using the same broker share a single connection
+                self.__mqtt_client = acquire_mqtt_client(
+                    host=self._device.config.mqtt.host,
+                    port=self._device.config.mqtt.port,
+                    mqtt_user=self._device.config.mqtt.user,
+                    mqtt_password=self._device.config.mqtt.password,
+                )
+                # release the connection, if this client is garbage collected without being closed
+                self.__mqtt_client_finalizer = weakref.finalize(
+                    self, _release_mqtt_client, loop, self.__mqtt_client, self.__mqtt_subscriptions
+                )
+        return self.__mqtt_client
 
-        self._telnet_client = OpenHaspTelnetClient(
-            host=device.config.openhasp_config_manager.device.ip,
-            port=device.config.telnet.port,
-            baudrate=device.config.debug.baud,
-            user=device.config.http.user,
-            password=device.config.http.password,
-        )
+    async def close(self):
+        """
+        Cancels all callbacks of this client and releases its (shared) connections
+        """
+        if self.__mqtt_client is not None:
+            for topic, callback in list(self.__mqtt_subscriptions):
+                await self.__mqtt_client.cancel_callback(topic=topic, callback=callback)
+            self.__mqtt_subscriptions.clear()
+            if self.__mqtt_client_finalizer is not None:
+                self.__mqtt_client_finalizer()
+            else:
+                self.__mqtt_client.close()
+            self.__mqtt_client = None
+            self.__mqtt_client_finalizer = None
+        if self.__async_webservice_client is not None:
+            await self.__async_webservice_client.close()
+
+    @property
+    def _telnet_client(self) -> "OpenHaspTelnetClient":
+        if self.__telnet_client is None:
+            from openhasp_config_manager.openhasp_client.telnet_client import OpenHaspTelnetClient
+
+            self.__telnet_client = OpenHaspTelnetClient(
+                host=self._device.config.openhasp_config_manager.device.ip,
+                port=self._device.config.telnet.port,
+                baudrate=self._device.config.debug.baud,
+                user=self._device.config.http.user,
+                password=self._device.config.http.password,
+            )
+        return self.__telnet_client
 
     async def set_text(self, obj: str, text: str):
         """
@@ -350,13 +439,22 @@ class OpenHaspClient:
         """
         topic = f"hasp/{self._device.config.mqtt.name}/{path}"
         await self._mqtt_client.subscribe(topic, callback)
+        if (topic, callback) not in self.__mqtt_subscriptions:
+            self.__mqtt_subscriptions.append((topic, callback))
 
     async def cancel_callback(self, callback: Callable = None):
         """
         Cancel a callback which was previously registered, f.ex. via listen_event (or listen_state)
         :param callback: the specific callback to cancel
         """
-        await self._mqtt_client.cancel_callback(callback=callback)
+        if callback is None:
+            raise ValueError("Must specify a callback")
+
+        # only cancel the callbacks registered by this client, the MQTT client is shared with other plates
+        for topic, subscribed_callback in list(self.__mqtt_subscriptions):
+            if subscribed_callback == callback:
+                self.__mqtt_subscriptions.remove((topic, subscribed_callback))
+                await self._mqtt_client.cancel_callback(topic=topic, callback=callback)
 
     async def command(self, keyword: str = None, params: Any = None):
         """
@@ -458,6 +556,19 @@ class OpenHaspClient:
         """
         return self._webservice_client.get_files()
 
+    def get_request_stats(self) -> "RequestStats":
+        """
+        :return: the timing statistics of all http requests sent to the device within this process
+        """
+        return self._webservice_client.get_request_stats()
+
+    def get_file_sizes(self) -> Dict[str, int]:
+        """
+        Retrieve the size of all files on the device
+        :return: "file name"->"size in bytes" mapping of all files on the device
+        """
+        return self._webservice_client.get_file_sizes()
+
     def get_file_content(self, file_name: str) -> Optional[bytes]:
         return self._webservice_client.get_file_content(file_name)
 
@@ -537,6 +648,15 @@ class OpenHaspClient:
         info(f"Uploading '{name}'...")
         self._webservice_client.upload_file(name, content)
 
+    def upload_file_from_path(self, name: str, path: Path):
+        """
+        Upload a single file, streaming its content from disk
+        :param name: the target name of the file on the device
+        :param path: the file to upload
+        """
+        info(f"Uploading '{name}'...")
+        self._webservice_client.upload_file_from_path(name, path)
+
     def take_screenshot(self) -> bytes:
         """
         Requests a screenshot from the device.
@@ -544,6 +664,107 @@ class OpenHaspClient:
         """
         return self._webservice_client.take_screenshot()
 
+    # The methods below are the asyncio counterparts of the webservice methods above,
+    # which do not block the event loop (and f.ex. MQTT handling) while waiting for the device.
+
+    async def get_files_async(self) -> List[str]:
+        """
+        Retrieve a list of all file on the device
+        :return: a list of all files on the device
+        """
+        return await self._async_webservice_client.get_files()
+
+    async def get_file_sizes_async(self) -> Dict[str, int]:
+        """
+        Retrieve the size of all files on the device
+        :return: "file name"->"size in bytes" mapping of all files on the device
+        """
+        return await self._async_webservice_client.get_file_sizes()
+
+    async def get_file_content_async(self, file_name: str) -> Optional[bytes]:
+        return await self._async_webservice_client.get_file_content(file_name)
+
+    async def delete_file_async(self, file_name: str):
+        """
+        Delete a file on the device
+        :param file_name: the name of the file
+        """
+        await self._async_webservice_client.delete_file(file_name)
+
+    async def reboot_async(self):
+        """
+        Request a reboot
+        """
+        await self._async_webservice_client.reboot()
+
+    async def set_hasp_config_async(self, config: HaspConfig):
+        """
+        Set the "HASP" configuration
+        :param config: the configuration to set
+        """
+        await self._async_webservice_client.set_hasp_config(config)
+
+    async def get_http_config_async(self) -> HttpConfig:
+        """
+        Get the HTTP configuration
+        :return: the HTTP configuration
+        """
+        return await self._async_webservice_client.get_http_config()
+
+    async def set_http_config_async(self, config: HttpConfig):
+        """
+        Set the HTTP configuration
+        :param config: the configuration to set
+        """
+        await self._async_webservice_client.set_http_config(config)
+
+    async def get_mqtt_config_async(self) -> MqttConfig:
+        return await self._async_webservice_client.get_mqtt_config()
+
+    async def set_mqtt_config_async(self, config: MqttConfig):
+        """
+        Set the MQTT configuration
+        :param config: the configuration to set
+        """
+        await self._async_webservice_client.set_mqtt_config(config)
+
+    async def get_gui_config_async(self) -> GuiConfig:
+        """
+        Get the GUI configuration
+        :return: the GUI configuration
+        """
+        return await self._async_webservice_client.get_gui_config()
+
+    async def set_gui_config_async(self, config: GuiConfig):
+        """
+        Set the GUI configuration
+        :param config: the configuration to set
+        """
+        await self._async_webservice_client.set_gui_config(config)
+
+    async def upload_files_async(self, files: Dict[str, bytes]):
+        """
+        Upload a collection of files
+        :param files: "target file name"->"file content" mapping
+        """
+        await self._async_webservice_client.upload_files(files)
+
+    async def upload_file_async(self, name: str, content: bytes):
+        """
+        Upload a single file
+        :param name: the target name of the file on the device
+        :param content: the file content
+        """
+        info(f"Uploading '{name}'...")
+        await self._async_webservice_client.upload_file(name, content)
+
+    async def take_screenshot_async(self) -> bytes:
+        """
+        Requests a screenshot from the device.
+        :return: the screenshot as a bitmap
+        """
+        return await self._async_webservice_client.take_screenshot()
+
     async def shell(self):
         await self._telnet_client.shell()
 
@@ -559,3 +780,32 @@ class OpenHaspClient:
         :return: the object ID in the format "p{page}b{obj}"
         """
         return f"p{page}b{obj}" if page >= 0 else obj
+
+
+def _release_mqtt_client(
+    loop: asyncio.AbstractEventLoop, mqtt_client: "MqttClient", subscriptions: List[Tuple[str, Callable]]
+):
+    """
+    Releases the given (shared) MQTT client within the event loop it belongs to.
+
+    A finalizer runs on whichever thread drops the last reference to its object (f.ex. the Qt main thread),
+    so the release is handed to the event loop of the client, unless it is already running in it.
+    """
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+
+    if running_loop is loop:
+        _release_mqtt_client_in_loop(mqtt_client, subscriptions)
+    elif not loop.is_closed():
+        loop.call_soon_threadsafe(_release_mqtt_client_in_loop, mqtt_client, subscriptions)
+
+
+def _release_mqtt_client_in_loop(mqtt_client: "MqttClient", subscriptions: List[Tuple[str, Callable]]):
+    from openhasp_config_manager.openhasp_client.mqtt_client import release_mqtt_client
+
+    for topic, callback in subscriptions:
+        mqtt_client._remove_callback(topic, callback)
+    subscriptions.clear()
+    release_mqtt_client(mqtt_client)
@@ -0,0 +1,166 @@
+from typing import Dict, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+TOPIC_SEPARATOR = "/"
+SINGLE_LEVEL_WILDCARD = "+"
+MULTI_LEVEL_WILDCARD = "#"
+
+
+class _TrieNode(Generic[T]):
+    __slots__ = ("children", "values")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode[T]"] = {}
+        self.values: List[T] = []
+
+
+class TopicTrie(Generic[T]):
+    """
+    Maps MQTT topic filters (which may contain the wildcards "+" and "#") to values.
+
+    Finding the values of all filters matching a topic only depends on the number of levels
+    of the topic, not on the number of filters.
+    """
+
+    def __init__(self):
+        self._root: _TrieNode[T] = _TrieNode()
+
+    def add(self, topic_filter: str, value: T):
+        """
+        Adds a value for the given topic filter. A value is only added once per topic filter.
+        :param topic_filter: the topic filter, f.ex. "hasp/plate/state/+"
+        :param value: the value
+        """
+        node = self._root
+        for level in topic_filter.split(TOPIC_SEPARATOR):
+            node = node.children.setdefault(level, _TrieNode())
+        if value not in node.values:
+            node.values.append(value)
+
+    def remove(self, topic_filter: str, value: Optional[T] = None):
+        """
+        Removes a value of the given topic filter.
+        :param topic_filter: the topic filter
+        :param value: the value to remove, or None to remove all values of the topic filter
+        """
+        path = [self._root]
+        for level in topic_filter.split(TOPIC_SEPARATOR):
+            node = path[-1].children.get(level, None)
+            if node is None:
+                return
+            path.append(node)
+
+        node = path[-1]
+        if value is None:
+            node.values.clear()
+        elif value in node.values:
+            node.values.remove(value)
+
+        # prune nodes which are no longer needed
+        levels = topic_filter.split(TOPIC_SEPARATOR)
+        for parent, level in zip(reversed(path[:-1]), reversed(levels)):
+            child = parent.children[level]
+            if len(child.values) > 0 or len(child.children) > 0:
+                break
+            del parent.children[level]
+
+    def match(self, topic: str) -> List[T]:
+        """
+        Finds the values of all topic filters matching the given topic.
+        :param topic: the topic of a message, f.ex. "hasp/plate/state/p1b1"
+        :return: the values, without duplicates
+        """
+        levels = topic.split(TOPIC_SEPARATOR)
+        result: List[T] = []
+        self._match(self._root, levels, 0, result)
+        return result
+
+    def _match(self, node: _TrieNode[T], levels: List[str], index: int, result: List[T]):
+        # wildcards do not match topics starting with "$" (f.ex. "$SYS/...") on their first level
+        allow_wildcards = index > 0 or not levels[0].startswith("$")
+
+        if allow_wildcards:
+            # "#" also matches the parent level, f.ex. "hasp/#" matches "hasp"
+            multi_level = node.children.get(MULTI_LEVEL_WILDCARD, None)
+            if multi_level is not None:
+                self._add_values(multi_level, result)
+
+        if index == len(levels):
+            self._add_values(node, result)
+            return
+
+        child = node.children.get(levels[index], None)
+        if child is not None:
+            self._match(child, levels, index + 1, result)
+
+        if allow_wildcards:
+            single_level = node.children.get(SINGLE_LEVEL_WILDCARD, None)
+            if single_level is not None:
+                self._match(single_level, levels, index + 1, result)
+
+    @staticmethod
+    def _add_values(node: _TrieNode[T], result: List[T]):
+        for value in node.values:
+            if value not in result:
+                result.append(value)
+
+
+def topic_filter_covers(topic_filter: str, other: str) -> bool:
+    """
+    Checks whether all topics matching a topic filter are also matched by another one.
+    :param topic_filter: the (broader) topic filter, f.ex. "hasp/+/state/#"
+    :param other: the (narrower) topic filter, f.ex. "hasp/plate/state/p1b1"
+    :return: True if every topic matching "other" also matches "topic_filter"
+    """
+    levels = topic_filter.split(TOPIC_SEPARATOR)
+    other_levels = other.split(TOPIC_SEPARATOR)
+    for index, level in enumerate(levels):
+        if level == MULTI_LEVEL_WILDCARD:
+            return True
+        if index >= len(other_levels):
+            return False
+        other_level = other_levels[index]
+        if other_level == MULTI_LEVEL_WILDCARD:
+            return False
+        if level == SINGLE_LEVEL_WILDCARD:
+            if index == 0 and other_level.startswith("$"):
+                return False
+            continue
+        if level != other_level:
+            return False
+    return len(levels) == len(other_levels)
+
+
+def has_wildcards(topic_filter: str) -> bool:
+    """
+    :param topic_filter: a topic filter
+    :return: True if the topic filter contains a wildcard, false otherwise
+    """
+    return SINGLE_LEVEL_WILDCARD in topic_filter or MULTI_LEVEL_WILDCARD in topic_filter
+
+
+def reduce_topic_filters(topic_filters: List[str]) -> List[str]:
+    """
+    Removes topic filters which are covered by another one of the given filters,
+    so each message is only subscribed to once.
+    :param topic_filters: the topic filters
+    :return: the remaining topic filters, in the given order
+    """
+    unique = list(dict.fromkeys(topic_filters))
+    wildcard_filters = [f for f in unique if has_wildcards(f)]
+
+    # a filter without wildcards is covered by any (wildcard) filter matching it, like a topic
+    wildcard_trie: TopicTrie[str] = TopicTrie()
+    for topic_filter in wildcard_filters:
+        wildcard_trie.add(topic_filter, topic_filter)
+
+    result = []
+    for topic_filter in unique:
+        if has_wildcards(topic_filter):
+            covered = any(other != topic_filter and topic_filter_covers(other, topic_filter) for other in wildcard_filters)
+        else:
+            covered = len(wildcard_trie.match(topic_filter)) > 0
+        if not covered:
+            result.append(topic_filter)
+    return result
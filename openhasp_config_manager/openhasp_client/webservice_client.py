@@ -1,8 +1,15 @@
+import uuid
+from pathlib import Path
 from typing import Dict, List, Any, Optional
 
 import orjson
-import requests
 
+from openhasp_config_manager.openhasp_client.http_session import (
+    DEFAULT_TIMEOUT,
+    RequestStats,
+    RetryConfig,
+    get_session,
+)
 from openhasp_config_manager.openhasp_client.model.configuration.debug_config import DebugConfig
 from openhasp_config_manager.openhasp_client.model.configuration.gui_config import GuiConfig
 from openhasp_config_manager.openhasp_client.model.configuration.hasp_config import HaspConfig
@@ -14,20 +21,273 @@ GET = "GET"
 POST = "POST"
 DELETE = "DELETE"
 
+# the lowest throughput an upload is expected to reach, used to scale the timeout of an upload with its size
+MIN_UPLOAD_BYTES_PER_SECOND = 8 * 1024
+
+
+# Note: the helpers below are shared with the AsyncWebserviceClient
+
+
+def _compute_base_url(url: str) -> str:
+    if not url.startswith("http://"):
+        url = "http://" + url
+    if not url.endswith("/"):
+        url += "/"
+    return url
+
+
+def _hasp_config_form(config: HaspConfig) -> Dict[str, Any]:
+    data = {
+        "startpage": config.startpage,
+        "startdim": config.startdim,
+        "theme": config.theme,
+        "color1": config.color1,
+        "color2": config.color2,
+        "font": config.font,
+        "pages": config.pages,
+        "save": "hasp",
+    }
+
+    # ignore keys with None value
+    return {k: v for k, v in data.items() if v is not None}
+
+
+def _http_config_form(config: HttpConfig) -> Dict[str, Any]:
+    data = {
+        "user": config.user,
+        "pass": config.password,
+        "save": "http",
+    }
+
+    # ignore keys with None value
+    return {k: v for k, v in data.items() if v is not None}
+
+
+def _mqtt_config_form(config: MqttConfig) -> Dict[str, Any]:
+    data = {
+        "name": config.name,
+        "topic": {
+            "node": config.topic.node,
+            "group": config.topic.group,
+            "broadcast": config.topic.broadcast,
+            "hass": config.topic.hass,
+        },
+        "host": config.host,
+        "port": config.port,
+        "user": config.user,
+        "pass": config.password,
+        "save": "mqtt",
+    }
+
+    # ignore keys with None value
+    return {k: v for k, v in data.items() if v is not None}
+
+
+def _gui_config_form(config: GuiConfig) -> Dict[str, Any]:
+    data = {
+        "idle1": config.idle1,
+        "idle2": config.idle2,
+        "rotate": config.rotate,
+        "cursor": config.cursor,
+        "bckl": config.bckl,
+        "save": "gui",
+    }
+
+    # ignore keys with None value
+    return {k: v for k, v in data.items() if v is not None}
+
+
+def _telnet_config_form(config: TelnetConfig) -> Dict[str, Any]:
+    data = {
+        "enable": config.enable,
+        "port": config.port,
+        "save": "telnet",
+    }
+
+    # ignore keys with None value
+    return {k: v for k, v in data.items() if v is not None}
+
+
+def _debug_config_form(config: DebugConfig) -> Dict[str, Any]:
+    data = {
+        "ansi": config.ansi,
+        "baud": config.baud,
+        "tele": config.tele,
+        "host": config.host,
+        "port": config.port,
+        "proto": config.proto,
+        "log": config.log,
+        "save": "debug",
+    }
+
+    # ignore keys with None value
+    return {k: v for k, v in data.items() if v is not None}
+
+
+def _parse_http_config(data: Dict[str, Any]) -> HttpConfig:
+    return HttpConfig(
+        port=data["port"],
+        user=data["user"],
+        password=data["pass"],
+    )
+
+
+def _parse_mqtt_config(data: Dict[str, Any]) -> MqttConfig:
+    return MqttConfig(
+        name=data["name"],
+        host=data["host"],
+        port=data["port"],
+        user=data["user"],
+        password=data["pass"],
+        topic=MqttTopicConfig(
+            node=data["topic"]["node"],
+            group=data["topic"]["group"],
+            broadcast=data["topic"]["broadcast"],
+            hass=data["topic"]["hass"],
+        ),
+    )
+
+
+def _parse_gui_config(data: Dict[str, Any]) -> GuiConfig:
+    return GuiConfig(
+        idle1=data["idle1"],
+        idle2=data["idle2"],
+        rotate=data["rotate"],
+        cursor=data["cursor"],
+        bckl=data["bckl"],
+        bcklinv=data["bcklinv"],
+        invert=data["invert"],
+        calibration=data["calibration"],
+    )
+
+
+def _parse_file_list(response: bytes) -> List[Dict[str, Any]]:
+    """
+    :param response: the response of the "list" endpoint of a plate
+    :return: the entries of all files (not directories) within the response
+    """
+    response_data = orjson.loads(response.decode("utf-8"))
+    return list(filter(lambda x: x["type"] == "file", response_data))
+
+
+def _compute_upload_timeout(timeout: float, size: int) -> float:
+    """
+    :param timeout: the timeout used for regular requests
+    :param size: the size of the uploaded content
+    :return: the timeout to use for the upload
+    """
+    return max(timeout, size / MIN_UPLOAD_BYTES_PER_SECOND)
+
+
+class _MultipartFileStream:
+    """
+    A multipart/form-data request body containing a single file, which is read from disk
+    in chunks while the body is sent, instead of loading the whole file into memory.
+
+    The body has a known length (so it is not sent using chunked transfer encoding, which the
+    webserver of a plate does not support) and can be rewound, so a failed request can be retried.
+    """
+
+    def __init__(self, name: str, path: Path):
+        """
+        :param name: the name of the form field (and file)
+        :param path: the file to send
+        """
+        self._boundary = uuid.uuid4().hex
+        self._head = (
+            f'--{self._boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}"\r\n\r\n'
+        ).encode("utf-8")
+        self._tail = f"\r\n--{self._boundary}--\r\n".encode("utf-8")
+        self._path = path
+        self._file_size = path.stat().st_size
+        self._file = None
+        self._position = 0
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self._boundary}"
+
+    def __len__(self) -> int:
+        return len(self._head) + self._file_size + len(self._tail)
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence != 0:
+            raise ValueError(f"Unsupported whence: {whence}")
+        self._position = offset
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = len(self) - self._position
+
+        result = b""
+        while len(result) < size and self._position < len(self):
+            remaining = size - len(result)
+            file_start = len(self._head)
+            file_end = file_start + self._file_size
+            if self._position < file_start:
+                chunk = self._head[self._position : self._position + remaining]
+            elif self._position < file_end:
+                if self._file is None:
+                    self._file = self._path.open("rb")
+                self._file.seek(self._position - file_start)
+                chunk = self._file.read(min(remaining, file_end - self._position))
+                if len(chunk) == 0:
+                    raise IOError(f"File changed while uploading: {self._path}")
+            else:
+                offset = self._position - file_end
+                chunk = self._tail[offset : offset + remaining]
+            result += chunk
+            self._position += len(chunk)
+        return result
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
 
 class WebserviceClient:
-    def __init__(self, url: str, username: str, password: str):
+    def __init__(
+        self,
+        url: str,
+        username: str,
+        password: str,
+        retry_config: RetryConfig = RetryConfig(),
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        """
+        :param url: the url (or ip) of the plate
+        :param username: the username used to authenticate
+        :param password: the password used to authenticate
+        :param retry_config: the configuration of retries of failed requests
+        :param timeout: the timeout in seconds of each request
+        """
         self._username = username
         self._password = password
         self._base_url = self._compute_base_url(url)
+        self._timeout = timeout
+        # the session (and its connection) is shared with all other clients of the same plate
+        self._session = get_session(self._base_url, username, password, retry_config)
+
+    def get_request_stats(self) -> RequestStats:
+        """
+        :return: the timing statistics of all requests sent to the plate (by any client) within this process
+        """
+        return self._session.get_stats()
 
     def reboot(self):
         """
         Request a reboot
         """
+        # the plate may reboot before responding, so the request must not be retried
         self._do_request(
             method=GET,
             url=self._base_url + "reboot",
+            retry=False,
         )
 
     def set_hasp_config(self, config: HaspConfig):
@@ -35,24 +295,10 @@ class WebserviceClient:
         Set the "HASP" configuration
         :param config: the configuration to set
         """
-        data = {
-            "startpage": config.startpage,
-            "startdim": config.startdim,
-            "theme": config.theme,
-            "color1": config.color1,
-            "color2": config.color2,
-            "font": config.font,
-            "pages": config.pages,
-            "save": "hasp",
-        }
-
-        # ignore keys with None value
-        data = {k: v for k, v in data.items() if v is not None}
-
         self._do_request(
             method=POST,
             url=self._base_url + "config",
-            data=data,
+            data=_hasp_config_form(config),
         )
 
     def get_http_config(self) -> HttpConfig:
@@ -60,80 +306,35 @@ class WebserviceClient:
             method=GET,
             url=self._base_url + "api/config/http/",
         )
-
-        return HttpConfig(
-            port=data["port"],
-            user=data["user"],
-            password=data["pass"],
-        )
+        return _parse_http_config(data)
 
     def set_http_config(self, config: HttpConfig):
         """
         Set the HTTP configuration
         :param config: the configuration to set
         """
-        data = {
-            "user": config.user,
-            "pass": config.password,
-            "save": "http",
-        }
-
-        # ignore keys with None value
-        data = {k: v for k, v in data.items() if v is not None}
-
         self._do_request(
             method=POST,
             url=self._base_url + "config",
-            data=data,
+            data=_http_config_form(config),
         )
 
     def get_mqtt_config(self) -> MqttConfig:
-        data: Dict[str, Any] = self._do_request(
+        data = self._do_request(
             method=GET,
             url=self._base_url + "api/config/mqtt/",
         )
-
-        return MqttConfig(
-            name=data["name"],
-            host=data["host"],
-            port=data["port"],
-            user=data["user"],
-            password=data["pass"],
-            topic=MqttTopicConfig(
-                node=data["topic"]["node"],
-                group=data["topic"]["group"],
-                broadcast=data["topic"]["broadcast"],
-                hass=data["topic"]["hass"],
-            ),
-        )
+        return _parse_mqtt_config(data)
 
     def set_mqtt_config(self, config: MqttConfig):
         """
         Set the MQTT configuration
         :param config: the configuration to set
         """
-        data = {
-            "name": config.name,
-            "topic": {
-                "node": config.topic.node,
-                "group": config.topic.group,
-                "broadcast": config.topic.broadcast,
-                "hass": config.topic.hass,
-            },
-            "host": config.host,
-            "port": config.port,
-            "user": config.user,
-            "pass": config.password,
-            "save": "mqtt",
-        }
-
-        # ignore keys with None value
-        data = {k: v for k, v in data.items() if v is not None}
-
         self._do_request(
             method=POST,
             url=self._base_url + "config",
-            data=data,
+            data=_mqtt_config_form(config),
         )
 
     def get_gui_config(self) -> GuiConfig:
@@ -141,39 +342,17 @@ class WebserviceClient:
             method=GET,
             url=self._base_url + "api/config/gui/",
         )
-
-        return GuiConfig(
-            idle1=data["idle1"],
-            idle2=data["idle2"],
-            rotate=data["rotate"],
-            cursor=data["cursor"],
-            bckl=data["bckl"],
-            bcklinv=data["bcklinv"],
-            invert=data["invert"],
-            calibration=data["calibration"],
-        )
+        return _parse_gui_config(data)
 
     def set_gui_config(self, config: GuiConfig):
         """
         Set the GUI configuration
         :param config: the configuration to set
         """
-        data = {
-            "idle1": config.idle1,
-            "idle2": config.idle2,
-            "rotate": config.rotate,
-            "cursor": config.cursor,
-            "bckl": config.bckl,
-            "save": "gui",
-        }
-
-        # ignore keys with None value
-        data = {k: v for k, v in data.items() if v is not None}
-
         self._do_request(
             method=POST,
             url=self._base_url + "config",
-            data=data,
+            data=_gui_config_form(config),
         )
 
     def set_telnet_config(self, config: TelnetConfig):
@@ -181,19 +360,10 @@ class WebserviceClient:
         Set the Debug configuration
         :param config: the configuration to set
         """
-        data = {
-            "enable": config.enable,
-            "port": config.port,
-            "save": "telnet",
-        }
-
-        # ignore keys with None value
-        data = {k: v for k, v in data.items() if v is not None}
-
         self._do_request(
             method=POST,
             url=self._base_url + "config",
-            data=data,
+            data=_telnet_config_form(config),
         )
 
     def set_debug_config(self, config: DebugConfig):
@@ -201,24 +371,10 @@ class WebserviceClient:
         Set the Debug configuration
         :param config: the configuration to set
         """
-        data = {
-            "ansi": config.ansi,
-            "baud": config.baud,
-            "tele": config.tele,
-            "host": config.host,
-            "port": config.port,
-            "proto": config.proto,
-            "log": config.log,
-            "save": "debug",
-        }
-
-        # ignore keys with None value
-        data = {k: v for k, v in data.items() if v is not None}
-
         self._do_request(
             method=POST,
             url=self._base_url + "config",
-            data=data,
+            data=_debug_config_form(config),
         )
 
     def upload_files(self, files: Dict[str, bytes]):
@@ -239,22 +395,54 @@ class WebserviceClient:
             method=POST,
             url=self._base_url + "edit",
             files={f"{name}": content},
+            timeout=_compute_upload_timeout(self._timeout, len(content)),
+            # uploads replace the file, so they can safely be repeated
+            retry=True,
         )
 
+    def upload_file_from_path(self, name: str, path: Path):
+        """
+        Upload a single file, streaming its content from disk
+        :param name: the target name of the file on the device
+        :param path: the file to upload
+        """
+        body = _MultipartFileStream(name, path)
+        try:
+            self._do_request(
+                method=POST,
+                url=self._base_url + "edit",
+                data=body,
+                headers={"Content-Type": body.content_type},
+                timeout=_compute_upload_timeout(self._timeout, len(body)),
+                # uploads replace the file, and the body is rewound for each attempt
+                retry=True,
+            )
+        finally:
+            body.close()
+
     def get_files(self) -> List[str]:
         """
         Retrieve a list of all file on the device
         :return: a list of all files on the device
         """
+        files = self._list_files()
+        file_names = list(map(lambda x: x["name"], files))
+        return file_names
+
+    def get_file_sizes(self) -> Dict[str, int]:
+        """
+        Retrieve the size of all files on the device, using the same single request as get_files()
+        :return: "file name"->"size in bytes" mapping of all files on the device
+        """
+        files = self._list_files()
+        return {f["name"]: f.get("size", -1) for f in files}
+
+    def _list_files(self) -> List[Dict[str, Any]]:
         response = self._do_request(
             method=GET,
             url=self._base_url + "list?dir=/",
         )
-        response_data = orjson.loads(response.decode("utf-8"))
-
-        files = list(filter(lambda x: x["type"] == "file", response_data))
-        file_names = list(map(lambda x: x["name"], files))
-        return file_names
+        return _parse_file_list(response)
 
     def get_file_content(self, file_name: str) -> Optional[bytes]:
         try:
@@ -300,6 +488,8 @@ class WebserviceClient:
         data: Any = None,
         headers: Dict = None,
         stream: bool = None,
+        timeout: float = None,
+        retry: Optional[bool] = None,
     ) -> Optional[List | Dict | bytes]:
         """
         Executes a http request based on the given parameters
@@ -309,13 +499,16 @@ class WebserviceClient:
         :param params: query parameters that will be appended to the url
         :param json: request body
         :param headers: custom headers
+        :param timeout: the timeout of the request, defaults to the timeout of this client
+        :param retry: whether to retry the request if it fails for transient reasons,
+            None to only retry idempotent requests, see PlateSession.request()
         :return: the response parsed as a json
         """
         _headers = {}
         if headers is not None:
             _headers.update(headers)
 
-        response = requests.request(
+        response = self._session.request(
             method,
             url,
             headers=_headers,
@@ -323,8 +516,8 @@ class WebserviceClient:
             json=json,
             files=files,
             data=data,
-            auth=(self._username, self._password),
-            timeout=5,
+            timeout=self._timeout if timeout is None else timeout,
+            retry=retry,
             stream=stream,
         )
 
@@ -338,8 +531,4 @@ class WebserviceClient:
 
     @staticmethod
     def _compute_base_url(url: str) -> str:
-        if not url.startswith("http://"):
-            url = "http://" + url
-        if not url.endswith("/"):
-            url += "/"
-        return url
+        return _compute_base_url(url)
@@ -0,0 +1,98 @@
+from pathlib import Path
+from typing import Dict, Iterable
+
+import orjson
+
+from openhasp_config_manager.util import calculate_checksum
+
+
+class BuildCache:
+    """
+    Keeps track of the input files each generated output file of a device depended on,
+    together with the content hash each input file had at the time the output was generated.
+
+    This allows an incremental build to skip the generation of output files
+    whose inputs have not changed since the last run.
+    """
+
+    VERSION = 1
+
+    def __init__(self, file: Path):
+        """
+        :param file: the file used to persist the cache
+        """
+        self._file = file
+        self._outputs: Dict[str, Dict[str, str]] = {}
+        self._checksums: Dict[Path, str] = {}
+
+    def load(self):
+        """
+        Loads the cache from disk. A missing or incompatible cache file results in an empty cache.
+        """
+        self._outputs = {}
+        if not self._file.is_file():
+            return
+
+        try:
+            data = orjson.loads(self._file.read_bytes())
+        except orjson.JSONDecodeError:
+            return
+
+        if data.get("version") != self.VERSION:
+            return
+        self._outputs = data.get("outputs", {})
+
+    def save(self):
+        """
+        Persists the cache to disk.
+        """
+        self._file.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": self.VERSION,
+            "outputs": self._outputs,
+        }
+        self._file.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+
+    def is_up_to_date(self, output_file: Path, dependencies: Iterable[Path]) -> bool:
+        """
+        Checks whether the given output file exists and all of its dependencies are unchanged
+        since the output was generated.
+        :param output_file: the generated output file
+        :param dependencies: the input files the output file depends on
+        :return: True if the output file does not need to be generated again, false otherwise
+        """
+        if not output_file.is_file():
+            return False
+
+        recorded = self._outputs.get(output_file.name, None)
+        if recorded is None:
+            return False
+
+        return recorded == self._compute_checksums(dependencies)
+
+    def update(self, output_file: Path, dependencies: Iterable[Path]):
+        """
+        Records the current state of the dependencies of the given output file.
+        :param output_file: the generated output file
+        :param dependencies: the input files the output file depends on
+        """
+        self._outputs[output_file.name] = self._compute_checksums(dependencies)
+
+    def remove(self, output_file: Path):
+        """
+        Removes all information about the given output file.
+        :param output_file: the output file
+        """
+        self._outputs.pop(output_file.name, None)
+
+    def _compute_checksums(self, dependencies: Iterable[Path]) -> Dict[str, str]:
+        return {str(path): self._get_checksum(path) for path in dependencies}
+
+    def _get_checksum(self, path: Path) -> str:
+        # files are not expected to change during a single run, so each file is only hashed once
+        if path not in self._checksums:
+            if path.is_file():
+                self._checksums[path] = calculate_checksum(path.read_bytes())
+            else:
+                self._checksums[path] = ""
+        return self._checksums[path]
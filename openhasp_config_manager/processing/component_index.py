@@ -0,0 +1,132 @@
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Type, TypeVar
+
+from openhasp_config_manager.openhasp_client.model.component import (
+    Component,
+    CmdComponent,
+    JsonlComponent,
+    TextComponent,
+)
+
+C = TypeVar("C", bound=Component)
+
+_cmd_reference_pattern = re.compile(r"L:/(.*\.cmd)")
+_jsonl_reference_pattern = re.compile(r"L:/(.*\.jsonl)")
+_image_reference_pattern = re.compile(r"L:/(.*\.(?:png|bin))")
+
+
+def _find_references(pattern: re.Pattern, component: TextComponent) -> List[str]:
+    """
+    Finds the names of all components referenced (by "L:/<name>") within the given component.
+    :param pattern: the pattern of the references to find, see _cmd_reference_pattern
+    :param component: the component to search in
+    :return: the distinct referenced names, in the order of their first appearance
+    """
+    result = {}
+    for line in component.content.splitlines():
+        result.update(dict.fromkeys(pattern.findall(line)))
+    return list(result)
+
+
+def _find_command_references(component: CmdComponent) -> List[str]:
+    return [command.split("/")[-1] for command in component.commands if command.endswith((".jsonl", ".cmd"))]
+
+
+class ComponentIndex:
+    """
+    An index of the components of a single device, including the references between them.
+    """
+
+    def __init__(self, components: List[Component]):
+        """
+        :param components: all components of the device (including common ones)
+        """
+        self._by_name: Dict[str, List[Component]] = {}
+        self._by_type: Dict[str, List[Component]] = {}
+        self._by_path: Dict[Path, List[Component]] = {}
+        for component in components:
+            self._by_name.setdefault(component.name, []).append(component)
+            self._by_type.setdefault(component.type, []).append(component)
+            self._by_path.setdefault(component.path, []).append(component)
+
+        # the reference graph, as names of the referenced components by referencing component
+        self._cmd_references: Dict[CmdComponent, List[str]] = {}
+        self._jsonl_references: Dict[CmdComponent, List[str]] = {}
+        self._image_references: Dict[TextComponent, List[str]] = {}
+        # the cmd and jsonl components referenced by the commands of a cmd component, in the order of the commands
+        self._command_references: Dict[CmdComponent, List[str]] = {}
+        for component in components:
+            if isinstance(component, CmdComponent):
+                self._cmd_references[component] = _find_references(_cmd_reference_pattern, component)
+                self._jsonl_references[component] = _find_references(_jsonl_reference_pattern, component)
+                self._image_references[component] = _find_references(_image_reference_pattern, component)
+                self._command_references[component] = _find_command_references(component)
+            elif isinstance(component, JsonlComponent):
+                self._image_references[component] = _find_references(_image_reference_pattern, component)
+
+    def find_by_name(self, name: str, component_type: Type[C] = Component) -> List[C]:
+        """
+        :param name: the name of the component
+        :param component_type: the class of the components to find
+        :return: the components with the given name
+        """
+        return [c for c in self._by_name.get(name, []) if isinstance(c, component_type)]
+
+    def get(self, name: str, component_type: Type[C] = Component) -> Optional[C]:
+        """
+        :param name: the name of the component
+        :param component_type: the class of the component to find
+        :return: the first component with the given name, or None
+        """
+        return next(iter(self.find_by_name(name, component_type)), None)
+
+    def find_by_type(self, type: str) -> List[Component]:
+        """
+        :param type: the type (file extension) of the components, e.g. "jsonl"
+        :return: the components of the given type
+        """
+        return list(self._by_type.get(type, []))
+
+    def find_by_path(self, path: Path) -> List[Component]:
+        """
+        :param path: the path of the file the component was read from
+        :return: the components read from the given path
+        """
+        return list(self._by_path.get(path, []))
+
+    def get_cmd_references(self, component: CmdComponent) -> List[str]:
+        """
+        :return: the names of the cmd components referenced by the given cmd component
+        """
+        return self._references_of(self._cmd_references, component, _cmd_reference_pattern)
+
+    def get_jsonl_references(self, component: CmdComponent) -> List[str]:
+        """
+        :return: the names of the jsonl components referenced by the given cmd component
+        """
+        return self._references_of(self._jsonl_references, component, _jsonl_reference_pattern)
+
+    def get_image_references(self, component: TextComponent) -> List[str]:
+        """
+        :return: the names of the image components referenced by the given cmd or jsonl component
+        """
+        return self._references_of(self._image_references, component, _image_reference_pattern)
+
+    def get_command_references(self, component: CmdComponent) -> List[str]:
+        """
+        :return: the names of the cmd and jsonl components referenced by the commands of the given cmd component,
+            in the order of the commands
+        """
+        result = self._command_references.get(component, None)
+        if result is None:
+            result = _find_command_references(component)
+        return result
+
+    @staticmethod
+    def _references_of(references: Dict[TextComponent, List[str]], component: TextComponent, pattern: re.Pattern) -> List[str]:
+        result = references.get(component, None)
+        if result is None:
+            # the component is not part of the index
+            result = _find_references(pattern, component)
+        return result
@@ -1,7 +1,6 @@
 import json
-from typing import List, Dict, Any
-
-import orjson
+from pathlib import Path
+from typing import Any, List, Dict, Optional, Mapping, Set
 
 from openhasp_config_manager.openhasp_client.model.component import (
     Component,
@@ -13,10 +12,18 @@ from openhasp_config_manager.openhasp_client.model.component import (
 from openhasp_config_manager.openhasp_client.model.configuration.config import Config
 from openhasp_config_manager.openhasp_client.model.device import Device
 from openhasp_config_manager.processing.jsonl import JsonlObjectProcessor
-from openhasp_config_manager.processing.preprocessor.jsonl_preprocessor import JsonlPreProcessor
-from openhasp_config_manager.processing.template_rendering import render_dict_recursive, _render_template
+from openhasp_config_manager.processing.preprocessor.jsonl_preprocessor import JsonlPreProcessor, JsonlObject
+from openhasp_config_manager.processing.template_rendering import (
+    render_dict_recursive,
+    _render_template,
+    is_template,
+    get_referenced_names,
+)
+from openhasp_config_manager.processing.variable_scope import VariableScope
 from openhasp_config_manager.processing.variables import VariableManager
-from openhasp_config_manager.util import merge_dict_recursive
+
+# marks a variable which is not defined
+_MISSING = object()
 
 
 class DeviceProcessor:
@@ -30,13 +37,32 @@ class DeviceProcessor:
         device: Device,
         jsonl_object_processors: List[JsonlObjectProcessor],
         variable_manager: VariableManager,
+        jsonl_preprocessor: Optional[JsonlPreProcessor] = None,
     ):
+        """
+        :param device: the device
+        :param jsonl_object_processors: the processors to apply to each jsonl object
+        :param variable_manager: the variable manager to use
+        :param jsonl_preprocessor: the preprocessor used to parse jsonl components, share it between processors
+            to parse components (e.g. common ones) only once
+        """
         self._device = device
 
         self._jsonl_components: List[JsonlComponent] = []
         self._others: List[Component] = []
 
-        self._jsonl_preprocessor = JsonlPreProcessor()
+        # caches for the (expensive) computation of template variables, see _compute_jsonl_template_variables
+        self._object_maps: Dict[JsonlComponent, Dict[str, Mapping]] = {}
+        # by path of the components, components within the same directory share the same variables
+        self._component_template_vars: Dict[Path, VariableScope] = {}
+        # the result of applying all components in the order they have been added, the intermediate results
+        # before applying each component, and the rendered objects of each component
+        self._accumulated_template_vars: Optional[VariableScope] = None
+        self._accumulated_prefixes: List[VariableScope] = []
+        self._accumulated_objects: List[Dict[str, any]] = []
+        self._referenced_names: Dict[JsonlComponent, Optional[Set[str]]] = {}
+
+        self._jsonl_preprocessor = jsonl_preprocessor if jsonl_preprocessor is not None else JsonlPreProcessor()
         self._jsonl_object_processors = jsonl_object_processors
         self._variable_manager = variable_manager
 
@@ -51,10 +77,12 @@ class DeviceProcessor:
 
     def _add_jsonl(self, component: JsonlComponent):
         self._jsonl_components.append(component)
+        # the accumulated variables include the objects of all known components
+        self._accumulated_template_vars = None
 
     def normalize(self, device: Device, component: Component) -> str | bytes:
         if isinstance(component, JsonlComponent):
-            template_vars: Dict[str, any] = self._compute_jsonl_template_variables(device, component)
+            template_vars: Mapping[str, any] = self._compute_jsonl_template_variables(device, component)
             return self._normalize_jsonl(self._device.config, component, template_vars)
         elif isinstance(component, CmdComponent):
             template_vars: Dict[str, any] = {}
@@ -70,89 +98,232 @@ class DeviceProcessor:
         else:
             raise AssertionError(f"Received unexpected input: {component}")
 
-    def _normalize_jsonl(self, config: Config, component: JsonlComponent, template_vars: Dict[str, any]) -> str:
-        normalized_objects: List[str] = []
+    def _normalize_jsonl(self, config: Config, component: JsonlComponent, template_vars: Mapping[str, any]) -> str:
+        objects = self._jsonl_preprocessor.parse_jsonl_objects(component.content)
+        rendered_objects = [self._render_jsonl_object(ob.data, template_vars) for ob in objects]
 
-        objects = self._jsonl_preprocessor.split_jsonl_objects(component.content)
-        for ob in objects:
-            preprocessed = self._jsonl_preprocessor.cleanup_object_for_json_parsing(ob)
-            p = self._normalize_jsonl_object(config, component, preprocessed, template_vars)
-            normalized_objects.append(p)
-
-        return "\n".join(normalized_objects)
+        # all objects of the component are processed at once
+        processed_objects = rendered_objects
+        for processor in self._jsonl_object_processors:
+            processed_objects = processor.process_objects(processed_objects, config, template_vars)
 
-    def _normalize_jsonl_object(
-        self, config: Config, component: JsonlComponent, ob: str, template_vars: Dict[str, any]
-    ) -> str:
-        parsed = orjson.loads(ob)
+        return "\n".join(json.dumps(processed, indent=None) for processed in processed_objects)
 
-        normalized_object = {}
-        for key, value in parsed.items():
-            if isinstance(value, str):
+    @staticmethod
+    def _render_jsonl_object(ob: Mapping[str, any], template_vars: Mapping[str, any]) -> Dict[str, any]:
+        # the parsed object is read-only (and shared with the object map), so the rendered values go into a new dict
+        rendered_object = {}
+        for key, value in ob.items():
+            if isinstance(value, str) and is_template(value):
                 rendered_value = _render_template(value, template_vars)
-                normalized_object[key] = rendered_value
+                rendered_object[key] = rendered_value
             else:
-                normalized_object[key] = value
-
-        processed = normalized_object
-        for processor in self._jsonl_object_processors:
-            processed = processor.process(processed, config, template_vars)
-
-        return json.dumps(processed, indent=None)
+                rendered_object[key] = value
+        return rendered_object
 
     def _normalize_cmd(self, _device_config, component: CmdComponent, template_vars: Dict[str, any]) -> str:
         return _render_template(component.content, template_vars)
 
-    def _compute_jsonl_template_variables(self, device: Device, component: Component) -> Dict[str, Any]:
+    def _compute_jsonl_template_variables(self, device: Device, component: Component) -> VariableScope:
         """
         Computes a map of "variable" -> "evaluated value in the given path context" for the given component.
 
+        The variables and (rendered) objects of all other components are applied in the order the components
+        have been added, followed by those of the given component. The variables of the given component therefore
+        take precedence over those of all others, while an object defined by multiple components resolves
+        to the definition of the component added first, except for the given component, whose own definitions
+        have the lowest priority.
+
+        The result of applying all components in the order they have been added is only computed once
+        per processor and used as it is for the last component. For any other component, the components
+        added after it are applied again on top of the components preceding it, but their rendered objects
+        are reused, unless they reference a variable whose value depends on the given component.
+
         :param component: the component to use as a context for evaluating template variables
         :return: map of "variable" -> "evaluated value in the given path context"
         """
-        result = {}
+        if component not in self._jsonl_components:
+            raise AssertionError(f"Unknown component: {component.name}")
 
-        # object specific variables for all components that the processor currently knows about
-        sorted_components = list(sorted(self._jsonl_components, key=lambda x: x == component))
-        assert sorted_components[-1] == component
-        for c in sorted_components:
-            jsonl_objects = self._jsonl_preprocessor.split_jsonl_objects(c.content)
+        self._accumulate_template_variables(device)
+        index = self._jsonl_components.index(component)
+        if index == len(self._jsonl_components) - 1:
+            return self._accumulated_template_vars
 
-            component_template_vars = self._variable_manager.get_vars(c.path)
-            component_template_vars["device"] = self._device.config.openhasp_config_manager.device
-            if "/common/" in str(c.path):
-                # for common components, also include device specific, top-level variables
-                device_vars = self._variable_manager.get_vars(device.path)
-                component_template_vars = merge_dict_recursive(component_template_vars, device_vars)
+        # names of variables whose value may differ from the one seen by the accumulated components,
+        # since the given component is not applied below the components following it
+        changed_names = set(self._get_object_map(component).keys())
+        changed_names.update(self._get_component_template_vars(device, component).keys())
 
-            c_result = self._compute_object_map(jsonl_objects)
-            merged_template_variables = merge_dict_recursive(result, component_template_vars)
-            merged_template_variables = merge_dict_recursive(merged_template_variables, component_template_vars)
-
-            rendered_template_vars = render_dict_recursive(
-                input=c_result, template_vars=merge_dict_recursive(merged_template_variables, c_result)
-            )
-            rendered_template_vars = merge_dict_recursive(rendered_template_vars, merged_template_variables)
+        result = self._accumulated_prefixes[index]
+        for c_index in range(index + 1, len(self._jsonl_components)):
+            c = self._jsonl_components[c_index]
+            accumulated_objects = self._accumulated_objects[c_index]
+            if self._is_affected_by_changed_names(device, c, c_index, result, changed_names):
+                rendered_objects = self._render_objects_of_component(device, c, result)
+                changed_names.update(
+                    key
+                    for key in accumulated_objects.keys() | rendered_objects.keys()
+                    if not self._is_same_value(accumulated_objects.get(key, _MISSING), rendered_objects.get(key, _MISSING))
+                )
+            else:
+                rendered_objects = accumulated_objects
+            result = VariableScope(rendered_objects, result, self._get_component_template_vars(device, c))
 
-            result = merge_dict_recursive(result, rendered_template_vars)
+        result = self._apply_template_variables_of_component(device, component, result)
 
         if result is None:
             raise AssertionError("Unexpected None value")
         return result
 
-    def _compute_object_map(self, jsonl_objects: List[str]) -> Dict[str, dict]:
+    def _accumulate_template_variables(self, device: Device):
+        """
+        Applies the variables and objects of all known components in the order they have been added,
+        keeping the intermediate results, see _compute_jsonl_template_variables.
+        """
+        if self._accumulated_template_vars is not None:
+            return
+
+        self._accumulated_prefixes = []
+        self._accumulated_objects = []
+        accumulated = VariableScope()
+        for c in self._jsonl_components:
+            self._accumulated_prefixes.append(accumulated)
+            rendered_objects = self._render_objects_of_component(device, c, accumulated)
+            self._accumulated_objects.append(rendered_objects)
+            accumulated = VariableScope(rendered_objects, accumulated, self._get_component_template_vars(device, c))
+        self._accumulated_template_vars = accumulated
+
+    def _is_affected_by_changed_names(
+        self,
+        device: Device,
+        component: JsonlComponent,
+        index: int,
+        template_vars: VariableScope,
+        changed_names: Set[str],
+    ) -> bool:
+        """
+        Checks whether the objects of the given component would render differently on top of the given
+        template variables than on top of the accumulated ones.
+
+        :param index: the index of the given component
+        :param template_vars: the template variables to render the objects on top of
+        :param changed_names: the names of variables which may differ from the accumulated ones
+        :return: True if the objects have to be rendered again, false if the accumulated ones can be reused
+        """
+        referenced_names = self._get_referenced_names(component)
+        if referenced_names is None:
+            return True
+
+        affected_names = referenced_names & changed_names
+        if len(affected_names) <= 0:
+            return False
+
+        component_template_vars = self._get_component_template_vars(device, component)
+        object_map = self._get_object_map(component)
+        accumulated = VariableScope(self._accumulated_prefixes[index], component_template_vars, object_map)
+        current = VariableScope(template_vars, component_template_vars, object_map)
+        try:
+            return any(
+                not self._is_same_value(accumulated.get(name, _MISSING), current.get(name, _MISSING))
+                for name in affected_names
+            )
+        except AssertionError:
+            # incompatible values, let rendering decide what to do with them
+            return True
+
+    def _get_referenced_names(self, component: JsonlComponent) -> Optional[Set[str]]:
+        """
+        :return: the names of all variables referenced by the templates of the given component,
+            or None if they cannot be determined up front
+        """
+        if component not in self._referenced_names:
+            self._referenced_names[component] = get_referenced_names(self._get_object_map(component))
+        return self._referenced_names[component]
+
+    @classmethod
+    def _is_same_value(cls, a: Any, b: Any) -> bool:
+        """
+        Compares two (possibly nested) template variables. In contrast to ==, values of different types
+        (f.ex. 1 and True) are considered different, since they render differently.
+        """
+        if isinstance(a, Mapping) and isinstance(b, Mapping):
+            return a.keys() == b.keys() and all(cls._is_same_value(a[key], b[key]) for key in a.keys())
+        if type(a) is not type(b):
+            return False
+        if isinstance(a, list):
+            return len(a) == len(b) and all(cls._is_same_value(x, y) for x, y in zip(a, b))
+        return a is b or a == b
+
+    def _apply_template_variables_of_component(
+        self, device: Device, component: JsonlComponent, template_vars: VariableScope
+    ) -> VariableScope:
+        """
+        Layers the variables and (rendered) objects of the given component on top of the given template variables.
+
+        :param device: the device
+        :param component: the component whose variables and objects should be applied
+        :param template_vars: the template variables to use as a base, this is not modified
+        :return: the resulting template variables
+        """
+        rendered_template_vars = self._render_objects_of_component(device, component, template_vars)
+
+        # variables take precedence over the rendered objects
+        return VariableScope(rendered_template_vars, template_vars, self._get_component_template_vars(device, component))
+
+    def _render_objects_of_component(
+        self, device: Device, component: JsonlComponent, template_vars: VariableScope
+    ) -> Dict[str, any]:
+        """
+        Renders the objects of the given component on top of the given template variables.
+
+        :param device: the device
+        :param component: the component whose objects should be rendered
+        :param template_vars: the template variables to use as a base, this is not modified
+        :return: the rendered objects
+        """
+        component_template_vars = self._get_component_template_vars(device, component)
+        c_result = self._get_object_map(component)
+
+        # rendering writes the rendered values into its (throwaway) scope, not into any of its layers
+        return render_dict_recursive(
+            input=c_result, template_vars=VariableScope(template_vars, component_template_vars, c_result)
+        )
+
+    def _get_component_template_vars(self, device: Device, component: JsonlComponent) -> VariableScope:
+        """
+        :return: the variables defined for the path of the given component
+        """
+        if component.path not in self._component_template_vars:
+            component_template_vars = self._variable_manager.get_scope(component.path)
+            component_template_vars["device"] = self._device.config.openhasp_config_manager.device
+            if "/common/" in str(component.path):
+                # for common components, also include device specific, top-level variables
+                device_vars = self._variable_manager.get_scope(device.path)
+                component_template_vars = VariableScope(component_template_vars, device_vars)
+            self._component_template_vars[component.path] = component_template_vars
+        return self._component_template_vars[component.path]
+
+    def _get_object_map(self, component: JsonlComponent) -> Dict[str, Mapping]:
+        """
+        :return: the objects of the given component, see _compute_object_map
+        """
+        if component not in self._object_maps:
+            jsonl_objects = self._jsonl_preprocessor.parse_jsonl_objects(component.content)
+            self._object_maps[component] = self._compute_object_map(jsonl_objects)
+        return self._object_maps[component]
+
+    def _compute_object_map(self, jsonl_objects: List[JsonlObject]) -> Dict[str, Mapping]:
         """
-        :param jsonl_objects:
-        :return: a map
+        :param jsonl_objects: the parsed objects of a component
+        :return: a map of "object key" -> "object"
         """
         result = {}
         for o in jsonl_objects:
-            o = self._jsonl_preprocessor.cleanup_object_for_json_parsing(o)
-            parsed_object = orjson.loads(o)
-            object_key = self._compute_object_key(parsed_object)
-            result[object_key] = parsed_object
+            object_key = self._compute_object_key(o.data)
+            result[object_key] = o.data
         return result
 
     @staticmethod
-    def _compute_object_key(jsonl_object: Dict) -> str:
+    def _compute_object_key(jsonl_object: Mapping) -> str:
         return f"p{jsonl_object.get('page', '0')}b{jsonl_object.get('id', '0')}"
@@ -0,0 +1,132 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+
+@dataclass(frozen=True)
+class FileInfo:
+    """
+    A file found while scanning a directory, including its stat metadata at the time of the scan.
+    """
+
+    path: Path
+    size: int
+    mtime_ns: int
+
+
+@dataclass
+class _DirectoryListing:
+    files: List[FileInfo]
+    # subdirectories which are part of the walk, symlinked directories are not followed
+    directories: List[Path]
+    # all subdirectories, including symlinked ones
+    all_directories: List[Path]
+
+
+class FileTree:
+    """
+    A snapshot of the files within a directory tree.
+
+    Each directory is listed (using os.scandir) at most once, no matter how many lookups are made.
+    Like Path.rglob(), the walk does not descend into symlinked subdirectories, and files are returned
+    directory by directory, in pre-order.
+    """
+
+    def __init__(self, root: Path):
+        """
+        :param root: the root directory of the tree
+        """
+        self.root = Path(root)
+        self._listings: Dict[Path, _DirectoryListing] = {}
+        self._files: Dict[Path, FileInfo] = {}
+
+    def scan(self) -> "FileTree":
+        """
+        Walks the whole tree below the root directory.
+        :return: this tree
+        """
+        self._walk(self.root)
+        return self
+
+    def find_files(self, directory: Path, suffix: str, recursive: bool = True) -> List[FileInfo]:
+        """
+        :param directory: the directory to search in
+        :param suffix: the suffix of the files to find, f.ex. ".jsonl"
+        :param recursive: whether to include files in subdirectories
+        :return: the matching files, in the order Path.rglob() (or Path.glob()) would return them
+        """
+        directories = self.iter_directories(directory) if recursive else [Path(directory)]
+        result = []
+        for d in directories:
+            listing = self._get_listing(d)
+            if listing is None:
+                continue
+            result.extend(f for f in listing.files if f.path.name.endswith(suffix))
+        return result
+
+    def iter_directories(self, directory: Path) -> Iterator[Path]:
+        """
+        :param directory: the directory to start with
+        :return: the given directory and all of its (non-symlinked) subdirectories, in pre-order
+        """
+        directory = Path(directory)
+        listing = self._get_listing(directory)
+        if listing is None:
+            return
+        yield directory
+        for subdirectory in listing.directories:
+            yield from self.iter_directories(subdirectory)
+
+    def list_directories(self, directory: Path) -> List[Path]:
+        """
+        :param directory: the directory to list
+        :return: the direct subdirectories of the given directory, including symlinked ones
+        """
+        listing = self._get_listing(Path(directory))
+        return [] if listing is None else list(listing.all_directories)
+
+    def get_file_info(self, path: Path) -> Optional[FileInfo]:
+        """
+        :param path: the path of a file
+        :return: the stat metadata recorded for the given file, or None if it was not part of the scan
+        """
+        return self._files.get(Path(path), None)
+
+    def _get_listing(self, directory: Path) -> Optional[_DirectoryListing]:
+        listing = self._listings.get(directory, None)
+        if listing is None and directory.is_dir():
+            # f.ex. a symlinked directory, which is not part of the walk of its parent
+            self._walk(directory)
+            listing = self._listings.get(directory, None)
+        return listing
+
+    def _walk(self, directory: Path):
+        pending = [directory]
+        while len(pending) > 0:
+            current = pending.pop()
+            if current in self._listings:
+                continue
+
+            listing = _DirectoryListing(files=[], directories=[], all_directories=[])
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        path = Path(current, entry.name)
+                        try:
+                            if entry.is_dir():
+                                listing.all_directories.append(path)
+                                if not entry.is_symlink():
+                                    listing.directories.append(path)
+                            elif entry.is_file():
+                                stat = entry.stat()
+                                file_info = FileInfo(path=path, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                                listing.files.append(file_info)
+                                self._files[path] = file_info
+                        except OSError:
+                            continue
+            except OSError:
+                pass
+
+            self._listings[current] = listing
+            pending.extend(listing.directories)
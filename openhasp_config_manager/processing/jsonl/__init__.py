@@ -1,5 +1,5 @@
 import abc
-from typing import Dict
+from typing import Dict, List
 
 from openhasp_config_manager.openhasp_client.model.configuration.config import Config
 
@@ -12,3 +12,13 @@ class JsonlObjectProcessor(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def process(self, input: Dict, config: Config, template_vars: Dict[str, any]) -> Dict:
         raise NotImplementedError
+
+    def process_objects(self, inputs: List[Dict], config: Config, template_vars: Dict[str, any]) -> List[Dict]:
+        """
+        Processes multiple objects (e.g. all objects of a page) at once.
+        :param inputs: the objects to process
+        :param config: the device config
+        :param template_vars: the template variables
+        :return: the processed objects, in the same order
+        """
+        return [self.process(input, config, template_vars) for input in inputs]
@@ -1,9 +1,10 @@
 import logging
 import re
-from typing import Dict
+from typing import Dict, List
 
 from openhasp_config_manager.openhasp_client.model.configuration.config import Config
 from openhasp_config_manager.processing.jsonl import JsonlObjectProcessor
+from openhasp_config_manager.processing.variable_scope import VariableScope
 
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
@@ -15,6 +16,19 @@ class ObjectDimensionsProcessor(JsonlObjectProcessor):
     """
 
     PERCENTAGE_REGEX_PATTERN = re.compile(r"^\d+(\.\d+)?%$")
+    INT_PROPERTY_REGEX_PATTERN = re.compile(
+        r"^(page|id|x|y|w|h|text_font|value_font|radius|pad_.+|margin_.+|border_width|min|max|prev|next).*$"
+    )
+
+    # coercion rules of (string) property values, see _get_rule
+    RULE_NONE = 0
+    RULE_PERCENTAGE_OF_WIDTH = 1
+    RULE_PERCENTAGE_OF_HEIGHT = 2
+    RULE_INT = 4
+
+    def __init__(self):
+        # coercion rule by property name, filled as property names are encountered
+        self._rules: Dict[str, int] = {}
 
     def process(
         self,
@@ -22,39 +36,58 @@ class ObjectDimensionsProcessor(JsonlObjectProcessor):
         config: Config,
         template_vars: Dict[str, any],
     ) -> Dict:
-        result: Dict[str, any] = {}
-        for key, value in input.items():
-            if isinstance(value, str) and re.match("[xywh]", key) and re.match(self.PERCENTAGE_REGEX_PATTERN, value):
-                numeric_value = self._parse_percentage(value)
+        return self.process_objects([input], config, template_vars)[0]
 
-                total_width = config.openhasp_config_manager.device.screen.width
-                total_height = config.openhasp_config_manager.device.screen.height
+    def process_objects(self, inputs: List[Dict], config: Config, template_vars: Dict[str, any]) -> List[Dict]:
+        total_width = config.openhasp_config_manager.device.screen.width
+        total_height = config.openhasp_config_manager.device.screen.height
+        return [self._process_object(input, total_width, total_height) for input in inputs]
 
-                if key in ["x", "w"]:
-                    total = total_width
-                else:
-                    total = total_height
-
-                result[key] = self._percentage_of(numeric_value, total)
-            else:
+    def _process_object(self, input: Dict, total_width: int, total_height: int) -> Dict:
+        rules = self._rules
+        result: Dict[str, any] = {}
+        for key, value in input.items():
+            if type(value) is not str:
                 result[key] = value
-
-        # normalize value types, in case of templates
-        for key, value in result.items():
-            try:
-                match = re.match(
-                    "^(page|id|x|y|w|h|text_font|value_font|radius|pad_.+|margin_.+|border_width|min|max|prev|next).*$",
-                    string=key,
-                )
-
-                if match and isinstance(value, str):
+                continue
+
+            rule = rules.get(key, None)
+            if rule is None:
+                rule = self._get_rule(key)
+
+            if rule & self.RULE_PERCENTAGE_OF_WIDTH and self.PERCENTAGE_REGEX_PATTERN.match(value):
+                result[key] = self._percentage_of(self._parse_percentage(value), total_width)
+            elif rule & self.RULE_PERCENTAGE_OF_HEIGHT and self.PERCENTAGE_REGEX_PATTERN.match(value):
+                result[key] = self._percentage_of(self._parse_percentage(value), total_height)
+            elif rule & self.RULE_INT:
+                # normalize value types, in case of templates
+                try:
                     result[key] = int(float(value))
-            except Exception as ex:
-                LOGGER.exception(ex)
-                print(f"{key}: {value}: {ex}, {input}")
+                except Exception as ex:
+                    LOGGER.exception(ex)
+                    print(f"{key}: {value}: {ex}, {input}")
+                    result[key] = value
+            else:
+                result[key] = value
 
         return result
 
+    def _get_rule(self, key: str) -> int:
+        """
+        Determines (and remembers) how string values of the given property are coerced.
+        :param key: the name of the property
+        :return: a combination of the RULE_* flags
+        """
+        rule = self.RULE_NONE
+        if key in ("x", "w"):
+            rule |= self.RULE_PERCENTAGE_OF_WIDTH
+        elif key[:1] in ("x", "y", "w", "h"):
+            rule |= self.RULE_PERCENTAGE_OF_HEIGHT
+        if self.INT_PROPERTY_REGEX_PATTERN.match(key):
+            rule |= self.RULE_INT
+        self._rules[key] = rule
+        return rule
+
     @staticmethod
     def _percentage_of(percentage: float, total: int) -> int:
         """
@@ -87,6 +120,8 @@ class ObjectThemeProcessor(JsonlObjectProcessor):
         theme_values = template_vars.get("theme", {}).get("obj", {}).get(obj_key, {})
         for key, value in theme_values.items():
             if key not in input:
+                if isinstance(value, VariableScope):
+                    value = value.to_dict()
                 input[key] = value
 
         return input
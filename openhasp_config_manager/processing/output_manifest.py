@@ -0,0 +1,152 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import orjson
+
+from openhasp_config_manager.util import calculate_checksum
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+# output files with these suffixes are uploaded as (utf-8 encoded) text
+TEXT_FILE_SUFFIXES = [".cmd", ".jsonl"]
+
+
+def read_output_file(file: Path) -> bytes:
+    """
+    Reads the content of a generated output file, the way it is uploaded to a device.
+    :param file: the output file
+    :return: the content of the file
+    """
+    if file.suffix in TEXT_FILE_SUFFIXES:
+        return file.read_text().encode("utf-8")
+    else:
+        return file.read_bytes()
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    """
+    A single generated output file of a device.
+    """
+
+    name: str
+    size: int
+    checksum: str
+    generated_at: str
+
+
+class OutputManifest:
+    """
+    Lists the output files generated for a device, together with the size and checksum of their content.
+
+    The manifest is written by the ConfigManager whenever the output of a device is generated,
+    and is the source of truth for the files which need to be present on the device.
+    """
+
+    VERSION = 1
+
+    def __init__(self, file: Path):
+        """
+        :param file: the file used to persist the manifest
+        """
+        self._file = file
+        self._entries: Dict[str, ManifestEntry] = {}
+
+    @staticmethod
+    def from_directory(file: Path, output_dir: Path) -> "OutputManifest":
+        """
+        Creates a manifest by reading all files within the given output directory.
+        Used for output directories which have been generated without a manifest.
+        :param file: the file used to persist the manifest
+        :param output_dir: the output directory of a device
+        :return: the manifest
+        """
+        manifest = OutputManifest(file)
+        if output_dir.is_dir():
+            for output_file in sorted(output_dir.iterdir()):
+                if output_file.is_file():
+                    manifest.add(output_file.name, read_output_file(output_file))
+        return manifest
+
+    def exists(self) -> bool:
+        """
+        :return: True if the manifest has been persisted, false otherwise
+        """
+        return self._file.is_file()
+
+    def load(self):
+        """
+        Loads the manifest from disk. A missing or incompatible manifest file results in an empty manifest.
+        """
+        self._entries = {}
+        if not self._file.is_file():
+            return
+
+        try:
+            data = orjson.loads(self._file.read_bytes())
+        except orjson.JSONDecodeError:
+            return
+
+        if data.get("version") != self.VERSION:
+            return
+        for name, entry in data.get("files", {}).items():
+            self._entries[name] = ManifestEntry(
+                name=name,
+                size=entry["size"],
+                checksum=entry["checksum"],
+                generated_at=entry["generated_at"],
+            )
+
+    def save(self):
+        """
+        Persists the manifest to disk.
+        """
+        self._file.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": self.VERSION,
+            "files": {
+                name: {
+                    "size": entry.size,
+                    "checksum": entry.checksum,
+                    "generated_at": entry.generated_at,
+                }
+                for name, entry in self._entries.items()
+            },
+        }
+        self._file.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+
+    def add(self, name: str, content: bytes):
+        """
+        Records a generated output file.
+        :param name: the name of the output file
+        :param content: the content of the output file, as returned by read_output_file()
+        """
+        self._entries[name] = ManifestEntry(
+            name=name,
+            size=len(content),
+            checksum=calculate_checksum(content),
+            generated_at=datetime.now(timezone.utc).isoformat(),
+        )
+
+    def remove(self, name: str):
+        """
+        Removes the given output file from the manifest.
+        :param name: the name of the output file
+        """
+        self._entries.pop(name, None)
+
+    def get(self, name: str) -> Optional[ManifestEntry]:
+        """
+        :param name: the name of the output file
+        :return: the entry of the given output file, or None
+        """
+        return self._entries.get(name, None)
+
+    @property
+    def entries(self) -> List[ManifestEntry]:
+        """
+        :return: all output files of the device, sorted by name
+        """
+        return [self._entries[name] for name in sorted(self._entries)]
@@ -1,75 +1,156 @@
 import re
-from typing import List
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping
 
+import orjson
 
-class JsonlPreProcessor:
-    def __init__(self):
-        pass
+from openhasp_config_manager.processing.template_cache import CacheStats, LruCache
+from openhasp_config_manager.util import calculate_checksum
 
-    def split_jsonl_objects(self, original_content: str) -> List[str]:
-        pattern_to_find_beginning_of_objects = re.compile(r"^(?!\n)\s*(?=\{)", re.RegexFlag.MULTILINE)
-        parts = pattern_to_find_beginning_of_objects.split(original_content)
+DEFAULT_PARSE_CACHE_CAPACITY = 10000
 
-        result = []
-        for part in parts:
-            part = part.strip()
+# the tokens of jsonl content, see JsonlPreProcessor._tokenize
+_token_pattern = re.compile(
+    r"""
+    (?P<string>"(?:[^"\\\n]|\\.)*")
+    |(?P<comment>//[^\n]*)
+    |(?P<open>[{\[])
+    |(?P<close>[}\]])
+    |(?P<comma>,)
+    |(?P<newline>\n)
+    |(?P<space>[^\S\n]+)
+    |(?P<other>[^"/{}\[\],\s]+|.)
+    """,
+    re.VERBOSE,
+)
 
-            # edge case for first match
-            if "}" not in part:
-                continue
 
-            # ignore everything after the last closing bracket
-            part = part.rsplit("}", maxsplit=1)[0] + "}"
+@dataclass(frozen=True)
+class JsonlObject:
+    """
+    An object parsed from jsonl content.
 
-            result.append(part)
+    :param data: the parsed object, which is shared with other users of the same content and therefore read-only
+        (nested values are not copied, so they must not be modified either)
+    :param line: the (1-based) line of the opening bracket of the object
+    :param column: the (1-based) column of the opening bracket of the object
+    """
+
+    data: Mapping[str, Any]
+    line: int
+    column: int
+
+    def __post_init__(self):
+        if type(self.data) is not MappingProxyType:
+            object.__setattr__(self, "data", MappingProxyType(self.data))
+
+    def __reduce__(self):
+        # read-only views cannot be pickled, f.ex. when passing the parse cache to a worker process
+        return self.__class__, (dict(self.data), self.line, self.column)
 
-        return result
 
-    def cleanup_object_for_json_parsing(self, content: str) -> str:
+class JsonlPreProcessor:
+    def __init__(self, cache_capacity: int = DEFAULT_PARSE_CACHE_CAPACITY):
+        """
+        :param cache_capacity: the maximum number of (distinct) contents to keep the parsed objects of
+        """
+        # parsed objects by checksum of the content they were parsed from
+        self._parsed_objects: LruCache[List[JsonlObject]] = LruCache(cache_capacity)
+
+    def parse_jsonl_objects(self, content: str) -> List[JsonlObject]:
         """
-        Prepares the given content for json parsing (if possible)
+        Parses all objects within the given jsonl content, ignoring comments, trailing commas
+        and any text outside of objects.
+
+        An object starts with a "{" at the beginning of a line (or right after the previous object)
+        and ends with its matching "}". The content is tokenized in a single pass and the result is cached
+        by content checksum, so parsing the same content again (e.g. the same common component for another device)
+        does not tokenize it a second time.
+
         :param content: original content
-        :return: cleaned up content
+        :return: the parsed objects, in the order of their appearance
         """
-        result = self._remove_comments(content).strip()
-        result = self._remove_trailing_comma_of_last_property(result)
+        checksum = calculate_checksum(content.encode())
+        result = self._parsed_objects.get(checksum)
+        if result is None:
+            result = self._tokenize(content)
+            self._parsed_objects.put(checksum, result)
         return result
 
-    def _remove_comments(self, content: str) -> str:
+    def cache_stats(self) -> CacheStats:
         """
-        Removes comments indicated by "//"
-        :param content: original content
-        :return: modified content without comments
+        :return: the usage statistics of the cache of parsed objects
         """
-        result_lines = []
-        for line in content.splitlines():
-            quote_count = 0
-            new_line = []
-            i = 0
-            while i < len(line):
-                char = line[i]
-                if char == '"':
-                    quote_count += 1
-                if char == "/" and i + 1 < len(line) and line[i + 1] == "/" and quote_count % 2 == 0:
-                    break
-                new_line.append(char)
-                i += 1
-            cleaned_line = "".join(new_line).strip()
-            if cleaned_line:  # Only append non-empty lines
-                result_lines.append(cleaned_line)
-        result = "\n".join(result_lines)
-        return result.strip()
-
-    def _remove_trailing_comma_of_last_property(self, content: str) -> str:
+        return self._parsed_objects.stats()
+
+    @staticmethod
+    def _tokenize(content: str) -> List[JsonlObject]:
         """
-        Removes the "," of the last property within the object.
         :param content: original content
-        :return: modified content
+        :return: the parsed objects
         """
-        result = content
-        matches = re.findall(r",\s*}", content, flags=re.MULTILINE)
-        if matches is not None:
-            for match in matches:
-                result = result.replace(match, match[1:])
+        result = []
+
+        line = 1
+        line_start = 0
+        # whether a "{" at the current position starts a new object
+        can_start = True
+
+        depth = 0
+        parts: List[str] = []
+        pending_comma = False
+        start_line = start_column = 0
+
+        for match in _token_pattern.finditer(content):
+            kind = match.lastgroup
+            if kind == "newline":
+                line += 1
+                line_start = match.end()
+                can_start = True
+                continue
+            if kind == "space" or kind == "comment":
+                continue
+
+            token = match.group()
+            if depth == 0:
+                # anything outside of objects is ignored
+                if token == "{" and can_start:
+                    depth = 1
+                    parts = [token]
+                    pending_comma = False
+                    start_line = line
+                    start_column = match.start() - line_start + 1
+                else:
+                    can_start = False
+                continue
+
+            if pending_comma and kind != "close":
+                parts.append(",")
+            if kind == "comma":
+                # only emitted once the next token is known, to drop trailing commas
+                pending_comma = True
+                continue
+            pending_comma = False
+
+            parts.append(token)
+            if kind == "open":
+                depth += 1
+            elif kind == "close":
+                depth -= 1
+                if depth == 0:
+                    data = JsonlPreProcessor._parse_object(parts, start_line, start_column)
+                    result.append(JsonlObject(data=data, line=start_line, column=start_column))
+                    can_start = True
+
+        if depth > 0:
+            raise ValueError(f"Unterminated object at line {start_line}, column {start_column}")
 
         return result
+
+    @staticmethod
+    def _parse_object(parts: List[str], line: int, column: int) -> Dict[str, Any]:
+        try:
+            return orjson.loads("".join(parts))
+        except orjson.JSONDecodeError as ex:
+            raise ValueError(f"Invalid object at line {line}, column {column}: {ex}") from ex
@@ -0,0 +1,147 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+DEFAULT_TEMPLATE_CACHE_CAPACITY = 10000
+
+
+@dataclass
+class CacheStats:
+    """
+    Usage statistics of a cache.
+
+    Adding the statistics of caches in different processes sums up their counters, while the size
+    and capacity are those of the largest cache, since each process is limited to its own capacity.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int = 0
+    capacity: int = 0
+
+    def __add__(self, other: "CacheStats") -> "CacheStats":
+        return CacheStats(
+            hits=self.hits + other.hits,
+            misses=self.misses + other.misses,
+            evictions=self.evictions + other.evictions,
+            size=max(self.size, other.size),
+            capacity=max(self.capacity, other.capacity),
+        )
+
+
+@dataclass(frozen=True)
+class TemplateCacheConfig:
+    """
+    Configuration of the caches used for template rendering.
+
+    :param capacity: the maximum number of entries of each cache, including the directory of persisted templates
+    :param directory: the directory used to persist compiled templates, None to only keep them in memory
+    """
+
+    capacity: int = DEFAULT_TEMPLATE_CACHE_CAPACITY
+    directory: Optional[Path] = None
+
+
+class LruCache(Generic[V]):
+    """
+    A cache with a fixed capacity, which evicts the least recently used entry when it is full.
+
+    The cache is safe to use from multiple threads.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        :param capacity: the maximum number of entries
+        """
+        if capacity < 1:
+            raise ValueError(f"Invalid capacity: {capacity}")
+        self._capacity = capacity
+        self._entries: OrderedDict[Hashable, V] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """
+        :param key: the key to look up
+        :return: the cached value, or None if the key is not cached
+        """
+        with self._lock:
+            value = self._entries.get(key, None)
+            if value is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: V):
+        """
+        Adds an entry to the cache, evicting the least recently used entries if necessary.
+        :param key: the key
+        :param value: the value, must not be None
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def resize(self, capacity: int):
+        """
+        Changes the capacity of the cache, evicting entries if necessary.
+        :param capacity: the new capacity
+        """
+        if capacity < 1:
+            raise ValueError(f"Invalid capacity: {capacity}")
+        with self._lock:
+            self._capacity = capacity
+            self._evict()
+
+    def clear(self):
+        """
+        Removes all entries and resets the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                size=len(self._entries),
+                capacity=self._capacity,
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getstate__(self) -> dict:
+        with self._lock:
+            state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+            self._evictions += 1
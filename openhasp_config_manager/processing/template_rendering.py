@@ -1,11 +1,18 @@
+import fnmatch
 import logging
+import os
 import re
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
 
 import jinja2
-from jinja2 import BaseLoader
+from jinja2 import FileSystemBytecodeCache, FunctionLoader, nodes
+from jinja2.bccache import Bucket
+from jinja2.meta import find_undeclared_variables
 
 from openhasp_config_manager.gui.util import echo, error
+from openhasp_config_manager.processing.template_cache import CacheStats, LruCache, TemplateCacheConfig
+from openhasp_config_manager.processing.variable_scope import VariableScope
 
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
@@ -13,123 +20,456 @@ LOGGER.setLevel(logging.DEBUG)
 
 def render_dict_recursive(
     input: Dict,
-    template_vars: Dict,
+    template_vars: Mapping,
     result_key_path: List[str] = None,
 ) -> Dict[str, any]:
     """
-    Recursively called function to resolve templates within the given input dict
+    Resolves templates within the given input dict.
+
+    Templates may reference other values of the input dict, so values are rendered in the order of their
+    dependencies. Each rendered value is also added to the given template_vars, at the location given by
+    result_key_path. Values which cannot be rendered are omitted from the result.
+
     :param input: the dict which (possibly) contains templates
-    :param template_vars: a map specifying the value of template variables # TODO: this might need context as well... right?
-    :param result_key_path:
-    :return:
+    :param template_vars: a map specifying the value of template variables
+    :param result_key_path: the location of the input dict within template_vars
+    :return: the rendered dict
     """
     if result_key_path is None:
         result_key_path = []
 
-    result = {}
-
-    finished = False
-    progress = 0
-    last_pending = None
-    while not finished:
-        pending = []
-        finished = True
-        keys = list(input.keys())
-        for key in keys:
-            value = input[key]
-            # key
-            rendered_key = key
-            key_undefined = False
-            if "{{" in key:
-                try:
-                    rendered_key = _render_template(key, template_vars)
-                    key_undefined = _has_undeclared_variables(rendered_key)
-                except Exception:
-                    error(f"Undefined key: {key_undefined}, value: {key}")
-                    key_undefined = True
-
-            # value
-            value_undefined = False
-            rendered_value = value
-            if isinstance(value, dict) and rendered_key is not None and not key_undefined:
-                rendered_value = render_dict_recursive(
-                    input=value,
-                    template_vars=template_vars,
-                    result_key_path=result_key_path + [rendered_key],
-                )
-            elif isinstance(value, list):
-                try:
-                    rendered_value = list(map(lambda x: _render_template(x, template_vars), value))
-                    value_undefined = any(map(lambda x: _has_undeclared_variables(x), rendered_value))
-                except Exception:
-                    # print(f"Undefined value: {value_undefined}, value: {value}")
-                    value_undefined = True
-            elif isinstance(value, str):
-                try:
-                    rendered_value = _render_template(value, template_vars)
-                    value_undefined = _has_undeclared_variables(rendered_value)
-                except Exception:
-                    # print(f"Undefined value: {value_undefined}, value: {value}")
-                    value_undefined = True
-
-            if key_undefined:
-                pending.append(key)
-            elif key in pending:
-                pending.remove(key)
-            if value_undefined:
-                pending.append(f"{key}__value")
-            elif f"{key}__value" in pending:
-                pending.remove(f"{key}__value")
-
-            if key_undefined or value_undefined:
-                # still has undefined keys
-                # print(f"Undefined keys: {key_undefined}, Undefined values: {value_undefined}")
-                finished = False
+    return _TemplateResolver(template_vars, result_key_path).render(input)
+
+
+class _TemplateNode:
+    """
+    A key/value pair of the dict passed to render_dict_recursive().
+    """
+
+    PENDING = 0
+    VISITING = 1
+    DONE = 2
+
+    def __init__(self, parent: Optional["_TemplateNode"], key: Optional[str], value: Any):
+        self.parent = parent
+        self.key = key
+        self.value = value
+
+        # child nodes, if the value is a dict (or a read-only view of one, f.ex. a parsed jsonl object)
+        self.children: Optional[List[_TemplateNode]] = None
+        self.literal_children: Dict[str, _TemplateNode] = {}
+        self.templated_children: List[_TemplateNode] = []
+        if isinstance(value, (dict, MappingProxyType)):
+            self.children = [_TemplateNode(self, k, v) for k, v in value.items()]
+            for child in self.children:
+                if child.has_templated_key:
+                    self.templated_children.append(child)
+                else:
+                    self.literal_children[child.key] = child
+
+        self.key_state = self.PENDING
+        self.rendered_key: Optional[str] = None
+
+        self.state = self.PENDING
+        self.resolved = False
+        self.rendered_value: Any = None
+
+        # literal values render to themselves, so they never need to go through jinja2
+        self.is_literal = isinstance(value, str) and not is_template(value)
+
+    @property
+    def has_templated_key(self) -> bool:
+        return self.key is not None and "{{" in self.key
+
+    @property
+    def ancestors(self) -> List["_TemplateNode"]:
+        """
+        :return: all ancestors of this node (excluding the root node), starting with the highest one
+        """
+        result = []
+        node = self.parent
+        while node is not None and node.parent is not None:
+            result.insert(0, node)
+            node = node.parent
+        return result
+
+    @property
+    def name(self) -> str:
+        return ".".join([node.key for node in self.ancestors + [self]])
+
+
+class _TemplateResolver:
+    """
+    Renders the templates of a dict in the order of their dependencies, see render_dict_recursive().
+
+    The dependencies of a template are determined by looking at the variables it references.
+    Templates whose references cannot be determined up front (f.ex. because the referenced variable name
+    is itself the result of an inner template) are retried once all other values have been rendered.
+    """
+
+    def __init__(self, template_vars: Mapping, result_key_path: List[str]):
+        self._template_vars = template_vars
+        self._result_key_path = result_key_path
+        self._root: Optional[_TemplateNode] = None
+        self._stack: List[_TemplateNode] = []
+        # nodes whose key or value could not be rendered (yet), used as an ordered set
+        self._failed: Dict[_TemplateNode, None] = {}
+        self._cycles: Set[Tuple[str, ...]] = set()
+
+    def render(self, input: Dict) -> Dict[str, any]:
+        self._root = _TemplateNode(None, None, input)
+
+        for child in self._root.children:
+            self._resolve(child)
+        self._retry_failed()
+
+        unresolved = [node.name for node in self._failed if not node.resolved]
+        if len(unresolved) > 0:
+            echo(f"Unable to render templates: {unresolved}")
+
+        return {child.rendered_key: child.rendered_value for child in self._root.children if child.resolved}
+
+    def _resolve(self, node: _TemplateNode):
+        """
+        Renders the given node, after rendering all the nodes it depends on.
+        """
+        if node.state == _TemplateNode.DONE:
+            return
+        if node.state == _TemplateNode.VISITING:
+            self._report_cycle(node)
+            return
+
+        node.state = _TemplateNode.VISITING
+        self._stack.append(node)
+        try:
+            if not self._resolve_key_path(node):
+                self._failed[node] = None
+                return
+
+            if node.children is not None:
+                for child in node.children:
+                    self._resolve(child)
+                node.rendered_value = {child.rendered_key: child.rendered_value for child in node.children if child.resolved}
+                node.resolved = True
+                self._write(node)
             else:
-                # add it to the template_vars data at the correct location
-                # which allows later iterations to render the template correctly
-                tmp = template_vars
-                for idx, p in enumerate(result_key_path):
-                    if p not in tmp.keys():
-                        tmp[p] = {}
-                    tmp = tmp[p]
-                tmp.pop(key, None)
-                tmp[rendered_key] = rendered_value
-
-                if rendered_key not in result or result[rendered_key] != rendered_value:
-                    progress += 1
-
-                # create the resulting (sub-)dictionary
-                result[rendered_key] = rendered_value
-
-                finished = finished and True
-
-        if len(pending) <= 0:
-            return result
-        elif pending == last_pending:
-            echo(f"No progression while rendering templates, unable to render: {pending}")
-            return result
-        else:
-            last_pending = pending
+                for reference in _get_references(node.value):
+                    self._resolve_reference(reference)
+                self._render_value(node)
+        finally:
+            self._stack.pop()
+            node.state = _TemplateNode.DONE
 
-    return result
+    def _resolve_key_path(self, node: _TemplateNode) -> bool:
+        """
+        Renders the (templated) keys of the given node and all of its ancestors.
+        :return: True if all keys could be rendered, false otherwise
+        """
+        for n in node.ancestors + [node]:
+            self._resolve_key(n)
+            if n.rendered_key is None:
+                return False
+        return True
+
+    def _resolve_key(self, node: _TemplateNode):
+        if node.key_state == _TemplateNode.DONE:
+            return
+        if node.key_state == _TemplateNode.VISITING:
+            self._report_cycle(node)
+            return
+
+        if not node.has_templated_key:
+            node.rendered_key = node.key
+            node.key_state = _TemplateNode.DONE
+            return
+
+        node.key_state = _TemplateNode.VISITING
+        self._stack.append(node)
+        try:
+            for reference in _get_references(node.key):
+                self._resolve_reference(reference)
+
+            try:
+                rendered_key = _render_template(node.key, self._template_vars)
+                if not _has_undeclared_variables(rendered_key):
+                    node.rendered_key = rendered_key
+            except Exception:
+                error(f"Undefined key: {node.key}")
+        finally:
+            self._stack.pop()
+            node.key_state = _TemplateNode.DONE
+
+    def _resolve_reference(self, reference: Tuple[str, ...]):
+        """
+        Renders the node which is referenced by the given variable path, if it is part of the input.
+        """
+        base_path = tuple(self._result_key_path)
+        if reference[: len(base_path)] != base_path:
+            return
+
+        node = self._root
+        for component in reference[len(base_path) :]:
+            if node.children is None:
+                # the remaining components reference the contents of a value
+                break
+            child = self._find_child(node, component)
+            if child is None:
+                # not part of the input
+                return
+            node = child
+
+        if node is not self._root:
+            self._resolve(node)
+
+    def _find_child(self, node: _TemplateNode, key: str) -> Optional[_TemplateNode]:
+        """
+        :return: the child of the given node with the given (rendered) key, if any
+        """
+        child = node.literal_children.get(key, None)
+        if child is not None:
+            return child
+
+        for child in node.templated_children:
+            if child.key_state == _TemplateNode.VISITING:
+                # the rendered name of a key is not known while its template is being rendered
+                continue
+            self._resolve_key(child)
+            if child.rendered_key == key:
+                return child
+        return None
+
+    def _render_value(self, node: _TemplateNode):
+        value = node.value
+        rendered_value = value
+        value_undefined = False
+        if node.is_literal:
+            pass
+        elif isinstance(value, list):
+            try:
+                rendered_value = list(map(lambda x: _render_template(x, self._template_vars), value))
+                value_undefined = any(map(lambda x: _has_undeclared_variables(x), rendered_value))
+            except Exception:
+                value_undefined = True
+        elif isinstance(value, str):
+            try:
+                rendered_value = _render_template(value, self._template_vars)
+                value_undefined = _has_undeclared_variables(rendered_value)
+            except Exception:
+                value_undefined = True
+
+        if value_undefined:
+            if node not in self._failed:
+                self._failed[node] = None
+                self._remove(node)
+            return
+
+        node.rendered_value = rendered_value
+        node.resolved = True
+        self._write(node)
+
+    def _retry_failed(self):
+        """
+        Retries rendering the keys and values which could not be rendered so far, as long as this makes progress.
+        """
+        progress = True
+        while progress:
+            progress = False
+            # retrying a node may add new failures (f.ex. of its children)
+            for node in list(self._failed):
+                if node.resolved:
+                    continue
+                if self._has_unresolved_key_path(node):
+                    self._retry_key_path(node)
+                else:
+                    self._render_value(node)
+                progress = progress or node.resolved
+
+    @staticmethod
+    def _has_unresolved_key_path(node: _TemplateNode) -> bool:
+        return any(n.rendered_key is None for n in node.ancestors + [node])
+
+    def _retry_key_path(self, node: _TemplateNode):
+        for n in node.ancestors + [node]:
+            if n.rendered_key is None:
+                n.key_state = _TemplateNode.PENDING
+        if not self._resolve_key_path(node):
+            return
+        node.state = _TemplateNode.PENDING
+        self._resolve(node)
+
+    def _write(self, node: _TemplateNode):
+        """
+        Adds the rendered value of the given node to the template variables,
+        which allows the rendering of other templates referencing it.
+        """
+        tmp = self._template_vars
+        for p in self._result_key_path + [ancestor.rendered_key for ancestor in node.ancestors]:
+            if p not in tmp.keys():
+                tmp[p] = {}
+            tmp = tmp[p]
+        if node.key != node.rendered_key:
+            tmp.pop(node.key, None)
+        tmp[node.rendered_key] = node.rendered_value
+
+    def _remove(self, node: _TemplateNode):
+        """
+        Removes the (unrendered) value of a nested node from the template variables, just like
+        writing the rendered value of its parent will, so templates referencing it see the same value
+        regardless of the order they are rendered in.
+        """
+        if node.parent is self._root:
+            return
+
+        tmp = self._template_vars
+        for p in self._result_key_path + [ancestor.rendered_key for ancestor in node.ancestors]:
+            if p not in tmp.keys():
+                return
+            tmp = tmp[p]
+        tmp.pop(node.key, None)
+
+    def _report_cycle(self, node: _TemplateNode):
+        index = self._stack.index(node)
+        cycle = tuple([n.name for n in self._stack[index:]] + [node.name])
+        if cycle not in self._cycles:
+            self._cycles.add(cycle)
+            error(f"Cyclic template references: {' -> '.join(cycle)}")
+
+
+class _BoundedBytecodeCache(FileSystemBytecodeCache):
+    """
+    A bytecode cache which persists compiled templates in a directory, keeping at most a fixed number of them.
+
+    Loading a compiled template updates the modification time of its file, so pruning the directory
+    removes the least recently used ones.
+    """
+
+    def __init__(self, directory: str, capacity: int):
+        """
+        :param directory: the directory to persist compiled templates in
+        :param capacity: the maximum number of compiled templates to keep
+        """
+        super().__init__(directory)
+        self.capacity = capacity
+
+    def load_bytecode(self, bucket: Bucket):
+        super().load_bytecode(bucket)
+        if bucket.code is not None:
+            try:
+                os.utime(os.path.join(self.directory, self.pattern % (bucket.key,)))
+            except OSError:
+                pass
 
+    def prune(self):
+        """
+        Removes the least recently used compiled templates exceeding the capacity of this cache.
+        """
+        paths = [os.path.join(self.directory, f) for f in fnmatch.filter(os.listdir(self.directory), self.pattern % ("*",))]
+        if len(paths) <= self.capacity:
+            return
 
-_j2_env = jinja2.Environment(loader=BaseLoader(), undefined=jinja2.DebugUndefined)
-_template_cache = {}
+        modification_times = {}
+        for path in paths:
+            try:
+                modification_times[path] = os.stat(path).st_mtime
+            except OSError:
+                # removed by another process in the meantime
+                pass
+        for path in sorted(modification_times, key=modification_times.get)[: len(modification_times) - self.capacity]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
 
 
-def _render_template(content: str, template_vars: Dict[str, str]) -> str:
+# templates are loaded by using their content as their name, which allows jinja2 to persist
+# their compiled version using a bytecode cache, see configure_template_cache()
+_j2_env = jinja2.Environment(
+    loader=FunctionLoader(lambda content: content),
+    undefined=jinja2.DebugUndefined,
+    # compiled templates are cached in _template_cache instead
+    cache_size=0,
+)
+
+_template_cache_config = TemplateCacheConfig()
+_template_cache: LruCache[jinja2.Template] = LruCache(_template_cache_config.capacity)
+_template_ast_cache: LruCache[nodes.Template] = LruCache(_template_cache_config.capacity)
+_template_references_cache: LruCache[List[Tuple[str, ...]]] = LruCache(_template_cache_config.capacity)
+_template_names_cache: LruCache[Set[str]] = LruCache(_template_cache_config.capacity)
+
+
+def configure_template_cache(config: TemplateCacheConfig):
+    """
+    Configures the caches used for template rendering.
+
+    Note that this only affects the current process, so it has to be called in every worker process as well.
+
+    :param config: the configuration to use
+    """
+    global _template_cache_config
+    _template_cache_config = config
+
+    for cache in [_template_cache, _template_ast_cache, _template_references_cache, _template_names_cache]:
+        cache.resize(config.capacity)
+
+    if config.directory is None:
+        _j2_env.bytecode_cache = None
+    else:
+        config.directory.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = _BoundedBytecodeCache(str(config.directory), config.capacity)
+        bytecode_cache.prune()
+        _j2_env.bytecode_cache = bytecode_cache
+
+
+def get_template_cache_config() -> TemplateCacheConfig:
+    """
+    :return: the current configuration of the caches used for template rendering
+    """
+    return _template_cache_config
+
+
+def get_template_cache_stats() -> Dict[str, CacheStats]:
+    """
+    :return: the usage statistics of the caches used for template rendering in the current process, by cache name
+    """
+    return {
+        "templates": _template_cache.stats(),
+        "asts": _template_ast_cache.stats(),
+        "references": _template_references_cache.stats(),
+        "names": _template_names_cache.stats(),
+    }
+
+
+def is_template(content: str) -> bool:
+    """
+    Checks whether the given string needs to be rendered using jinja2.
+
+    Strings which don't contain any jinja2 markers are literals, which render to themselves. Since jinja2
+    also normalizes newlines, strings containing a carriage return or a trailing newline are never considered literals.
+
+    :param content: the string to check
+    :return: True if the string has to be rendered, false if it is a literal
+    """
+    return "{{" in content or "{%" in content or "{#" in content or "\r" in content or content.endswith("\n")
+
+
+def _render_template(content: str, template_vars: Mapping[str, str]) -> str:
+    if not is_template(content):
+        return content
+
     inner_templates = re.findall(r"\{\{.+}}", content[2:-2])
     for inner_template in inner_templates:
         if inner_template != content[2:-2]:
             rendered = _render_template(inner_template, template_vars)
             content = content.replace(inner_template, rendered)
     try:
-        if content not in _template_cache:
-            _template_cache[content] = _j2_env.from_string(content)
-        template = _template_cache[content]
-        rendered = template.render(template_vars)
+        template = _template_cache.get(content)
+        if template is None:
+            template = _j2_env.get_template(content)
+            _template_cache.put(content, template)
+        if isinstance(template_vars, VariableScope):
+            rendered = _render_template_with_scope(content, template, template_vars)
+        else:
+            rendered = template.render(template_vars)
         return rendered
     except Exception as ex:
         # LOGGER.exception(ex)
@@ -137,14 +477,123 @@ def _render_template(content: str, template_vars: Dict[str, str]) -> str:
         raise ex
 
 
-_template_ast_cache = {}
+def _render_template_with_scope(content: str, template: jinja2.Template, template_vars: VariableScope) -> str:
+    """
+    Renders the given template using the given scope as the context. Only the variables referenced
+    by the template are passed to Template.render(), instead of copying all variables of the scope.
+    """
+    names = _get_undeclared_names(content)
+    return template.render({name: template_vars[name] for name in names if name in template_vars})
+
+
+def _get_undeclared_names(content: str) -> Set[str]:
+    """
+    :return: the names of the (top-level) variables referenced by the given template
+    """
+    names = _template_names_cache.get(content)
+    if names is None:
+        ast = _template_ast_cache.get(content)
+        if ast is None:
+            ast = _j2_env.parse(content)
+            _template_ast_cache.put(content, ast)
+        names = find_undeclared_variables(ast)
+        _template_names_cache.put(content, names)
+    return names
+
+
+def get_referenced_names(value: Any) -> Optional[Set[str]]:
+    """
+    Determines the names of the (top-level) variables referenced by the templates within the given value.
+
+    :param value: a template, or a (nested) dict or list containing templates, both as keys and values
+    :return: the referenced names, or None if they cannot be determined up front (f.ex. because
+        the name of a referenced variable is itself the result of an inner template)
+    """
+    result = set()
+    if isinstance(value, Mapping):
+        items = [item for key_value in value.items() for item in key_value]
+    elif isinstance(value, list):
+        items = value
+    elif isinstance(value, str) and is_template(value):
+        if re.search(r"\{\{.+}}", value[2:-2]) is not None:
+            return None
+        try:
+            return set(_get_undeclared_names(value))
+        except Exception:
+            return None
+    else:
+        return result
+
+    for item in items:
+        names = get_referenced_names(item)
+        if names is None:
+            return None
+        result.update(names)
+    return result
 
 
 def _has_undeclared_variables(rendered_value: str):
-    from jinja2.meta import find_undeclared_variables
+    if not is_template(rendered_value):
+        return set()
 
-    if rendered_value not in _template_ast_cache:
-        _template_ast_cache[rendered_value] = _j2_env.parse(rendered_value)
-    ast = _template_ast_cache[rendered_value]
+    ast = _template_ast_cache.get(rendered_value)
+    if ast is None:
+        ast = _j2_env.parse(rendered_value)
+        _template_ast_cache.put(rendered_value, ast)
 
     return find_undeclared_variables(ast)
+
+
+_identifier_path_pattern = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*")
+
+
+def _get_references(value: Any) -> List[Tuple[str, ...]]:
+    """
+    Determines the variables referenced by the templates within the given value.
+
+    :param value: a template, or a list of templates
+    :return: the referenced variables, as paths of keys (f.ex. ("p1b2", "text") for "{{ p1b2.text }}")
+    """
+    if isinstance(value, list):
+        return [reference for item in value for reference in _get_references(item)]
+    if not isinstance(value, str) or not is_template(value):
+        return []
+
+    references = _template_references_cache.get(value)
+    if references is None:
+        try:
+            ast = _j2_env.parse(value)
+            references = []
+            _collect_references(ast, find_undeclared_variables(ast), references)
+        except Exception:
+            # f.ex. inner templates are not valid jinja2 syntax, so fall back to
+            # considering everything that looks like a variable as a reference
+            references = [tuple(match.split(".")) for match in _identifier_path_pattern.findall(value)]
+        _template_references_cache.put(value, references)
+    return references
+
+
+def _collect_references(node: nodes.Node, undeclared: Set[str], result: List[Tuple[str, ...]]):
+    path = _get_reference_path(node)
+    if path is not None:
+        if path[0] in undeclared:
+            result.append(path)
+        return
+
+    for child in node.iter_child_nodes():
+        _collect_references(child, undeclared, result)
+
+
+def _get_reference_path(node: nodes.Node) -> Optional[Tuple[str, ...]]:
+    """
+    :return: the path of keys referenced by the given node, if it is a (nested) variable access with constant keys
+    """
+    if isinstance(node, nodes.Name):
+        return (node.name,) if node.ctx == "load" else None
+    if isinstance(node, nodes.Getattr):
+        base = _get_reference_path(node.node)
+        return base + (node.attr,) if base is not None else None
+    if isinstance(node, nodes.Getitem) and isinstance(node.arg, nodes.Const) and isinstance(node.arg.value, str):
+        base = _get_reference_path(node.node)
+        return base + (node.arg.value,) if base is not None else None
+    return None
@@ -0,0 +1,215 @@
+from collections.abc import Mapping, MutableMapping
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# marks a key which has been deleted from a scope, hiding the values of lower layers
+_DELETED = object()
+# returned by lookups for keys which are not present in any layer
+_MISSING = object()
+# types which are known not to be mappings, used to avoid (comparatively slow) isinstance checks
+_PLAIN_TYPES = (str, int, float, bool, list, type(None))
+
+
+def _is_mapping(value: Any) -> bool:
+    value_type = type(value)
+    if value_type is dict or value_type is MappingProxyType:
+        return True
+    if value_type in _PLAIN_TYPES:
+        return False
+    return isinstance(value, Mapping)
+
+
+class _Overlay(dict):
+    """
+    The layer of a VariableScope which holds the values written to the scope.
+
+    In contrast to regular layers, dict values within an overlay replace the values of lower layers,
+    just like an assignment to a plain dict would. Nested overlays (created by writing to a nested
+    scope) are merged with the values of lower layers instead.
+    """
+
+    pass
+
+
+class VariableScope(MutableMapping):
+    """
+    A layered, copy-on-write view of multiple (nested) variable dictionaries.
+
+    Looking up a key returns the value of the highest layer that defines it. If that value is a dict,
+    it is combined with the dicts found for the same key in lower layers, the same way
+    merge_dict_recursive() would combine them. Instead of copying anything, this returns another
+    VariableScope on top of those dicts.
+
+    Writing to a scope never modifies any of its layers. All changes are recorded in an overlay,
+    which is owned by the scope.
+    """
+
+    def __init__(self, *layers: Mapping, _parent: "VariableScope" = None, _key: str = None):
+        """
+        :param layers: the layers of this scope, ordered from the lowest to the highest priority
+        """
+        flattened_layers: List[Mapping] = []
+        for layer in layers:
+            if type(layer) is VariableScope and layer._overlay is not None:
+                # flatten nested scopes to keep lookups independent of the nesting depth
+                flattened_layers.extend(layer._layers)
+                flattened_layers.append(layer._overlay)
+            else:
+                flattened_layers.append(layer)
+
+        # the same layer (f.ex. the global variables) may be part of multiple nested scopes,
+        # only its highest occurrence is relevant for lookups, so lower occurrences are dropped
+        seen_layers = set()
+        # layers are looked up starting with the highest one
+        self._reversed_layers: List[Mapping] = []
+        for layer in reversed(flattened_layers):
+            if id(layer) not in seen_layers:
+                seen_layers.add(id(layer))
+                self._reversed_layers.append(layer)
+        self._layers: List[Mapping] = list(reversed(self._reversed_layers))
+
+        self._parent = _parent
+        self._key = _key
+        self._overlay: Optional[_Overlay] = _Overlay() if _parent is None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: a (deep) copy of the contents of this scope, using plain dictionaries
+        """
+        result = {}
+        for key in self:
+            value = self[key]
+            if isinstance(value, VariableScope):
+                value = value.to_dict()
+            result[key] = value
+        return result
+
+    def __getitem__(self, key: str) -> Any:
+        value, mappings, _ = self._lookup(key)
+        if value is not _MISSING:
+            return value
+        if len(mappings) <= 0:
+            raise KeyError(key)
+
+        overlay = None
+        if self._overlay is not None and type(self._overlay.get(key, None)) is _Overlay:
+            overlay = self._overlay[key]
+            mappings = mappings[1:]
+
+        child = VariableScope(*reversed(mappings), _parent=self, _key=key)
+        child._overlay = overlay
+        return child
+
+    def __setitem__(self, key: str, value: Any):
+        self._get_or_create_overlay()[key] = value
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        self._get_or_create_overlay()[key] = _DELETED
+
+    def __contains__(self, key: object) -> bool:
+        value, mappings, _ = self._lookup(key)
+        return value is not _MISSING or len(mappings) > 0
+
+    def __iter__(self) -> Iterator[str]:
+        # keys are returned in the order they were first defined, starting with the lowest layer
+        keys = {}
+        for layer in self._layers:
+            keys.update(dict.fromkeys(layer.keys()))
+        if self._overlay is not None:
+            keys.update(dict.fromkeys(self._overlay.keys()))
+        return iter([key for key in keys if key in self])
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.to_dict()})"
+
+    def _lookup(self, key: object) -> Tuple[Any, List[Mapping], bool]:
+        """
+        Looks up the given key in all layers of this scope, starting with the highest one.
+
+        :param key: the key to look up
+        :return: a tuple of (value, mappings, stop), where "value" is the (final) value of the key if it is not a dict,
+            "mappings" is the list of dicts to combine for the key (ordered from the highest to the lowest priority)
+            and "stop" indicates whether the values of layers below this scope are hidden.
+        """
+        mappings = []
+
+        overlay = self._overlay
+        if overlay is not None and key in overlay:
+            value = overlay[key]
+            if value is _DELETED:
+                return _MISSING, mappings, True
+            if type(value) is not _Overlay:
+                # values written to the scope replace the values of all layers
+                return value, mappings, True
+            mappings.append(value)
+
+        layers = self._reversed_layers
+        for index, layer in enumerate(layers):
+            if type(layer) is VariableScope:
+                value, layer_mappings, stop = layer._lookup(key)
+                if value is not _MISSING:
+                    if len(mappings) > 0:
+                        return _MISSING, mappings, True
+                    return value, mappings, True
+                mappings.extend(layer_mappings)
+                if stop:
+                    return _MISSING, mappings, True
+                continue
+
+            if key not in layer:
+                continue
+
+            value = layer[key]
+            if value is _DELETED:
+                return _MISSING, mappings, True
+
+            if type(layer) is _Overlay:
+                is_mapping = type(value) is _Overlay
+            else:
+                is_mapping = _is_mapping(value)
+
+            if is_mapping:
+                mappings.append(value)
+            elif len(mappings) > 0:
+                # dicts of higher layers replace other values of lower layers
+                return _MISSING, mappings, True
+            else:
+                if type(layer) is not _Overlay:
+                    # values written to a scope may replace anything, layered values may not replace dicts
+                    lower_value = self._find_mapping(layers[index + 1 :], key)
+                    if lower_value is not None:
+                        raise AssertionError(f"Incompatible types for merging dict, cannot merge {lower_value} and {value}")
+                return value, mappings, True
+
+        return _MISSING, mappings, False
+
+    @staticmethod
+    def _find_mapping(layers: List[Mapping], key: object) -> Optional[Mapping]:
+        """
+        :param layers: the layers to search, ordered from the highest to the lowest priority
+        :return: the value of the given key in the first of the given layers defining it, if that value is a dict
+        """
+        for layer in layers:
+            if key not in layer:
+                continue
+            value = layer[key]
+            if type(layer) is _Overlay:
+                return value if type(value) is _Overlay else None
+            return value if _is_mapping(value) else None
+        return None
+
+    def _get_or_create_overlay(self) -> _Overlay:
+        if self._overlay is None:
+            parent_overlay = self._parent._get_or_create_overlay()
+            existing = parent_overlay.get(self._key, None)
+            if type(existing) is _Overlay:
+                self._overlay = existing
+            else:
+                self._overlay = _Overlay()
+                parent_overlay[self._key] = self._overlay
+        return self._overlay
@@ -1,9 +1,8 @@
 from pathlib import Path
-from typing import Dict, Any
-
-import yaml
-from yaml import Loader
+from typing import Dict, Any, List, Mapping, Optional
 
+from openhasp_config_manager.processing.file_tree import FileTree
+from openhasp_config_manager.processing.variable_scope import VariableScope
 from openhasp_config_manager.util import contains_nested_dict_key, merge_dict_recursive
 
 
@@ -15,13 +14,18 @@ class VariableManager:
 
     def __init__(self, cfg_root: Path):
         self._cfg_root: Path = Path(cfg_root)
-        self._path_vars: Dict[str, Dict] = {}
+        self._path_vars: Dict[str, Mapping[str, Any]] = {}
+        self._path_var_files: Dict[str, List[Path]] = {}
 
-    def read(self):
+    def read(self, file_tree: Optional[FileTree] = None):
         """
         Reads all variable definitions from the configuration directory.
+        :param file_tree: a (shared) snapshot of the configuration directory, None to scan it
         """
-        self._path_vars = self._read(self._cfg_root)
+        if file_tree is None:
+            file_tree = FileTree(self._cfg_root)
+        self._path_var_files = {}
+        self._path_vars = self._read(self._cfg_root, file_tree)
 
     def add_var(self, key: str, value: Any, path: Path = None):
         """
@@ -34,7 +38,11 @@ class VariableManager:
 
     def add_vars(self, vars: Dict[str, Any], path: Path = None):
         """
-        Registers a set of variables to a path
+        Registers a set of variables to a path.
+
+        The given variables are layered on top of the existing ones without copying them,
+        so the given dict must not be modified afterwards.
+
         :param vars: the variables
         :param path: the path the variables should apply to
         """
@@ -46,12 +54,8 @@ class VariableManager:
             relative_path = relative_path.parent
         relative_path_str = str(relative_path)
 
-        if relative_path_str not in self._path_vars.keys():
-            self._path_vars[relative_path_str] = {}
         current_vars = self._path_vars.get(relative_path_str, {})
-        combined = merge_dict_recursive(self._path_vars[relative_path_str], current_vars)
-        combined = merge_dict_recursive(combined, vars)
-        self._path_vars[relative_path_str] = combined
+        self._path_vars[relative_path_str] = VariableScope(current_vars, vars)
 
     def get_vars(self, path: Path) -> Dict[str, Any]:
         """
@@ -64,10 +68,34 @@ class VariableManager:
         :param path: the path context to use for variable evaluation
         :return: a map of "variable name" -> "variable value given the path context"
         """
-        path_vars = self._get_vars_for_path(path)
-        return path_vars
+        return self.get_scope(path).to_dict()
+
+    def get_scope(self, path: Path) -> VariableScope:
+        """
+        Like get_vars(), but returns a view of the variables instead of copying them.
+        Changes made to the returned scope are only visible within the scope itself.
+
+        :param path: the path context to use for variable evaluation
+        :return: a scope of "variable name" -> "variable value given the path context"
+        """
+        return self._get_vars_for_path(path)
+
+    def get_var_files(self, path: Path) -> List[Path]:
+        """
+        Returns the variable definition files which contribute to the variables of a given path.
+
+        Note that variables added using add_var() or add_vars() are not backed by a file
+        and are therefore not reflected in the result.
+
+        :param path: the path context to use for variable evaluation
+        :return: list of variable definition files, ordered from the highest to the lowest level of the path
+        """
+        result = []
+        for current_path_str in self._get_hierarchy_of_path(path):
+            result.extend(self._path_var_files.get(current_path_str, []))
+        return result
 
-    def _get_vars_for_path(self, path: Path) -> Dict[str, Any]:
+    def _get_vars_for_path(self, path: Path) -> VariableScope:
         """
         Returns the variable definitions and values for a given path.
 
@@ -78,7 +106,20 @@ class VariableManager:
         :param path: the path context to use for variable evaluation
         :return: a map of "variable name" -> "variable value given the path context"
         """
-        result = {}
+        layers = []
+        for current_path_str in self._get_hierarchy_of_path(path):
+            if current_path_str in self._path_vars:
+                layers.append(self._path_vars[current_path_str])
+
+        return VariableScope(*layers)
+
+    def _get_hierarchy_of_path(self, path: Path) -> List[str]:
+        """
+        Returns all directories along the given path, starting with the highest level.
+        :param path: the path to compute the hierarchy for
+        :return: list of directories, as strings, like they are used as keys for variable lookup
+        """
+        result = []
 
         toplevel_path = self._cfg_root
         relative_path = Path(toplevel_path, path.relative_to(toplevel_path))
@@ -92,55 +133,49 @@ class VariableManager:
                 current_path = Path(subfolder)
             else:
                 current_path = Path(current_path, subfolder)
-            current_path_str = str(current_path)
-            result = merge_dict_recursive(result, self._path_vars.get(current_path_str, {}))
+            result.append(str(current_path))
 
         return result
 
-    def _read(self, path: Path) -> Dict[str, Dict]:
+    def _read(self, path: Path, file_tree: FileTree) -> Dict[str, Dict]:
         """
         Reads all "*.yaml" variable definition files in the given path
         :return: a map of "path -> dict of variables"
         """
         result = {}
-        for toplevel_path in [path]:
-            for p in list(toplevel_path.glob("**/**")):
-                if not p.is_dir():
-                    continue
-
-                if p.name.startswith("."):
-                    continue
+        for p in file_tree.iter_directories(path):
+            if p.name.startswith("."):
+                continue
 
-                path_vars = self._create_vars_dict_for_path(p)
+            path_vars = self._create_vars_dict_for_path(p, file_tree)
 
-                if contains_nested_dict_key(path_vars, "items"):
-                    # TODO: to avoid this, variables could be accessed by only exposing them
-                    #  to jinja2 templates via a custom function like f.ex. "vars('my.key.items.a')".
-                    #  This may be cumbersome to use though...
-                    raise AssertionError(
-                        "Variables contain key 'items' which conflicts with the built-in function of jinja2. Please choose a different name."
-                    )
+            if contains_nested_dict_key(path_vars, "items"):
+                # TODO: to avoid this, variables could be accessed by only exposing them
+                #  to jinja2 templates via a custom function like f.ex. "vars('my.key.items.a')".
+                #  This may be cumbersome to use though...
+                raise AssertionError(
+                    "Variables contain key 'items' which conflicts with the built-in function of jinja2. Please choose a different name."
+                )
 
-                path_str = str(p)
-                if path_str not in result:
-                    result[path_str] = {}
-                result[path_str] = merge_dict_recursive(result[path_str], self._create_vars_dict_for_path(p))
+            result[str(p)] = path_vars
 
         return result
 
-    def _create_vars_dict_for_path(self, path: Path) -> Dict[str, Dict]:
+    def _create_vars_dict_for_path(self, path: Path, file_tree: FileTree) -> Dict[str, Dict]:
         """
         Creates a dictionary containing all the variables for a given path by reading
         the yaml files in this path. This does _not_ take the path hierarchy
         into account. Only variables in the exact path will be returned in the result.
         :param path: the path to use as a context
+        :param file_tree: the snapshot of the configuration directory
         :return: a variable dictionary
         """
         result = {}
-        path_var_files = list(path.glob("*.yaml"))
-        for file in path_var_files:
-            if not file.is_file():
-                continue
+        for file_info in file_tree.find_files(path, ".yaml", recursive=False):
+            file = file_info.path
+            self._path_var_files.setdefault(str(path), [])
+            if file not in self._path_var_files[str(path)]:
+                self._path_var_files[str(path)].append(file)
 
             data = self._load_var_file(file)
 
@@ -154,5 +189,9 @@ class VariableManager:
 
     @staticmethod
     def _load_var_file(file: Path) -> Dict:
+        # imported lazily, since variables are not needed by every command
+        import yaml
+        from yaml import Loader
+
         content = file.read_text()
         return yaml.load(content, Loader=Loader)
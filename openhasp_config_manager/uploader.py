@@ -1,11 +1,104 @@
 import difflib
+import random
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import orjson
 
 from openhasp_config_manager import util
-from openhasp_config_manager.gui.util import print_diff_to_console, info, warn
+from openhasp_config_manager.gui.util import print_diff_to_console, info, warn, echo
 from openhasp_config_manager.openhasp_client.model.device import Device
 from openhasp_config_manager.openhasp_client.openhasp import OpenHaspClient
+from openhasp_config_manager.processing.output_manifest import (
+    MANIFEST_FILE_NAME,
+    TEXT_FILE_SUFFIXES,
+    ManifestEntry,
+    OutputManifest,
+)
+
+UPLOAD_STATE_FILE_NAME = "uploaded.json"
+# suffix of the checksum files, which stored the upload state of each file before UPLOAD_STATE_FILE_NAME
+LEGACY_CHECKSUM_FILE_SUFFIX = ".md5"
+
+CONFIG_SECTION_MQTT = "mqtt"
+CONFIG_SECTION_HTTP = "http"
+CONFIG_SECTION_GUI = "gui"
+
+
+def _format_size(size: float) -> str:
+    """
+    :param size: number of bytes
+    :return: human readable size, f.ex. "12.3 KiB"
+    """
+    for unit in ["B", "KiB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} MiB"
+
+
+def _format_throughput(size: int, duration: float) -> str:
+    """
+    :param size: number of transferred bytes
+    :param duration: duration of the transfer in seconds
+    :return: human readable transfer rate, f.ex. "12.3 KiB/s"
+    """
+    bytes_per_second = size / duration if duration > 0 else float(size)
+    return f"{_format_size(bytes_per_second)}/s"
+
+
+@dataclass
+class PlannedUpload:
+    """
+    A file which needs to be uploaded to a device.
+    """
+
+    path: Path
+    entry: ManifestEntry
+    # the checksum of the file currently present on the device, if it has been downloaded
+    device_checksum: Optional[str] = None
+    # the content of the file currently present on the device, only kept for text files (to print a diff)
+    device_content: Optional[bytes] = None
+
+    @property
+    def name(self) -> str:
+        return self.entry.name
+
+    @property
+    def is_text(self) -> bool:
+        return self.path.suffix in TEXT_FILE_SUFFIXES
+
+
+@dataclass
+class UploadPlan:
+    """
+    The full set of changes necessary to bring a device up-to-date with its generated output.
+    """
+
+    # files to delete from the device
+    deletions: List[str] = field(default_factory=list)
+    # files to upload, in the order they are uploaded
+    uploads: List[PlannedUpload] = field(default_factory=list)
+    # the config sections to write, by name of the section
+    config_changes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def has_changes(self) -> bool:
+        return len(self.deletions) > 0 or len(self.uploads) > 0 or len(self.config_changes) > 0
+
+    @property
+    def upload_size(self) -> int:
+        """
+        :return: the total number of bytes to upload
+        """
+        return sum(upload.entry.size for upload in self.uploads)
+
+
+def _upload_order(upload: PlannedUpload) -> Tuple[int, int, str]:
+    # small text files first, so a partially uploaded configuration is usable, large binaries last
+    return 0 if upload.is_text else 1, upload.entry.size, upload.name
 
 
 class ConfigUploader:
@@ -14,118 +107,186 @@ class ConfigUploader:
         self._output_root = output_root
         self._cache_dir = Path(self._output_root, ".cache")
 
-    def upload(self, device: Device, purge: bool = False, print_diff: bool = False) -> bool:
+    def upload(
+        self,
+        device: Device,
+        purge: bool = False,
+        print_diff: bool = False,
+        trust_cache: bool = False,
+        verify_sample: int = 0,
+        dry_run: bool = False,
+    ) -> bool:
         """
         Uploads configuration files and config properties to a device.
         :param device: The device to upload to.
         :param purge: If True, removes files from the device, which are not present in the generated output.
         :param print_diff: If true, a diff will be printed to the console for each file that has changed.
+        :param trust_cache: If true, files which have not changed since they were last uploaded, and whose size
+            on the device matches, are skipped without downloading their content from the device.
+        :param verify_sample: Number of randomly chosen files to download and verify anyway, when trust_cache is used.
+        :param dry_run: If true, the planned changes are only printed, without changing anything on the device.
         :return: True if any files have changed, false otherwise.
         """
-        result = False
+        plan = self.plan(device, purge, trust_cache, verify_sample)
+        if dry_run:
+            self.print_plan(device, plan)
+            return False
+        return self.execute(device, plan, print_diff)
 
-        if purge:
-            result |= self.cleanup_device(device)
-
-        result |= self._upload_files(device, print_diff)
-        result |= self._update_config(device)
-        return result
+    def plan(self, device: Device, purge: bool = False, trust_cache: bool = False, verify_sample: int = 0) -> UploadPlan:
+        """
+        Determines the changes necessary to bring the given device up-to-date with its generated output.
+        :param device: the target device
+        :param purge: whether to remove files from the device, which are not present in the generated output
+        :param trust_cache: whether to skip downloading files, which have not changed since they were last uploaded
+        :param verify_sample: number of randomly chosen files to verify anyway, when trust_cache is used
+        :return: the plan
+        """
+        plan = self._plan_file_changes(device, purge, trust_cache, verify_sample)
+        plan.config_changes = self._plan_config_changes(device)
+        return plan
+
+    def _plan_file_changes(self, device: Device, purge: bool, trust_cache: bool, verify_sample: int) -> UploadPlan:
+        manifest = self._load_manifest(device)
+        upload_state = self._load_upload_state(device)
+
+        trusted_files = set()
+        if trust_cache:
+            file_sizes = self._api_client.get_file_sizes()
+            existing_files = list(file_sizes)
+            trusted_files = self._find_trusted_files(manifest, upload_state, file_sizes, verify_sample)
+        else:
+            existing_files = self._api_client.get_files()
 
-    def _upload_files(self, device: Device, print_diff: bool) -> bool:
-        existing_files = self._api_client.get_files()
+        plan = UploadPlan()
+        if purge:
+            plan.deletions = self._plan_deletions(manifest, existing_files)
+        plan.uploads = self._plan_uploads(device, manifest, upload_state, existing_files, trusted_files)
+        return plan
 
-        result = False
+    def execute(self, device: Device, plan: UploadPlan, print_diff: bool = False) -> bool:
+        """
+        Applies the given plan to a device.
+        :param device: the target device
+        :param plan: the plan, see plan()
+        :param print_diff: If true, a diff will be printed to the console for each file that has changed.
+        :return: True if anything has changed, false otherwise.
+        """
+        self._delete_files(device, plan.deletions)
+        self._execute_uploads(device, plan.uploads, print_diff)
+        self._write_config(plan.config_changes)
+        return plan.has_changes
 
-        for file in device.output_dir.iterdir():
+    @staticmethod
+    def print_plan(device: Device, plan: UploadPlan):
+        """
+        Prints the given plan to the console.
+        :param device: the target device
+        :param plan: the plan
+        """
+        info(f"Planned changes for device '{device.name}':")
+        if not plan.has_changes:
+            echo("  (none)")
+        for name in plan.deletions:
+            echo(f"  delete  {name}")
+        for upload in plan.uploads:
+            echo(f"  upload  {upload.name} ({_format_size(upload.entry.size)})")
+        for section in plan.config_changes:
+            echo(f"  config  {section}")
+        info(f"Estimated upload size: {_format_size(plan.upload_size)} in {len(plan.uploads)} files")
+
+    def _plan_uploads(
+        self,
+        device: Device,
+        manifest: OutputManifest,
+        upload_state: Dict[str, str],
+        existing_files: List[str],
+        trusted_files: Set[str],
+    ) -> List[PlannedUpload]:
+        result = []
+        for entry in manifest.entries:
+            file = Path(device.output_dir, entry.name)
             info(f"Preparing '{file.name}' for upload...")
 
-            if file.suffix in [".cmd", ".jsonl"]:
-                result |= self._upload_text_file(device, print_diff, file, existing_files)
+            if entry.size <= 0:
+                warn(f"File is empty, skipping upload: {file}")
+                continue
+
+            if entry.name in trusted_files:
+                info(f"Skipping {file} because it hasn't changed since the last upload.")
+                continue
+
+            # check if the checksum of the file has changed on the device
+            device_content = None
+            device_checksum = None
+            if file.name in existing_files:
+                device_content = self._api_client.get_file_content(file.name)
+                device_checksum = util.calculate_checksum(device_content)
+
+            if self._has_changed(upload_state.get(file.name, None), device_checksum, entry):
+                upload = PlannedUpload(path=file, entry=entry, device_checksum=device_checksum)
+                if upload.is_text:
+                    upload.device_content = device_content
+                result.append(upload)
             else:
-                result |= self._upload_binary_file(device, print_diff, file, existing_files)
-
-        return result
-
-    def _upload_text_file(self, device, print_diff, file, existing_files) -> bool:
-        result = False
-
-        content = file.read_text()
-        if len(content) <= 0:
-            warn(f"File is empty, skipping upload: {file}")
-            return result
-
-        # check if the checksum of the file has changed on the device
-        file_content_on_device = ""
-        if file.name in existing_files:
-            file_content_on_device = self._api_client.get_file_content(file.name).decode("utf-8")
-            device_file_content_checksum = util.calculate_checksum(file_content_on_device.encode("utf-8"))
-        else:
-            device_file_content_checksum = None
-
-        new_checksum = self._check_if_checksum_will_change(
-            file=file,
-            original_checksum=device_file_content_checksum,
-            new_content=content.encode("utf-8"),
+                info(f"Skipping {file} because it hasn't changed.")
+
+        return sorted(result, key=_upload_order)
+
+    def _execute_uploads(self, device: Device, uploads: List[PlannedUpload], print_diff: bool):
+        upload_state = self._load_upload_state(device)
+        try:
+            for upload in uploads:
+                if upload.is_text:
+                    self._upload_text_file(device, print_diff, upload)
+                else:
+                    self._upload_binary_file(device, print_diff, upload)
+                upload_state[upload.name] = upload.entry.checksum
+        finally:
+            self._save_upload_state(device, upload_state)
+
+    def _upload_text_file(self, device: Device, print_diff: bool, upload: PlannedUpload):
+        content = upload.path.read_text()
+        if print_diff:
+            file_content_on_device = "" if upload.device_content is None else upload.device_content.decode("utf-8")
+            diff_output = self._calculate_diff(
+                file_name=upload.name,
+                string1=file_content_on_device,
+                string2=content,
+            )
+            print_diff_to_console(diff_output)
+        encoded_content = content.encode("utf-8")
+        self._upload_and_report(
+            device, upload.name, upload.entry, lambda: self._api_client.upload_file(upload.name, encoded_content)
         )
 
-        if new_checksum is not None:
-            result = True
-            if print_diff:
-                diff_output = self._calculate_diff(
-                    file_name=file.name,
-                    string1=file_content_on_device,
-                    string2=content,
-                )
-                print_diff_to_console(diff_output)
-            try:
-                self._api_client.upload_file(file.name, content.encode("utf-8"))
-                checksum_file = self._get_checksum_file(file)
-                checksum_file.parent.mkdir(parents=True, exist_ok=True)
-                checksum_file.write_text(new_checksum)
-            except Exception as ex:
-                raise Exception(f"Error uploading file '{file.name}' to '{device.name}': {ex}")
-        else:
-            info(f"Skipping {file} because it hasn't changed.")
-
-        return result
-
-    def _upload_binary_file(self, device, print_diff, file, existing_files) -> bool:
-        result = False
-
-        content = file.read_bytes()
-        if len(content) <= 0:
-            warn(f"File is empty, skipping upload: {file}")
-            return result
-
-        # check if the checksum of the file has changed on the device
-        file_content_on_device = b""
-        if file.name in existing_files:
-            file_content_on_device: bytes = self._api_client.get_file_content(file.name)
-            device_file_content_checksum = util.calculate_checksum(file_content_on_device)
-        else:
-            device_file_content_checksum = None
-
-        new_checksum = self._check_if_checksum_will_change(
-            file=file,
-            original_checksum=device_file_content_checksum,
-            new_content=content,
+    def _upload_binary_file(self, device: Device, print_diff: bool, upload: PlannedUpload):
+        if print_diff:
+            info(f"Binary file '{upload.name}' has changed ({upload.device_checksum} -> {upload.entry.checksum})")
+        # binary files (images, fonts) can be large, so they are streamed from disk
+        self._upload_and_report(
+            device, upload.name, upload.entry, lambda: self._api_client.upload_file_from_path(upload.name, upload.path)
         )
 
-        if new_checksum is not None:
-            result = True
-            if print_diff:
-                info(f"Binary file '{file.name}' has changed ({device_file_content_checksum} -> {new_checksum})")
-            try:
-                self._api_client.upload_file(file.name, content)
-                checksum_file = self._get_checksum_file(file)
-                checksum_file.parent.mkdir(parents=True, exist_ok=True)
-                checksum_file.write_text(new_checksum)
-            except Exception as ex:
-                raise Exception(f"Error uploading file '{file.name}' to '{device.name}': {ex}")
-        else:
-            info(f"Skipping {file} because it hasn't changed.")
+    @staticmethod
+    def _upload_and_report(device: Device, file_name: str, entry: ManifestEntry, upload: Callable[[], None]):
+        """
+        Uploads a single file and reports its duration and throughput.
 
-        return result
+        Transient failures are already retried by the http session of the plate, so a failed upload is not retried here.
+        :param device: the target device
+        :param file_name: the name of the file
+        :param entry: the manifest entry of the file
+        :param upload: uploads the file to the device
+        """
+        start = time.perf_counter()
+        try:
+            upload()
+        except Exception as ex:
+            raise Exception(f"Error uploading file '{file_name}' to '{device.name}': {ex}")
+
+        duration = time.perf_counter() - start
+        info(f"Uploaded '{file_name}' ({entry.size} bytes) in {duration:.1f}s ({_format_throughput(entry.size, duration)})")
 
     def cleanup_device(self, device: Device) -> bool:
         """
@@ -133,80 +294,170 @@ class ConfigUploader:
         :param device: the target device
         :return: True if any files have been deleted, false otherwise
         """
-        result = False
+        deletions = self._plan_deletions(self._load_manifest(device), self._api_client.get_files())
+        self._delete_files(device, deletions)
+        return len(deletions) > 0
 
+    @staticmethod
+    def _plan_deletions(manifest: OutputManifest, files_on_device: List[str]) -> List[str]:
+        """
+        :return: the files which are on the device, but not present in the generated output
+        """
         file_names = ["config.json"]
-        for file in device.output_dir.iterdir():
-            file_names.append(file.name)
-
-        # cleanup files which are on the device, but not present in the generated output
-        files_on_device = self._api_client.get_files()
-        for f in files_on_device:
-            if f not in file_names:
-                result = True
-                info(f"Deleting file '{f}' from device '{device.name}'")
-                self._api_client.delete_file(f)
-        return result
+        for entry in manifest.entries:
+            file_names.append(entry.name)
+
+        return [f for f in files_on_device if f not in file_names]
 
-    def _check_if_checksum_will_change(self, file: Path, original_checksum: str, new_content: bytes) -> Optional[str]:
+    def _delete_files(self, device: Device, file_names: List[str]):
+        for f in file_names:
+            info(f"Deleting file '{f}' from device '{device.name}'")
+            self._api_client.delete_file(f)
+
+    @staticmethod
+    def _find_trusted_files(
+        manifest: OutputManifest, upload_state: Dict[str, str], file_sizes: Dict[str, int], verify_sample: int
+    ) -> Set[str]:
         """
-        Checks if the checksum for the given file has changed since it was last uploaded.
-        :param file: the path of the file to check
-        :param original_checksum: expected checksum of the original content
-        :param new_content: the content of the new file
-        :return: new checksum if the checksum changed, None otherwise
+        Determines the files which can be skipped without downloading their content from the device.
+        :param manifest: the manifest of the generated output
+        :param upload_state: the checksum of each file, at the time it was last uploaded
+        :param file_sizes: the size of each file currently present on the device
+        :param verify_sample: number of otherwise trusted files, which should be verified nonetheless
+        :return: names of the files whose generated content matches the last upload, and whose size on the device
+            matches the generated content
         """
-        changed = False
+        result = [
+            entry.name
+            for entry in manifest.entries
+            if upload_state.get(entry.name, None) == entry.checksum and file_sizes.get(entry.name, None) == entry.size
+        ]
 
-        new_content_checksum = util.calculate_checksum(new_content)
-        checksum_file = self._get_checksum_file(file)
-        if not checksum_file.exists():
-            changed = True
-        else:
-            old_hash = checksum_file.read_text().strip()
-            if old_hash != original_checksum or old_hash != new_content_checksum:
-                changed = True
+        if verify_sample > 0 and len(result) > 0:
+            verified_files = random.sample(result, min(verify_sample, len(result)))
+            info(f"Verifying the content of: {', '.join(sorted(verified_files))}")
+            result = [name for name in result if name not in verified_files]
+
+        return set(result)
+
+    @staticmethod
+    def _has_changed(uploaded_checksum: Optional[str], device_checksum: Optional[str], entry: ManifestEntry) -> bool:
+        """
+        Checks if the given file has changed since it was last uploaded.
+        :param uploaded_checksum: checksum of the content the file had when it was last uploaded, if any
+        :param device_checksum: checksum of the content currently present on the device, if any
+        :param entry: the manifest entry of the generated file
+        :return: True if the file needs to be uploaded, false otherwise
+        """
+        if uploaded_checksum is None:
+            return True
+        return uploaded_checksum != device_checksum or uploaded_checksum != entry.checksum
 
-        if changed:
-            return new_content_checksum
+    def _load_manifest(self, device: Device) -> OutputManifest:
+        """
+        Loads the manifest of the generated output of the given device.
+        :param device: the device
+        :return: the manifest
+        """
+        manifest_file = Path(self._cache_dir, device.name, MANIFEST_FILE_NAME)
+        manifest = OutputManifest(manifest_file)
+        if manifest.exists():
+            manifest.load()
         else:
-            return None
+            # the output has been generated without a manifest
+            manifest = OutputManifest.from_directory(manifest_file, device.output_dir)
+        return manifest
 
-    def _get_checksum_file(self, file: Path) -> Path:
-        return Path(
-            self._cache_dir,
-            *file.relative_to(self._output_root).parts[:-1],
-            file.name + ".md5",
-        )
+    def _get_upload_state_file(self, device: Device) -> Path:
+        return Path(self._cache_dir, device.name, UPLOAD_STATE_FILE_NAME)
 
-    def _update_config(self, device: Device):
-        config_has_changed = False
+    def _load_upload_state(self, device: Device) -> Dict[str, str]:
+        """
+        :param device: the device
+        :return: the checksum of each file, at the time it was last uploaded to the given device
+        """
+        upload_state_file = self._get_upload_state_file(device)
+        if not upload_state_file.is_file():
+            return self._migrate_legacy_checksum_files(device)
+        try:
+            return orjson.loads(upload_state_file.read_bytes())
+        except orjson.JSONDecodeError:
+            return {}
+
+    def _migrate_legacy_checksum_files(self, device: Device) -> Dict[str, str]:
+        """
+        Converts the checksum files, which were written for each uploaded file by previous versions,
+        into the upload state of the given device and deletes them.
+        :param device: the device
+        :return: the checksum of each file, at the time it was last uploaded to the given device
+        """
+        try:
+            checksum_dir = Path(self._cache_dir, *device.output_dir.relative_to(self._output_root).parts)
+        except ValueError:
+            return {}
+        checksum_files = sorted(checksum_dir.glob(f"*{LEGACY_CHECKSUM_FILE_SUFFIX}"))
+        if len(checksum_files) <= 0:
+            return {}
+
+        upload_state = {
+            checksum_file.name.removesuffix(LEGACY_CHECKSUM_FILE_SUFFIX): checksum_file.read_text().strip()
+            for checksum_file in checksum_files
+        }
+        self._save_upload_state(device, upload_state)
+        for checksum_file in checksum_files:
+            checksum_file.unlink()
+        return upload_state
+
+    def _save_upload_state(self, device: Device, upload_state: Dict[str, str]):
+        upload_state_file = self._get_upload_state_file(device)
+        upload_state_file.parent.mkdir(parents=True, exist_ok=True)
+        upload_state_file.write_bytes(orjson.dumps(upload_state, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+
+    def _plan_config_changes(self, device: Device) -> Dict[str, Any]:
+        """
+        Compares the config sections of the device with the configuration.
+        :param device: the target device
+        :return: the config sections which need to be written, by name of the section
+        """
+        result = {}
 
         current_mqtt_config = self._api_client.get_mqtt_config()
         if current_mqtt_config == device.config.mqtt:
             info("MQTT config has not changed")
         else:
-            info("Updating MQTT config...")
-            self._api_client.set_mqtt_config(device.config.mqtt)
-            config_has_changed = True
+            result[CONFIG_SECTION_MQTT] = device.config.mqtt
 
         current_http_config = self._api_client.get_http_config()
         if current_http_config == device.config.http:
             info("HTTP config has not changed")
         else:
-            info("Updating HTTP config...")
-            self._api_client.set_http_config(device.config.http)
-            config_has_changed = True
+            result[CONFIG_SECTION_HTTP] = device.config.http
 
         current_gui_config = self._api_client.get_gui_config()
         if current_gui_config == device.config.gui:
             info("GUI config has not changed")
         else:
-            info("Updating GUI config...")
-            self._api_client.set_gui_config(device.config.gui)
-            config_has_changed = True
+            result[CONFIG_SECTION_GUI] = device.config.gui
+
+        return result
 
-        return config_has_changed
+    def _write_config(self, config_changes: Dict[str, Any]):
+        """
+        Writes the given config sections to the device.
+
+        Each changed section is written with a single request, as the firmware only
+        saves one section per request. Unchanged sections are not written at all.
+
+        :param config_changes: the config sections to write, by name of the section
+        """
+        setters = {
+            CONFIG_SECTION_MQTT: self._api_client.set_mqtt_config,
+            CONFIG_SECTION_HTTP: self._api_client.set_http_config,
+            CONFIG_SECTION_GUI: self._api_client.set_gui_config,
+        }
+        for section, config in config_changes.items():
+            info(f"Updating {section.upper()} config...")
+            setters[section](config)
 
     @staticmethod
     def _calculate_diff(file_name: str, string1: str, string2: str) -> str:
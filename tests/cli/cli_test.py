@@ -0,0 +1,88 @@
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from tests import TestBase
+
+# the directory containing the package, used as the working directory of the subprocesses
+PROJECT_ROOT = Path(TestBase._test_folder).absolute().parent
+
+# modules which are expensive to import and must not be needed to show the help or to send a command
+HEAVY_MODULES = [
+    "asyncio",
+    "jinja2",
+    "yaml",
+    "requests",
+    "telnetlib3",
+    "PIL",
+    "openhasp_config_manager.manager",
+    "openhasp_config_manager.processing.template_rendering",
+]
+
+
+class TestCliStartup(TestBase):
+    # time (in seconds) the CLI may add to the startup of the interpreter to show the help
+    HELP_STARTUP_BUDGET = 0.3
+
+    def test_help_does_not_import_heavy_modules(self):
+        # GIVEN
+        code = """
+from openhasp_config_manager.cli import cli
+try:
+    cli(["--help"])
+except SystemExit:
+    pass
+"""
+
+        # WHEN
+        loaded_modules = self._get_loaded_modules(code)
+
+        # THEN
+        assert [m for m in HEAVY_MODULES if m in loaded_modules] == []
+
+    def test_help_startup_time_is_within_budget(self):
+        # GIVEN
+        interpreter_startup = self._measure_startup("pass")
+
+        # WHEN
+        cli_startup = self._measure_startup("from openhasp_config_manager.cli import cli; cli(['--help'])")
+
+        # THEN
+        assert cli_startup - interpreter_startup < self.HELP_STARTUP_BUDGET
+
+    def test_resolving_a_device_for_a_command_does_not_import_the_processing_stack(self):
+        # GIVEN
+        code = f"""
+from pathlib import Path
+from openhasp_config_manager.cli.common import _create_config_manager, _resolve_devices
+from openhasp_config_manager.openhasp_client.openhasp import OpenHaspClient
+
+config_manager = _create_config_manager(Path({str(self.cfg_root.absolute())!r}), Path("./nonexistent"))
+for device in _resolve_devices(config_manager, "test_device"):
+    OpenHaspClient(device)
+"""
+
+        # WHEN
+        loaded_modules = self._get_loaded_modules(code)
+
+        # THEN
+        unexpected = ["jinja2", "yaml", "requests", "telnetlib3", "PIL", "openhasp_config_manager.processing.device_processor"]
+        assert [m for m in unexpected if m in loaded_modules] == []
+
+    @staticmethod
+    def _get_loaded_modules(code: str) -> List[str]:
+        code += "\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))\n"
+        result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+        return json.loads(result.stdout.splitlines()[-1])
+
+    @staticmethod
+    def _measure_startup(code: str, runs: int = 3) -> float:
+        durations = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, check=True)
+            durations.append(time.perf_counter() - start)
+        return min(durations)
@@ -0,0 +1,152 @@
+import dataclasses
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from openhasp_config_manager.cli import common
+from openhasp_config_manager.cli.common import _generate_all, _resolve_devices, _upload_all
+from openhasp_config_manager.manager import ConfigManager
+from openhasp_config_manager.openhasp_client.model.device import Device
+from openhasp_config_manager.processing.variables import VariableManager
+from tests import TestBase
+
+
+class TestCliCommon(TestBase):
+    async def test_generate_all_in_parallel_matches_serial_output(self, tmp_path):
+        # GIVEN
+        variable_manager = VariableManager(self.cfg_root)
+        manager = ConfigManager(self.cfg_root, tmp_path, variable_manager)
+        device = manager.analyze()[0]
+
+        serial_device = dataclasses.replace(device, output_dir=Path(tmp_path, "serial"))
+        parallel_devices = [
+            dataclasses.replace(device, name=f"parallel_{i}", output_dir=Path(tmp_path, f"parallel_{i}")) for i in range(2)
+        ]
+
+        # WHEN
+        await _generate_all(manager, [serial_device], jobs=1)
+        stats = await _generate_all(manager, parallel_devices, jobs=2)
+
+        # THEN
+        expected = {f.name: f.read_bytes() for f in serial_device.output_dir.iterdir()}
+        assert len(expected) > 0
+        for parallel_device in parallel_devices:
+            result = {f.name: f.read_bytes() for f in parallel_device.output_dir.iterdir()}
+            assert result == expected
+        # statistics of the worker processes are combined
+        assert stats["templates"].misses > 0
+
+    async def test_generate_all_in_parallel_reports_failed_devices(self, tmp_path):
+        # GIVEN
+        variable_manager = VariableManager(self.cfg_root)
+        manager = ConfigManager(self.cfg_root, tmp_path, variable_manager)
+        device = manager.analyze()[0]
+
+        working_device = dataclasses.replace(device, name="working", output_dir=Path(tmp_path, "working"))
+        broken_device = dataclasses.replace(device, name="broken", output_dir=Path(tmp_path, "broken"), jsonl=[])
+
+        # WHEN
+        with pytest.raises(Exception) as ex_info:
+            await _generate_all(manager, [working_device, broken_device], jobs=2)
+
+        # THEN
+        assert "broken" in str(ex_info.value)
+        assert "working" not in str(ex_info.value)
+        assert any(working_device.output_dir.iterdir())
+
+    def test_resolve_devices_only_reads_device_config(self, tmp_path, monkeypatch):
+        # GIVEN
+        variable_manager = VariableManager(self.cfg_root)
+        manager = ConfigManager(self.cfg_root, tmp_path, variable_manager)
+
+        def _fail(*args, **kwargs):
+            raise AssertionError("unexpected call")
+
+        monkeypatch.setattr(variable_manager, "read", _fail)
+        monkeypatch.setattr(manager, "_read_components", _fail)
+
+        # WHEN
+        devices = _resolve_devices(manager, "test_device")
+
+        # THEN
+        assert [d.name for d in devices] == ["test_device"]
+        assert devices[0].config.mqtt is not None
+        assert devices[0].jsonl == []
+        assert _resolve_devices(manager, "unknown") == []
+        assert _resolve_devices(manager, "../devices") == []
+        assert [d.name for d in _resolve_devices(manager, None)] == ["test_device"]
+
+    async def test_upload_all_limits_concurrency_and_serializes_requests_per_plate(self, tmp_path, monkeypatch):
+        # GIVEN
+        device = self._default_device(tmp_path)
+        devices = [self._with_ip(device, f"plate_{i}", f"10.0.0.{i % 3}") for i in range(6)]
+
+        lock = threading.Lock()
+        active_devices = []
+        max_active = 0
+        overlapping_plates = []
+
+        def _upload_blocking(device, *args):
+            nonlocal max_active
+            ip = device.config.openhasp_config_manager.device.ip
+            with lock:
+                if ip in [d.config.openhasp_config_manager.device.ip for d in active_devices]:
+                    overlapping_plates.append(ip)
+                active_devices.append(device)
+                max_active = max(max_active, len(active_devices))
+            time.sleep(0.05)
+            with lock:
+                active_devices.remove(device)
+            return device.name == "plate_1"
+
+        monkeypatch.setattr(common, "_upload_blocking", _upload_blocking)
+
+        # WHEN
+        results = await _upload_all(devices, tmp_path, purge=False, show_diff=False, concurrency=2)
+
+        # THEN
+        assert [r.device.name for r in results] == [d.name for d in devices]
+        assert [r.device.name for r in results if r.changed] == ["plate_1"]
+        assert max_active == 2
+        assert overlapping_plates == []
+
+    async def test_upload_all_reports_failed_devices(self, tmp_path, monkeypatch):
+        # GIVEN
+        device = self._default_device(tmp_path)
+        devices = [self._with_ip(device, "working", "10.0.0.1"), self._with_ip(device, "broken", "10.0.0.2")]
+
+        def _upload_blocking(device, *args):
+            if device.name == "broken":
+                raise ConnectionError("unreachable")
+            return False
+
+        monkeypatch.setattr(common, "_upload_blocking", _upload_blocking)
+
+        # WHEN
+        with pytest.raises(Exception) as ex_info:
+            await _upload_all(devices, tmp_path, purge=False, show_diff=False, concurrency=2)
+
+        # THEN
+        assert "broken" in str(ex_info.value)
+        assert "working" not in str(ex_info.value)
+
+    def _default_device(self, tmp_path: Path) -> Device:
+        return Device(
+            name="device",
+            path=tmp_path,
+            config=self.default_config,
+            jsonl=[],
+            cmd=[],
+            images=[],
+            fonts=[],
+            output_dir=tmp_path,
+        )
+
+    @staticmethod
+    def _with_ip(device: Device, name: str, ip: str) -> Device:
+        device_config = dataclasses.replace(device.config.openhasp_config_manager.device, ip=ip)
+        openhasp_config_manager_config = dataclasses.replace(device.config.openhasp_config_manager, device=device_config)
+        config = dataclasses.replace(device.config, openhasp_config_manager=openhasp_config_manager_config)
+        return dataclasses.replace(device, name=name, config=config)
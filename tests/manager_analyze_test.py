@@ -1,3 +1,5 @@
+import pickle
+
 from openhasp_config_manager.manager import ConfigManager
 from openhasp_config_manager.processing.variables import VariableManager
 from tests import TestBase
@@ -20,3 +22,50 @@ class TestConfigManager(TestBase):
         assert len(device.jsonl) == 4
         assert len(device.images) == 1
         assert len(device.fonts) == 0
+
+    def test_analyze_does_not_load_image_content(self, tmp_path):
+        # GIVEN
+        variable_manager = VariableManager(self.cfg_root)
+        manager = ConfigManager(self.cfg_root, tmp_path, variable_manager)
+
+        # WHEN
+        devices = manager.analyze()
+
+        # THEN
+        image = devices[0].images[0]
+        assert not image.is_content_loaded()
+        assert image.content == image.path.read_bytes()
+        assert image.is_content_loaded()
+
+    def test_loaded_image_content_is_not_compared_printed_or_pickled(self, tmp_path):
+        # GIVEN
+        variable_manager = VariableManager(self.cfg_root)
+        manager = ConfigManager(self.cfg_root, tmp_path, variable_manager)
+        image = manager.analyze()[0].images[0]
+        other = manager.analyze()[0].images[0]
+
+        # WHEN
+        content = image.content
+        unpickled = pickle.loads(pickle.dumps(image))
+
+        # THEN
+        assert image == other
+        assert repr(image) == repr(other)
+        assert not other.is_content_loaded()
+        assert not unpickled.is_content_loaded()
+        assert unpickled.content == content
+
+    def test_read_devices_matches_analyze(self, tmp_path):
+        # GIVEN
+        variable_manager = VariableManager(self.cfg_root)
+        manager = ConfigManager(self.cfg_root, tmp_path, variable_manager)
+        analyzed_device = manager.analyze()[0]
+
+        # WHEN
+        devices = manager.read_devices(analyzed_device.name)
+
+        # THEN
+        assert len(devices) == 1
+        assert devices[0].config == analyzed_device.config
+        assert devices[0].path == analyzed_device.path
+        assert devices[0].output_dir == analyzed_device.output_dir
@@ -1,7 +1,12 @@
+import shutil
 from pathlib import Path
+from typing import List
 
 from openhasp_config_manager.manager import ConfigManager
+from openhasp_config_manager.processing.device_processor import DeviceProcessor
+from openhasp_config_manager.processing.output_manifest import MANIFEST_FILE_NAME, OutputManifest, read_output_file
 from openhasp_config_manager.processing.variables import VariableManager
+from openhasp_config_manager.util import calculate_checksum
 from tests import TestBase
 
 
@@ -65,3 +70,133 @@ class TestConfigManager(TestBase):
         assert "global_var_value" in content
         assert "global_value" not in content
         assert "test_device_value" in content
+
+    def test_incremental_generation_skips_unchanged_output(self, tmp_path, monkeypatch):
+        # GIVEN
+        cfg_root = Path(tmp_path, "cfg")
+        shutil.copytree(self.cfg_root, cfg_root)
+        output_root = Path(tmp_path, "output")
+
+        self._process_all(cfg_root, output_root, incremental=False)
+        normalized_components = self._track_normalized_components(monkeypatch)
+
+        # WHEN
+        self._process_all(cfg_root, output_root, incremental=True)
+
+        # THEN
+        assert normalized_components == []
+        assert Path(output_root, "test_device", "home_page.jsonl").is_file()
+
+    def test_incremental_generation_regenerates_changed_output(self, tmp_path, monkeypatch):
+        # GIVEN
+        cfg_root = Path(tmp_path, "cfg")
+        shutil.copytree(self.cfg_root, cfg_root)
+        output_root = Path(tmp_path, "output")
+
+        self._process_all(cfg_root, output_root, incremental=True)
+        normalized_components = self._track_normalized_components(monkeypatch)
+
+        page_file = Path(cfg_root, "devices", "test_device", "home", "page.jsonl")
+        page_file.write_text(page_file.read_text().replace('"Hello"', '"Changed"'))
+
+        # WHEN
+        self._process_all(cfg_root, output_root, incremental=True)
+
+        # THEN
+        assert "home_page.jsonl" in normalized_components
+        assert "home.cmd" not in normalized_components
+        assert "home_image_50x50.png" not in normalized_components
+        assert "Changed" in Path(output_root, "test_device", "home_page.jsonl").read_text()
+
+    def test_incremental_generation_regenerates_output_when_variables_change(self, tmp_path, monkeypatch):
+        # GIVEN
+        cfg_root = Path(tmp_path, "cfg")
+        shutil.copytree(self.cfg_root, cfg_root)
+        output_root = Path(tmp_path, "output")
+
+        self._process_all(cfg_root, output_root, incremental=True)
+        normalized_components = self._track_normalized_components(monkeypatch)
+
+        Path(cfg_root, "global.vars.yaml").write_text('global:\n  var: "changed_global_var_value"\n')
+
+        # WHEN
+        self._process_all(cfg_root, output_root, incremental=True)
+
+        # THEN
+        assert "home_page.jsonl" in normalized_components
+        assert "home.cmd" not in normalized_components
+        assert "changed_global_var_value" in Path(output_root, "test_device", "home_page.jsonl").read_text()
+
+    def test_common_components_are_parsed_once_for_all_devices(self, tmp_path):
+        # GIVEN
+        cfg_root = Path(tmp_path, "cfg")
+        shutil.copytree(self.cfg_root, cfg_root)
+        shutil.copytree(Path(cfg_root, "devices", "test_device"), Path(cfg_root, "devices", "other_device"))
+
+        variable_manager = VariableManager(cfg_root)
+        manager = ConfigManager(cfg_root, Path(tmp_path, "output"), variable_manager)
+        devices = manager.analyze()
+
+        # WHEN
+        for device in devices:
+            manager.process(device)
+
+        # THEN
+        distinct_contents = {component.content for device in devices for component in device.jsonl}
+        stats = manager.get_parse_cache_stats()
+        assert len(devices) == 2
+        assert stats.misses == len(distinct_contents)
+        assert stats.hits > 0
+
+    def test_process_writes_output_manifest(self, tmp_path):
+        # GIVEN
+        output_root = Path(tmp_path, "output")
+
+        # WHEN
+        self._process_all(self.cfg_root, output_root, incremental=False)
+
+        # THEN
+        manifest = OutputManifest(Path(output_root, ".cache", "test_device", MANIFEST_FILE_NAME))
+        manifest.load()
+        output_files = sorted(Path(output_root, "test_device").iterdir())
+        assert [e.name for e in manifest.entries] == [f.name for f in output_files]
+        for entry, file in zip(manifest.entries, output_files):
+            content = read_output_file(file)
+            assert entry.size == len(content)
+            assert entry.checksum == calculate_checksum(content)
+
+    def test_incremental_generation_keeps_manifest_entries_of_unchanged_output(self, tmp_path):
+        # GIVEN
+        output_root = Path(tmp_path, "output")
+        manifest_file = Path(output_root, ".cache", "test_device", MANIFEST_FILE_NAME)
+        self._process_all(self.cfg_root, output_root, incremental=True)
+        manifest = OutputManifest(manifest_file)
+        manifest.load()
+        expected_entries = manifest.entries
+
+        # WHEN
+        self._process_all(self.cfg_root, output_root, incremental=True)
+
+        # THEN
+        manifest.load()
+        assert len(expected_entries) > 0
+        assert manifest.entries == expected_entries
+
+    @staticmethod
+    def _process_all(cfg_root: Path, output_root: Path, incremental: bool):
+        variable_manager = VariableManager(cfg_root)
+        manager = ConfigManager(cfg_root, output_root, variable_manager, incremental=incremental)
+        for device in manager.analyze():
+            manager.process(device)
+
+    @staticmethod
+    def _track_normalized_components(monkeypatch) -> List[str]:
+        result = []
+        original_normalize = DeviceProcessor.normalize
+
+        def _normalize(self, device, component):
+            result.append(component.name)
+            return original_normalize(self, device, component)
+
+        monkeypatch.setattr(DeviceProcessor, "normalize", _normalize)
+        return result
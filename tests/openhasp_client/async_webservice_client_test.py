@@ -0,0 +1,211 @@
+from typing import List, Tuple
+
+import orjson
+import pytest
+from aiohttp import web
+
+from openhasp_config_manager.openhasp_client import async_webservice_client
+from openhasp_config_manager.openhasp_client.async_webservice_client import AsyncWebserviceClient, close_async_sessions
+from openhasp_config_manager.openhasp_client.http_session import RetryConfig
+from openhasp_config_manager.openhasp_client.webservice_client import MIN_UPLOAD_BYTES_PER_SECOND
+from tests import TestBase
+
+
+class FakePlate:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.requests: List[Tuple[str, str]] = []
+        self.connections = set()
+        self.forms = []
+        self._runner = None
+        self.url = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"127.0.0.1:{port}"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests.append((request.method, request.path_qs))
+        self.connections.add(request.transport.get_extra_info("peername"))
+        if self.failures > 0:
+            self.failures -= 1
+            return web.Response(status=503, text="busy")
+
+        if request.path == "/list":
+            return web.Response(
+                body=orjson.dumps([{"type": "file", "name": "boot.cmd", "size": 10}]), content_type="text/plain"
+            )
+        if request.path == "/api/config/gui/":
+            return web.json_response(
+                {"idle1": 10, "idle2": 60, "rotate": 1, "cursor": 0, "bckl": 32, "bcklinv": 0, "invert": 0, "calibration": []}
+            )
+        if request.path in ["/edit", "/config"]:
+            if request.content_type == "multipart/form-data":
+                reader = await request.multipart()
+                part = await reader.next()
+                self.forms.append((part.name, part.filename, await part.read()))
+            else:
+                self.forms.append(await request.text())
+            return web.Response(text="")
+        return web.Response(status=404)
+
+
+class TestAsyncWebserviceClient(TestBase):
+    @pytest.fixture
+    async def plate(self):
+        plate = FakePlate()
+        await plate.start()
+        yield plate
+        await close_async_sessions()
+        await plate.stop()
+
+    async def test_requests_reuse_a_single_connection(self, plate):
+        # GIVEN
+        client1 = AsyncWebserviceClient(plate.url, "user", "password")
+        client2 = AsyncWebserviceClient(plate.url, "user", "password")
+
+        # WHEN
+        files = await client1.get_files()
+        sizes = await client2.get_file_sizes()
+        gui_config = await client1.get_gui_config()
+
+        # THEN
+        assert files == ["boot.cmd"]
+        assert sizes == {"boot.cmd": 10}
+        assert gui_config.idle2 == 60
+        assert len(plate.connections) == 1
+        assert client1.get_request_stats().requests == 3
+
+    async def test_upload_and_config_are_encoded_like_the_blocking_client(self, plate):
+        # GIVEN
+        client = AsyncWebserviceClient(plate.url, "user", "password")
+
+        # WHEN
+        await client.upload_file("page.jsonl", b'{"page": 1}')
+        await client.set_gui_config(self.default_config.gui)
+
+        # THEN
+        assert plate.forms[0] == ("page.jsonl", "page.jsonl", b'{"page": 1}')
+        assert plate.forms[1] == "idle1=10&idle2=60&rotate=1&cursor=0&bckl=32&save=gui"
+
+    async def test_transient_failures_are_retried(self):
+        # GIVEN
+        plate = FakePlate(failures=2)
+        await plate.start()
+        client = AsyncWebserviceClient(plate.url, "user", "password", retry_config=RetryConfig(retries=2, backoff_factor=0))
+
+        # WHEN
+        files = await client.get_files()
+        await close_async_sessions()
+        await plate.stop()
+
+        # THEN
+        assert files == ["boot.cmd"]
+        assert len(plate.requests) == 3
+
+    async def test_upload_with_transient_failure_is_retried(self):
+        # GIVEN
+        plate = FakePlate(failures=1)
+        await plate.start()
+        client = AsyncWebserviceClient(plate.url, "user", "password", retry_config=RetryConfig(retries=2, backoff_factor=0))
+
+        # WHEN
+        await client.upload_file("page.jsonl", b'{"page": 1}')
+        await close_async_sessions()
+        await plate.stop()
+
+        # THEN
+        assert plate.requests == [("POST", "/edit"), ("POST", "/edit")]
+        assert plate.forms == [("page.jsonl", "page.jsonl", b'{"page": 1}')]
+
+    async def test_config_changes_are_not_retried(self):
+        # GIVEN
+        plate = FakePlate(failures=2)
+        await plate.start()
+        client = AsyncWebserviceClient(plate.url, "user", "password", retry_config=RetryConfig(retries=2, backoff_factor=0))
+
+        # WHEN
+        with pytest.raises(Exception):
+            await client.set_gui_config(self.default_config.gui)
+        await close_async_sessions()
+        await plate.stop()
+
+        # THEN
+        assert plate.requests == [("POST", "/config")]
+
+    async def test_upload_timeout_scales_with_the_size_of_the_file(self, plate, monkeypatch):
+        # GIVEN
+        client = AsyncWebserviceClient(plate.url, "user", "password", timeout=5)
+        content = b"0" * (MIN_UPLOAD_BYTES_PER_SECOND * 20)
+        timeouts = []
+        original_request = async_webservice_client.AsyncPlateSession.request
+
+        async def _request(self, method, url, timeout, **kwargs):
+            timeouts.append(timeout)
+            return await original_request(self, method, url, timeout=timeout, **kwargs)
+
+        monkeypatch.setattr(async_webservice_client.AsyncPlateSession, "request", _request)
+
+        # WHEN
+        await client.upload_file("background.bin", content)
+        await client.get_files()
+
+        # THEN
+        assert timeouts == [20, 5]
+
+    async def test_close_only_closes_the_session_of_the_plate(self, plate):
+        # GIVEN
+        other_plate = FakePlate()
+        await other_plate.start()
+        client = AsyncWebserviceClient(plate.url, "user", "password")
+        other_client = AsyncWebserviceClient(other_plate.url, "user", "password")
+        await client.get_files()
+        await other_client.get_files()
+        session = client._get_session()
+        other_session = other_client._get_session()
+
+        # WHEN
+        await client.close()
+
+        # THEN
+        assert session._session.closed
+        assert not other_session._session.closed
+        assert client._get_session() is not session
+        assert await client.get_files() == ["boot.cmd"]
+        await close_async_sessions()
+        await other_plate.stop()
+
+    async def test_reboot_is_not_retried(self):
+        # GIVEN
+        plate = FakePlate(failures=2)
+        await plate.start()
+        client = AsyncWebserviceClient(plate.url, "user", "password", retry_config=RetryConfig(retries=2, backoff_factor=0))
+
+        # WHEN
+        with pytest.raises(Exception):
+            await client.reboot()
+        await close_async_sessions()
+        await plate.stop()
+
+        # THEN
+        assert plate.requests == [("GET", "/reboot")]
+
+    async def test_error_status_is_raised(self, plate):
+        # GIVEN
+        client = AsyncWebserviceClient(plate.url, "user", "password")
+
+        # WHEN
+        with pytest.raises(Exception):
+            await client.reboot()
+
+        # THEN
+        assert plate.requests == [("GET", "/reboot")]
@@ -1,4 +1,17 @@
-from openhasp_config_manager.openhasp_client.mqtt_client import MqttClient
+import asyncio
+from typing import List, Tuple
+
+import pytest
+from aiomqtt import Topic
+
+from openhasp_config_manager.openhasp_client import mqtt_client
+from openhasp_config_manager.openhasp_client.mqtt_client import (
+    MqttClient,
+    acquire_mqtt_client,
+    close_mqtt_publishers,
+    get_mqtt_publisher,
+    release_mqtt_client,
+)
 from tests import TestBase
 
 
@@ -25,3 +38,323 @@ class TestMqttClient(TestBase):
         await mqtt_client.cancel_callback(callback=callback)
 
         assert mqtt_client._callbacks == {"test": []}
+
+
+class FakeMessage:
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = Topic(topic)
+        self.payload = payload
+
+
+class FakeBrokerClient:
+    """
+    Replaces aiomqtt.Client, recording the connections and published messages.
+    """
+
+    connections: List["FakeBrokerClient"] = []
+    published: List[Tuple[str, str]] = []
+    # number of publishes, which fail because the connection has been lost
+    failures = 0
+    reachable = True
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.subscribed: List[str] = []
+        self.unsubscribed: List[str] = []
+
+    @property
+    async def messages(self):
+        # no messages are received, until the connection is closed
+        await asyncio.Event().wait()
+        yield
+
+    async def __aenter__(self):
+        if not FakeBrokerClient.reachable:
+            raise ConnectionRefusedError("connection refused")
+        FakeBrokerClient.connections.append(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def publish(self, topic: str, payload: str = None):
+        if FakeBrokerClient.failures > 0:
+            FakeBrokerClient.failures -= 1
+            raise ConnectionError("connection lost")
+        FakeBrokerClient.published.append((topic, payload))
+
+    async def subscribe(self, topics: List[Tuple[str, int]]):
+        self.subscribed.extend(topic for topic, _ in topics)
+
+    async def unsubscribe(self, topics: List[str]):
+        self.unsubscribed.extend(topics)
+
+
+class TestMqttPublisher(TestBase):
+    @pytest.fixture(autouse=True)
+    def fake_broker(self, monkeypatch):
+        FakeBrokerClient.connections = []
+        FakeBrokerClient.published = []
+        FakeBrokerClient.failures = 0
+        FakeBrokerClient.reachable = True
+        monkeypatch.setattr(mqtt_client, "Client", FakeBrokerClient)
+        monkeypatch.setattr(mqtt_client, "RECONNECT_INTERVAL_SECONDS", 0)
+
+    async def test_publishes_of_clients_of_the_same_broker_share_a_connection(self):
+        # GIVEN
+        client1 = MqttClient("localhost", 1883, "test", "test")
+        client2 = MqttClient("localhost", 1883, "test", "test")
+
+        try:
+            # WHEN
+            await client1.publish("hasp/plate1/command", "backlight=on")
+            await client1.publish("hasp/plate1/command", {"page": 1})
+            await client2.publish("hasp/plate2/command", "backlight=off")
+
+            # THEN
+            assert len(FakeBrokerClient.connections) == 1
+            assert FakeBrokerClient.published == [
+                ("hasp/plate1/command", "backlight=on"),
+                ("hasp/plate1/command", '{"page": 1}'),
+                ("hasp/plate2/command", "backlight=off"),
+            ]
+        finally:
+            await close_mqtt_publishers()
+
+    async def test_clients_of_different_brokers_use_separate_connections(self):
+        # GIVEN
+        client1 = MqttClient("broker1", 1883, "test", "test")
+        client2 = MqttClient("broker2", 1883, "test", "test")
+
+        try:
+            # WHEN
+            await client1.publish("hasp/plate1/command", "backlight=on")
+            await client2.publish("hasp/plate2/command", "backlight=on")
+
+            # THEN
+            assert [c.kwargs["hostname"] for c in FakeBrokerClient.connections] == ["broker1", "broker2"]
+        finally:
+            await close_mqtt_publishers()
+
+    async def test_queued_publishes_are_flushed_after_reconnect(self):
+        # GIVEN
+        client = MqttClient("localhost", 1883, "test", "test")
+        FakeBrokerClient.failures = 1
+
+        try:
+            # WHEN
+            await asyncio.gather(
+                client.publish("hasp/plate/command", "1"),
+                client.publish("hasp/plate/command", "2"),
+                client.publish("hasp/plate/command", "3"),
+            )
+
+            # THEN
+            assert len(FakeBrokerClient.connections) == 2
+            assert [payload for _, payload in FakeBrokerClient.published] == ["1", "2", "3"]
+        finally:
+            await close_mqtt_publishers()
+
+    async def test_timed_out_publish_is_discarded(self):
+        # GIVEN
+        publisher = get_mqtt_publisher("localhost", 1883, "test", "test")
+        FakeBrokerClient.reachable = False
+
+        try:
+            # WHEN
+            with pytest.raises(asyncio.TimeoutError):
+                await publisher.publish("hasp/plate/command", "1", timeout=0.1)
+            FakeBrokerClient.reachable = True
+            await publisher.publish("hasp/plate/command", "2")
+
+            # THEN
+            assert FakeBrokerClient.published == [("hasp/plate/command", "2")]
+        finally:
+            await close_mqtt_publishers()
+
+
+class TestMqttClientSubscriptions(TestBase):
+    @pytest.fixture(autouse=True)
+    def fake_broker(self, monkeypatch):
+        FakeBrokerClient.connections = []
+        FakeBrokerClient.reachable = True
+        monkeypatch.setattr(mqtt_client, "Client", FakeBrokerClient)
+
+    async def test_messages_are_dispatched_to_matching_callbacks(self):
+        # GIVEN
+        mqtt_client = MqttClient("localhost", 1883, "test", "test")
+        received = []
+
+        async def button_callback(topic, payload):
+            received.append(("button", topic, payload))
+
+        async def state_callback(topic, payload):
+            received.append(("state", topic, payload))
+
+        await mqtt_client.subscribe("hasp/plate/state/p1b1", button_callback)
+        await mqtt_client.subscribe("hasp/plate/state/+", state_callback)
+
+        try:
+            # WHEN
+            await mqtt_client._handle_message(FakeMessage("hasp/plate/state/p1b1", b"on"))
+            await mqtt_client._handle_message(FakeMessage("hasp/plate/state/p1b2", b"off"))
+            await mqtt_client._handle_message(FakeMessage("hasp/other/state/p1b1", b"on"))
+
+            # THEN
+            assert received == [
+                ("button", "hasp/plate/state/p1b1", b"on"),
+                ("state", "hasp/plate/state/p1b1", b"on"),
+                ("state", "hasp/plate/state/p1b2", b"off"),
+            ]
+        finally:
+            await mqtt_client.cancel_callback(topic="hasp/plate/state/p1b1")
+            await mqtt_client.cancel_callback(topic="hasp/plate/state/+")
+
+    async def test_broker_subscriptions_are_narrowed_to_registered_topics(self):
+        # GIVEN
+        mqtt_client = MqttClient("localhost", 1883, "test", "test")
+
+        async def callback(topic, payload):
+            pass
+
+        await mqtt_client.subscribe("hasp/plate/state/p1b1", callback)
+        await self._wait_for_connection()
+        connection = FakeBrokerClient.connections[0]
+
+        try:
+            # WHEN
+            await mqtt_client.subscribe("hasp/plate/LWT", callback)
+            await mqtt_client.subscribe("hasp/plate/state/+", callback)
+
+            # THEN
+            assert "hasp/#" not in connection.subscribed
+            assert connection.subscribed == ["hasp/plate/state/p1b1", "hasp/plate/LWT", "hasp/plate/state/+"]
+            assert connection.unsubscribed == ["hasp/plate/state/p1b1"]
+        finally:
+            await mqtt_client.cancel_callback(callback=callback)
+
+    async def test_new_topics_are_subscribed_without_reducing_all_topics(self, monkeypatch):
+        # GIVEN
+        mqtt_client = MqttClient("localhost", 1883, "test", "test")
+
+        async def callback(topic, payload):
+            pass
+
+        await mqtt_client.subscribe("hasp/plate0/LWT", callback)
+        await self._wait_for_connection()
+        connection = FakeBrokerClient.connections[0]
+
+        reductions = []
+        monkeypatch.setattr(
+            "openhasp_config_manager.openhasp_client.mqtt_client.reduce_topic_filters",
+            lambda topics: reductions.append(topics) or topics,
+        )
+
+        try:
+            # WHEN
+            for i in range(100):
+                await mqtt_client.subscribe(f"hasp/plate{i % 10}/state/p1b{i}", callback)
+            await mqtt_client.subscribe("hasp/plate1/state/+", callback)
+            await mqtt_client.subscribe("hasp/plate1/state/p1b1", callback)
+
+            # THEN
+            assert reductions == []
+            assert len(connection.subscribed) == 1 + 100 + 1
+            assert connection.unsubscribed == [f"hasp/plate1/state/p1b{i}" for i in range(1, 100, 10)]
+        finally:
+            await mqtt_client.cancel_callback(callback=callback)
+
+    @staticmethod
+    async def _wait_for_connection():
+        for _ in range(100):
+            if len(FakeBrokerClient.connections) > 0:
+                # let the client subscribe to the initial topics
+                await asyncio.sleep(0)
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError("Client did not connect")
+
+
+class TestSharedMqttClients(TestBase):
+    async def test_clients_of_the_same_broker_are_shared(self):
+        # GIVEN
+        client1 = acquire_mqtt_client("localhost", 1883, "test", "test")
+
+        try:
+            # WHEN
+            client2 = acquire_mqtt_client("localhost", 1883, "test", "test")
+            client3 = acquire_mqtt_client("localhost", 1883, "other", "test")
+            client4 = acquire_mqtt_client("localhost", 1883, "test", "other")
+
+            # THEN
+            assert client1 is client2
+            assert client1 is not client3
+            assert client1 is not client4
+            assert client4._mqtt_password == "other"
+        finally:
+            release_mqtt_client(client1)
+            release_mqtt_client(client1)
+            release_mqtt_client(client3)
+            release_mqtt_client(client4)
+
+    async def test_client_is_closed_when_released_by_all_users(self, monkeypatch):
+        # GIVEN
+        monkeypatch.setattr(mqtt_client, "Client", FakeBrokerClient)
+        client = acquire_mqtt_client("localhost", 1883, "test", "test")
+        acquire_mqtt_client("localhost", 1883, "test", "test")
+
+        async def callback(topic, payload):
+            pass
+
+        await client.subscribe("hasp/plate/state/p1b1", callback)
+
+        # WHEN
+        release_mqtt_client(client)
+        still_running = client._mqtt_client_task is not None
+        release_mqtt_client(client)
+
+        # THEN
+        assert still_running
+        assert client._mqtt_client_task is None
+        assert client._callbacks == {}
+        assert acquire_mqtt_client("localhost", 1883, "test", "test") is not client
+        release_mqtt_client(mqtt_client._shared_clients[asyncio.get_running_loop()][("localhost", 1883, "test", "test")])
+
+    async def test_publisher_is_closed_when_client_is_released_by_all_users(self, monkeypatch):
+        # GIVEN
+        monkeypatch.setattr(mqtt_client, "Client", FakeBrokerClient)
+        client = acquire_mqtt_client("localhost", 1883, "test", "test")
+        acquire_mqtt_client("localhost", 1883, "test", "test")
+        await client.publish("hasp/plate/command", "backlight=on")
+        publisher = get_mqtt_publisher("localhost", 1883, "test", "test")
+
+        # WHEN
+        release_mqtt_client(client)
+        still_connected = publisher._task is not None
+        release_mqtt_client(client)
+
+        # THEN
+        assert still_connected
+        assert publisher._task is None
+        assert get_mqtt_publisher("localhost", 1883, "test", "test") is not publisher
+        await close_mqtt_publishers()
+
+    async def test_clients_are_not_shared_between_event_loops(self):
+        # GIVEN
+        client = acquire_mqtt_client("localhost", 1883, "test", "test")
+
+        async def _acquire_and_release() -> MqttClient:
+            other = acquire_mqtt_client("localhost", 1883, "test", "test")
+            release_mqtt_client(other)
+            return other
+
+        try:
+            # WHEN
+            other_loop_client = await asyncio.to_thread(asyncio.run, _acquire_and_release())
+
+            # THEN
+            assert other_loop_client is not client
+            assert acquire_mqtt_client("localhost", 1883, "test", "test") is client
+            release_mqtt_client(client)
+        finally:
+            release_mqtt_client(client)
@@ -0,0 +1,162 @@
+import asyncio
+import dataclasses
+import gc
+import threading
+from pathlib import Path
+
+import pytest
+
+from openhasp_config_manager.openhasp_client import mqtt_client
+from openhasp_config_manager.openhasp_client.model.device import Device
+from openhasp_config_manager.openhasp_client.openhasp import OpenHaspClient
+from tests import TestBase
+
+
+class _UnreachableBrokerClient:
+    def __init__(self, **kwargs):
+        pass
+
+    async def __aenter__(self):
+        # never connects, the tests only use the subscriptions of the client
+        await asyncio.Event().wait()
+
+
+class TestOpenHaspClientMqtt(TestBase):
+    @pytest.fixture(autouse=True)
+    def unreachable_broker(self, monkeypatch):
+        monkeypatch.setattr(mqtt_client, "Client", _UnreachableBrokerClient)
+
+    async def test_plates_of_the_same_broker_share_a_connection(self, tmp_path):
+        # GIVEN
+        client1 = OpenHaspClient(self._device(tmp_path, "plate1"))
+        client2 = OpenHaspClient(self._device(tmp_path, "plate2"))
+        received = []
+
+        async def callback1(topic, payload):
+            received.append(("plate1", topic))
+
+        async def callback2(topic, payload):
+            received.append(("plate2", topic))
+
+        try:
+            # WHEN
+            await client1.listen_event("state/#", callback1)
+            await client2.listen_event("state/#", callback2)
+            shared_client = client1._mqtt_client
+            await shared_client._handle_message(_Message("hasp/plate2/state/p1b1"))
+
+            # THEN
+            assert shared_client is client2._mqtt_client
+            assert received == [("plate2", "hasp/plate2/state/p1b1")]
+        finally:
+            await client1.close()
+            await client2.close()
+
+    async def test_cancel_callback_only_affects_own_subscriptions(self, tmp_path):
+        # GIVEN
+        client1 = OpenHaspClient(self._device(tmp_path, "plate1"))
+        client2 = OpenHaspClient(self._device(tmp_path, "plate2"))
+
+        async def callback(topic, payload):
+            pass
+
+        await client1.listen_event("state/#", callback)
+        await client2.listen_event("state/#", callback)
+
+        try:
+            # WHEN
+            await client1.cancel_callback(callback)
+
+            # THEN
+            assert client2._mqtt_client._callbacks == {"hasp/plate1/state/#": [], "hasp/plate2/state/#": [callback]}
+        finally:
+            await client1.close()
+            await client2.close()
+
+    async def test_connection_is_released_when_last_client_goes_away(self, tmp_path):
+        # GIVEN
+        key = ("mqtt.host", 1883, "user", "password")
+        client1 = OpenHaspClient(self._device(tmp_path, "plate1"))
+        client2 = OpenHaspClient(self._device(tmp_path, "plate2"))
+
+        async def callback(topic, payload):
+            pass
+
+        await client1.listen_event("state/#", callback)
+        await client2.listen_event("state/#", callback)
+        shared_client = client1._mqtt_client
+
+        shared_clients = mqtt_client._shared_clients[asyncio.get_running_loop()]
+
+        # WHEN
+        await client1.close()
+        released_by_one = key not in shared_clients
+        del client2
+        gc.collect()
+
+        # THEN
+        assert not released_by_one
+        assert key not in shared_clients
+        assert shared_client._mqtt_client_task is None
+
+    async def test_connection_dropped_by_another_thread_is_released_within_the_event_loop(self, tmp_path, monkeypatch):
+        # GIVEN
+        key = ("mqtt.host", 1883, "user", "password")
+        clients = [OpenHaspClient(self._device(tmp_path, "plate1"))]
+
+        async def callback(topic, payload):
+            pass
+
+        await clients[0].listen_event("state/#", callback)
+        shared_clients = mqtt_client._shared_clients[asyncio.get_running_loop()]
+
+        release = mqtt_client.release_mqtt_client
+        releasing_threads = []
+
+        def _release(client):
+            releasing_threads.append(threading.get_ident())
+            release(client)
+
+        monkeypatch.setattr(mqtt_client, "release_mqtt_client", _release)
+
+        def _drop_clients():
+            clients.clear()
+            gc.collect()
+
+        # WHEN
+        await asyncio.to_thread(_drop_clients)
+        await asyncio.sleep(0)
+
+        # THEN
+        assert releasing_threads == [threading.get_ident()]
+        assert key not in shared_clients
+
+    def test_client_outside_of_an_event_loop_gets_a_connection_of_its_own(self, tmp_path):
+        # GIVEN
+        client = OpenHaspClient(self._device(tmp_path, "plate1"))
+
+        # WHEN
+        result = client._mqtt_client
+
+        # THEN
+        assert result is client._mqtt_client
+        assert all(result not in loop_clients.values() for loop_clients in mqtt_client._shared_clients.values())
+
+    def _device(self, tmp_path: Path, name: str) -> Device:
+        config = dataclasses.replace(self.default_config, mqtt=dataclasses.replace(self.default_config.mqtt, name=name))
+        return Device(
+            name=name,
+            path=tmp_path,
+            config=config,
+            jsonl=[],
+            cmd=[],
+            images=[],
+            fonts=[],
+            output_dir=None,
+        )
+
+
+class _Message:
+    def __init__(self, topic: str):
+        self.topic = topic
+        self.payload = b""
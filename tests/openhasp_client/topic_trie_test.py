@@ -0,0 +1,180 @@
+import time
+
+import pytest
+from aiomqtt import Topic
+
+from openhasp_config_manager.openhasp_client.topic_trie import TopicTrie, reduce_topic_filters, topic_filter_covers
+from tests import TestBase
+
+
+class TestTopicTrie(TestBase):
+    def test_match_exact_topic(self):
+        # GIVEN
+        trie = TopicTrie()
+        trie.add("hasp/plate/state/p1b1", "a")
+        trie.add("hasp/plate/state/p1b2", "b")
+
+        # WHEN
+        result = trie.match("hasp/plate/state/p1b1")
+
+        # THEN
+        assert result == ["a"]
+
+    def test_match_wildcards(self):
+        # GIVEN
+        trie = TopicTrie()
+        trie.add("hasp/+/state/p1b1", "single")
+        trie.add("hasp/plate/#", "multi")
+        trie.add("#", "all")
+        trie.add("hasp/+/LWT", "lwt")
+
+        # WHEN
+        result = trie.match("hasp/plate/state/p1b1")
+
+        # THEN
+        assert sorted(result) == ["all", "multi", "single"]
+
+    def test_multi_level_wildcard_matches_parent_level(self):
+        # GIVEN
+        trie = TopicTrie()
+        trie.add("hasp/plate/#", "multi")
+
+        # WHEN
+        result = trie.match("hasp/plate")
+
+        # THEN
+        assert result == ["multi"]
+
+    def test_wildcards_do_not_match_system_topics(self):
+        # GIVEN
+        trie = TopicTrie()
+        trie.add("#", "all")
+        trie.add("+/broker/uptime", "single")
+        trie.add("$SYS/#", "sys")
+
+        # WHEN
+        result = trie.match("$SYS/broker/uptime")
+
+        # THEN
+        assert result == ["sys"]
+
+    def test_matches_same_topics_as_aiomqtt(self):
+        # GIVEN
+        topic_filters = ["hasp/#", "hasp/+/state/+", "hasp/plate/state/p1b1", "+/plate/LWT", "#", "hasp/+", "$SYS/#"]
+        topics = ["hasp/plate/state/p1b1", "hasp/plate/LWT", "hasp/plate", "hasp", "other/topic"]
+        trie = TopicTrie()
+        for topic_filter in topic_filters:
+            trie.add(topic_filter, topic_filter)
+
+        for topic in topics:
+            # WHEN
+            result = trie.match(topic)
+
+            # THEN
+            assert sorted(result) == sorted(f for f in topic_filters if Topic(topic).matches(f)), topic
+
+    def test_remove_value(self):
+        # GIVEN
+        trie = TopicTrie()
+        trie.add("hasp/plate/state/p1b1", "a")
+        trie.add("hasp/plate/state/p1b1", "b")
+
+        # WHEN
+        trie.remove("hasp/plate/state/p1b1", "a")
+
+        # THEN
+        assert trie.match("hasp/plate/state/p1b1") == ["b"]
+
+    def test_remove_all_values_prunes_nodes(self):
+        # GIVEN
+        trie = TopicTrie()
+        trie.add("hasp/plate/state/p1b1", "a")
+        trie.add("hasp/plate/state/p1b1", "b")
+
+        # WHEN
+        trie.remove("hasp/plate/state/p1b1")
+
+        # THEN
+        assert trie.match("hasp/plate/state/p1b1") == []
+        assert trie._root.children == {}
+
+    def test_lookup_does_not_depend_on_number_of_filters(self, monkeypatch):
+        # GIVEN
+        small_trie = self._create_trie(100)
+        large_trie = self._create_trie(10_000)
+        topic = "hasp/plate7/state/p0b7"
+
+        visited = []
+        match = TopicTrie._match
+
+        def _match(trie, node, levels, index, result):
+            visited.append(node)
+            return match(trie, node, levels, index, result)
+
+        monkeypatch.setattr(TopicTrie, "_match", _match)
+
+        # WHEN
+        small_result = small_trie.match(topic)
+        small_visited = len(visited)
+        visited.clear()
+        large_result = large_trie.match(topic)
+        large_visited = len(visited)
+
+        # THEN
+        assert small_result == large_result == ["hasp/plate7/state/p0b7"]
+        assert small_visited == large_visited == len(topic.split("/")) + 1
+
+    @pytest.mark.benchmark
+    def test_benchmark_lookup_compared_to_matching_every_filter(self):
+        # GIVEN
+        topic_filters = [f"hasp/plate{i % 100}/state/p{i // 100}b{i % 100}" for i in range(10_000)]
+        trie = self._create_trie(10_000)
+        topics = [f"hasp/plate{i}/state/p{i}b{i}" for i in range(10)]
+
+        # WHEN
+        start = time.perf_counter()
+        trie_result = [trie.match(topic) for topic in topics]
+        trie_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        linear_result = [[f for f in topic_filters if Topic(topic).matches(f)] for topic in topics]
+        linear_duration = time.perf_counter() - start
+
+        # THEN
+        print(f"trie: {trie_duration:.4f}s, linear: {linear_duration:.4f}s")
+        assert trie_result == linear_result
+        assert trie_duration * 10 < linear_duration
+
+    @staticmethod
+    def _create_trie(count: int) -> TopicTrie:
+        trie = TopicTrie()
+        for i in range(count):
+            topic_filter = f"hasp/plate{i % 100}/state/p{i // 100}b{i % 100}"
+            trie.add(topic_filter, topic_filter)
+        return trie
+
+
+class TestTopicFilters(TestBase):
+    def test_covers(self):
+        assert topic_filter_covers("hasp/#", "hasp/plate/state/p1b1")
+        assert topic_filter_covers("hasp/+/state/+", "hasp/plate/state/p1b1")
+        assert topic_filter_covers("hasp/+/state/#", "hasp/+/state/+")
+        assert not topic_filter_covers("hasp/+/state/+", "hasp/+/state/#")
+        assert not topic_filter_covers("hasp/plate/state", "hasp/plate/state/p1b1")
+        assert not topic_filter_covers("+/broker", "$SYS/broker")
+
+    def test_reduce_removes_covered_filters(self):
+        # GIVEN
+        topic_filters = [
+            "hasp/plate1/state/p1b1",
+            "hasp/plate1/state/+",
+            "hasp/plate2/state/p1b1",
+            "hasp/plate2/state/p1b1",
+            "hasp/plate1/LWT",
+        ]
+
+        # WHEN
+        result = reduce_topic_filters(topic_filters)
+
+        # THEN
+        assert result == ["hasp/plate1/state/+", "hasp/plate2/state/p1b1", "hasp/plate1/LWT"]
@@ -0,0 +1,200 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import orjson
+import pytest
+
+from openhasp_config_manager.openhasp_client.http_session import RetryConfig, close_sessions
+from openhasp_config_manager.openhasp_client.webservice_client import WebserviceClient, _MultipartFileStream
+from tests import TestBase
+
+
+class FakePlateServer:
+    def __init__(self, failures: int = 0):
+        self.connections: List[int] = []
+        self.requests: List[str] = []
+        self.bodies: List[Tuple[Dict[str, str], bytes]] = []
+        self.failures = failures
+
+        plate = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                plate.connections.append(self.client_address[1])
+
+            def do_GET(self):
+                plate.requests.append(self.path)
+                if plate.failures > 0:
+                    plate.failures -= 1
+                    self._respond(503, b"busy", "text/plain")
+                else:
+                    self._respond(200, orjson.dumps([{"type": "file", "name": "boot.cmd", "size": 10}]), "text/plain")
+
+            def do_POST(self):
+                plate.requests.append(self.path)
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                plate.bodies.append((dict(self.headers), body))
+                if plate.failures > 0:
+                    plate.failures -= 1
+                    self._respond(503, b"busy", "text/plain")
+                else:
+                    self._respond(200, b"", "text/plain")
+
+            def _respond(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class TestWebserviceClient(TestBase):
+    @pytest.fixture(autouse=True)
+    def _close_sessions(self):
+        yield
+        close_sessions()
+
+    def test_connection_is_reused_between_clients_of_the_same_plate(self):
+        # GIVEN
+        plate = FakePlateServer()
+        client1 = WebserviceClient(plate.url, "user", "password")
+        client2 = WebserviceClient(plate.url, "user", "password")
+
+        # WHEN
+        for _ in range(3):
+            client1.get_files()
+            client2.get_file_sizes()
+        plate.stop()
+
+        # THEN
+        assert len(plate.requests) == 6
+        assert len(plate.connections) == 1
+        stats = client1.get_request_stats()
+        assert stats.requests == 6
+        assert stats.failures == 0
+        assert stats.max_duration >= stats.average_duration > 0
+
+    def test_transient_failures_are_retried(self):
+        # GIVEN
+        plate = FakePlateServer(failures=2)
+        client = WebserviceClient(plate.url, "user", "password", retry_config=RetryConfig(retries=2, backoff_factor=0))
+
+        # WHEN
+        files = client.get_files()
+        plate.stop()
+
+        # THEN
+        assert files == ["boot.cmd"]
+        assert len(plate.requests) == 3
+
+    def test_persistent_failures_raise_after_retries(self):
+        # GIVEN
+        plate = FakePlateServer(failures=5)
+        client = WebserviceClient(plate.url, "user", "password", retry_config=RetryConfig(retries=1, backoff_factor=0))
+
+        # WHEN
+        with pytest.raises(Exception):
+            client.get_files()
+        plate.stop()
+
+        # THEN
+        assert len(plate.requests) == 2
+        assert client.get_request_stats().failures == 1
+
+    def test_reboot_is_not_retried(self):
+        # GIVEN
+        plate = FakePlateServer(failures=2)
+        client = WebserviceClient(plate.url, "user", "password", retry_config=RetryConfig(retries=2, backoff_factor=0))
+
+        # WHEN
+        with pytest.raises(Exception):
+            client.reboot()
+        plate.stop()
+
+        # THEN
+        assert plate.requests == ["/reboot"]
+
+    def test_config_changes_are_not_retried(self):
+        # GIVEN
+        plate = FakePlateServer(failures=2)
+        client = WebserviceClient(plate.url, "user", "password", retry_config=RetryConfig(retries=2, backoff_factor=0))
+
+        # WHEN
+        with pytest.raises(Exception):
+            client.set_mqtt_config(self.default_config.mqtt)
+        plate.stop()
+
+        # THEN
+        assert plate.requests == ["/config"]
+
+    def test_requests_without_retries_use_the_same_connection(self):
+        # GIVEN
+        plate = FakePlateServer()
+        client = WebserviceClient(plate.url, "user", "password")
+
+        # WHEN
+        client.get_files()
+        client.reboot()
+        client.get_files()
+        plate.stop()
+
+        # THEN
+        assert plate.requests == ["/list?dir=/", "/reboot", "/list?dir=/"]
+        assert len(plate.connections) == 1
+
+    def test_upload_from_path_streams_the_same_body_as_an_in_memory_upload(self, tmp_path):
+        # GIVEN
+        plate = FakePlateServer(failures=1)
+        client = WebserviceClient(plate.url, "user", "password", retry_config=RetryConfig(retries=1, backoff_factor=0))
+        content = bytes(range(256)) * 1000
+        path = Path(tmp_path, "background.bin")
+        path.write_bytes(content)
+
+        # WHEN
+        client.upload_file_from_path("background.bin", path)
+        client.upload_file("background.bin", content)
+        plate.stop()
+
+        # THEN
+        (retried_headers, retried_body), (streamed_headers, streamed_body), (headers, body) = plate.bodies
+        assert retried_body == streamed_body
+        assert "Transfer-Encoding" not in streamed_headers
+        streamed_boundary = streamed_headers["Content-Type"].split("boundary=")[1]
+        boundary = headers["Content-Type"].split("boundary=")[1]
+        assert streamed_body.replace(streamed_boundary.encode(), b"") == body.replace(boundary.encode(), b"")
+
+    def test_multipart_file_stream_can_be_read_in_chunks_and_rewound(self, tmp_path):
+        # GIVEN
+        path = Path(tmp_path, "font.bin")
+        path.write_bytes(b"0123456789" * 100)
+        stream = _MultipartFileStream("font.bin", path)
+        expected = stream.read()
+        stream.seek(0)
+
+        # WHEN
+        chunks = []
+        while len(chunk := stream.read(7)) > 0:
+            chunks.append(chunk)
+        stream.close()
+
+        # THEN
+        assert b"".join(chunks) == expected
+        assert len(expected) == len(stream)
+        assert stream.tell() == len(stream)
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+from openhasp_config_manager.manager import ConfigManager
+from openhasp_config_manager.openhasp_client.model.component import CmdComponent, ImageComponent, JsonlComponent
+from openhasp_config_manager.processing.component_index import ComponentIndex
+from openhasp_config_manager.processing.variables import VariableManager
+from tests import TestBase
+
+
+class TestComponentIndex(TestBase):
+    def test_lookup_and_references(self, tmp_path):
+        # GIVEN
+        boot = CmdComponent(
+            name="boot.cmd",
+            type="cmd",
+            path=Path("boot.cmd"),
+            content="run L:/page.jsonl\nrun L:/other.cmd\nrun L:/page.jsonl",
+            commands=["run L:/page.jsonl", "run L:/other.cmd"],
+        )
+        other = CmdComponent(name="other.cmd", type="cmd", path=Path("other.cmd"), content="", commands=[])
+        page = JsonlComponent(name="page.jsonl", type="jsonl", path=Path("page.jsonl"), content='{"src": "L:/a.png"}')
+        image = ImageComponent(name="a.png", type="png", path=Path("a.png"), content=b"")
+
+        # WHEN
+        index = ComponentIndex([boot, other, page, image])
+
+        # THEN
+        assert index.get("page.jsonl", JsonlComponent) is page
+        assert index.get("page.jsonl", CmdComponent) is None
+        assert index.find_by_type("cmd") == [boot, other]
+        assert index.find_by_path(Path("a.png")) == [image]
+        assert index.get_jsonl_references(boot) == ["page.jsonl"]
+        assert index.get_cmd_references(boot) == ["other.cmd"]
+        assert index.get_image_references(page) == ["a.png"]
+        assert index.get_command_references(boot) == ["page.jsonl", "other.cmd"]
+
+    def test_config_manager_uses_index_of_analyzed_devices(self, tmp_path):
+        # GIVEN
+        variable_manager = VariableManager(self.cfg_root)
+        manager = ConfigManager(self.cfg_root, tmp_path, variable_manager)
+        device = manager.analyze()[0]
+        index = manager.get_component_index(device)
+        home_cmd = index.get("home.cmd", CmdComponent)
+
+        # WHEN
+        relevant_components = manager.find_relevant_components(device)
+        ordered_jsonl_components = manager.determine_device_jsonl_component_order_for_cmd(device, home_cmd)
+
+        # THEN
+        assert manager.get_component_index(device) is index
+        assert [c.name for c in ordered_jsonl_components] == ["home_page.jsonl", "home_test_page.jsonl"]
+        assert "home_image_50x50.png" in [c.name for c in relevant_components]
+
+    def test_config_manager_recreates_index_after_analyze(self, tmp_path):
+        # GIVEN
+        variable_manager = VariableManager(self.cfg_root)
+        manager = ConfigManager(self.cfg_root, tmp_path, variable_manager)
+        device = manager.analyze()[0]
+        index = manager.get_component_index(device)
+
+        # WHEN
+        reanalyzed_device = manager.analyze()[0]
+        reanalyzed_index = manager.get_component_index(reanalyzed_device)
+
+        # THEN
+        assert reanalyzed_device.name == device.name
+        assert reanalyzed_index is not index
+        assert any(c is reanalyzed_index.get("home.cmd", CmdComponent) for c in reanalyzed_device.cmd)
+        # a device of a previous analysis gets an index of its own components
+        assert any(c is manager.get_component_index(device).get("home.cmd", CmdComponent) for c in device.cmd)
@@ -1,10 +1,15 @@
 import textwrap
+import time
 from pathlib import Path
+from typing import Tuple
+
+import pytest
 
 from openhasp_config_manager.openhasp_client.model.component import JsonlComponent
 from openhasp_config_manager.openhasp_client.model.device import Device
 from openhasp_config_manager.processing.device_processor import DeviceProcessor
 from openhasp_config_manager.processing.jsonl.jsonl import ObjectDimensionsProcessor
+from openhasp_config_manager.processing.preprocessor.jsonl_preprocessor import JsonlPreProcessor
 from openhasp_config_manager.processing.variables import VariableManager
 from tests import TestBase
 
@@ -226,3 +231,283 @@ class TestDeviceProcessor(TestBase):
                {"id": 10}
                """).strip()
         )
+
+    def test_object_maps_are_computed_once_per_component(self, monkeypatch):
+        # GIVEN
+        device = Device(
+            name="test_device",
+            path=Path(self.cfg_root, "devices", "test_device"),
+            config=self.default_config,
+            cmd=[],
+            jsonl=[],
+            images=[],
+            fonts=[],
+            output_dir=None,
+        )
+
+        variable_manager = VariableManager(self.cfg_root)
+        jsonl_object_processors = [ObjectDimensionsProcessor()]
+        processor = DeviceProcessor(device, jsonl_object_processors, variable_manager)
+
+        components = [
+            JsonlComponent(
+                name=f"component_{i}",
+                type="jsonl",
+                path=Path(self.cfg_root, "devices", "test_device"),
+                content=f'{{ "page": 1, "id": {i}, "x": "{{{{ p1b1.y }}}}", "y": 5 }}',
+            )
+            for i in range(1, 4)
+        ]
+        for component in components:
+            processor._add_jsonl(component)
+
+        computed_object_maps = []
+        original_compute_object_map = processor._compute_object_map
+
+        def _compute_object_map(jsonl_objects):
+            computed_object_maps.append(jsonl_objects)
+            return original_compute_object_map(jsonl_objects)
+
+        monkeypatch.setattr(processor, "_compute_object_map", _compute_object_map)
+
+        # WHEN
+        result = [processor.normalize(device, component) for component in components]
+
+        # THEN
+        assert len(computed_object_maps) == len(components)
+        assert result == [
+            '{"page": 1, "id": 1, "x": 5, "y": 5}',
+            '{"page": 1, "id": 2, "x": 5, "y": 5}',
+            '{"page": 1, "id": 3, "x": 5, "y": 5}',
+        ]
+
+    def test_objects_of_normalized_component_have_lowest_priority(self, monkeypatch):
+        # GIVEN
+        device = Device(
+            name="test_device",
+            path=Path(self.cfg_root, "devices", "test_device"),
+            config=self.default_config,
+            cmd=[],
+            jsonl=[],
+            images=[],
+            fonts=[],
+            output_dir=None,
+        )
+        variable_manager = VariableManager(self.cfg_root)
+        processor = DeviceProcessor(device, [], variable_manager)
+
+        contents = {
+            "component_5": '{ "page": 1, "id": 1, "y": 5 }\n'
+            '{ "page": 1, "id": 5, "x": "{{ p1b1.y }}", "text": "{{ p1b9.text }}" }\n'
+            '{ "page": 3, "id": 1, "text": "5" }',
+            "component_7": '{ "page": 1, "id": 1, "y": 7 }\n'
+            '{ "page": 1, "id": 7, "x": "{{ p1b1.y }}" }\n'
+            '{ "page": 3, "id": 1, "text": "7" }',
+            "component_9": '{ "page": 1, "id": 1, "y": 9 }\n'
+            '{ "page": 1, "id": 9, "x": "{{ p1b1.y }}", "text": "{{ p3b1.text }}" }',
+        }
+        components = [
+            JsonlComponent(
+                name=name,
+                type="jsonl",
+                path=Path(self.cfg_root, "devices", "test_device"),
+                content=content,
+            )
+            for name, content in contents.items()
+        ]
+        for component in components:
+            processor._add_jsonl(component)
+
+        rendered_components = []
+        original_render = processor._render_objects_of_component
+
+        def _render_objects_of_component(device, component, template_vars):
+            rendered_components.append(component.name)
+            return original_render(device, component, template_vars)
+
+        monkeypatch.setattr(processor, "_render_objects_of_component", _render_objects_of_component)
+
+        # WHEN
+        result = [processor.normalize(device, component) for component in components]
+
+        # THEN
+        # objects defined by multiple components resolve to the definition of the component added first,
+        # except for those of the normalized component, which have the lowest priority
+        assert result == [
+            '{"page": 1, "id": 1, "y": 5}\n{"page": 1, "id": 5, "x": "7", "text": "7"}\n{"page": 3, "id": 1, "text": "5"}',
+            '{"page": 1, "id": 1, "y": 7}\n{"page": 1, "id": 7, "x": "5"}\n{"page": 3, "id": 1, "text": "7"}',
+            '{"page": 1, "id": 1, "y": 9}\n{"page": 1, "id": 9, "x": "5", "text": "5"}',
+        ]
+        # each component is rendered once, and once more on top of all others unless it is the last one;
+        # component_9 references p3b1, whose value depends on whether component_5 is applied below it
+        assert rendered_components == [
+            "component_5",
+            "component_7",
+            "component_9",
+            "component_9",
+            "component_5",
+            "component_7",
+        ]
+
+    def test_accumulated_variables_share_layers_of_components(self):
+        # GIVEN
+        device = Device(
+            name="test_device",
+            path=Path(self.cfg_root, "devices", "test_device"),
+            config=self.default_config,
+            cmd=[],
+            jsonl=[],
+            images=[],
+            fonts=[],
+            output_dir=None,
+        )
+        processor = DeviceProcessor(device, [], VariableManager(self.cfg_root))
+        components = [
+            JsonlComponent(
+                name=f"component_{i}",
+                type="jsonl",
+                path=Path(self.cfg_root, "devices", "test_device"),
+                content=f'{{ "page": 1, "id": {i} }}',
+            )
+            for i in range(1, 51)
+        ]
+        for component in components:
+            processor._add_jsonl(component)
+        component_layers = processor._get_component_template_vars(device, components[0])._layers
+
+        # WHEN
+        processor.normalize(device, components[0])
+
+        # THEN
+        # each component only adds the layer of its rendered objects (and the overlay of its scope)
+        assert len(processor._accumulated_template_vars._layers) <= 2 * len(components) + len(component_layers) + 2
+
+    def _create_large_page_set(self) -> Tuple[Device, JsonlComponent]:
+        device = Device(
+            name="test_device",
+            path=Path(self.cfg_root, "devices", "test_device"),
+            config=self.default_config,
+            cmd=[],
+            jsonl=[],
+            images=[],
+            fonts=[],
+            output_dir=None,
+        )
+
+        objects = []
+        for page in range(1, 21):
+            for i in range(1, 26):
+                objects.append(
+                    f'{{"page": {page}, "id": {i}, "obj": "btn", "x": "{{{{ p{page}b1.y }}}}", "y": {i * 10}, '
+                    f'"text": "Button {page}/{i}", "text_color": "#FFFFFF", "bg_color": "#{i:06d}", '
+                    f'"src": "L:/icon_{i}.png", "align": "center", "mode": "crop"}}'
+                )
+        component = JsonlComponent(
+            name="pages",
+            type="jsonl",
+            path=Path(self.cfg_root, "devices", "test_device"),
+            content="\n".join(objects),
+        )
+        return device, component
+
+    def _normalize(self, device: Device, component: JsonlComponent) -> str:
+        processor = DeviceProcessor(device, [ObjectDimensionsProcessor()], VariableManager(self.cfg_root))
+        processor._add_jsonl(component)
+        return processor.normalize(device, component)
+
+    @staticmethod
+    def _disable_literal_fast_path(monkeypatch):
+        from openhasp_config_manager.processing import device_processor, template_rendering
+
+        # treat every string as a template
+        monkeypatch.setattr(device_processor, "is_template", lambda content: True)
+        monkeypatch.setattr(template_rendering, "is_template", lambda content: True)
+
+    def test_literal_values_bypass_jinja_on_large_page_set(self, monkeypatch):
+        # GIVEN
+        import jinja2
+
+        device, component = self._create_large_page_set()
+        render = jinja2.Template.render
+        rendered_templates = []
+
+        def _render(template: jinja2.Template, *args, **kwargs) -> str:
+            rendered_templates.append(template)
+            return render(template, *args, **kwargs)
+
+        monkeypatch.setattr(jinja2.Template, "render", _render)
+
+        # WHEN
+        result = self._normalize(device, component)
+        fast_path_renders = len(rendered_templates)
+
+        rendered_templates.clear()
+        with monkeypatch.context() as m:
+            self._disable_literal_fast_path(m)
+            expected = self._normalize(device, component)
+        jinja_renders = len(rendered_templates)
+
+        # THEN
+        assert result == expected
+        # objects are rendered both when computing the variables of the component and when normalizing it,
+        # only the "x" value of the 8 string values of each of the 20 * 25 objects is a template
+        assert fast_path_renders == 2 * 500
+        assert jinja_renders == 8 * fast_path_renders
+
+    @pytest.mark.benchmark
+    def test_benchmark_literal_values_bypass_jinja_on_large_page_set(self, monkeypatch):
+        # GIVEN
+        device, component = self._create_large_page_set()
+
+        def _timed_normalize() -> Tuple[str, float]:
+            start = time.perf_counter()
+            normalized = self._normalize(device, component)
+            return normalized, time.perf_counter() - start
+
+        # render the (few) actual templates once, so both runs can use the compiled template cache
+        _timed_normalize()
+
+        # WHEN
+        result, fast_path_duration = _timed_normalize()
+
+        with monkeypatch.context() as m:
+            self._disable_literal_fast_path(m)
+            expected, jinja_duration = _timed_normalize()
+
+        # THEN
+        print(f"fast path: {fast_path_duration:.3f}s, jinja: {jinja_duration:.3f}s")
+        assert result == expected
+        assert fast_path_duration < jinja_duration
+
+    def test_processors_share_parsed_components(self):
+        # GIVEN
+        variable_manager = VariableManager(self.cfg_root)
+        jsonl_preprocessor = JsonlPreProcessor()
+        content = textwrap.dedent("""
+            { "page": 1, "id": 1, "obj": "label", "text": "{{ device.ip }}" }
+            """)
+        component = JsonlComponent(name="component", type="jsonl", path=Path(self.cfg_root, "common"), content=content)
+
+        results = []
+        for name in ["device_1", "device_2"]:
+            device = Device(
+                name=name,
+                path=Path(self.cfg_root, "devices", "test_device"),
+                config=self.default_config,
+                cmd=[],
+                jsonl=[],
+                images=[],
+                fonts=[],
+                output_dir=None,
+            )
+            processor = DeviceProcessor(device, [], variable_manager, jsonl_preprocessor)
+            processor._add_jsonl(component)
+
+            # WHEN
+            results.append(processor.normalize(device, component))
+
+        # THEN
+        assert results[0] == results[1]
+        stats = jsonl_preprocessor.cache_stats()
+        assert stats.misses == 1
+        assert stats.hits == 3
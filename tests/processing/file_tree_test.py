@@ -0,0 +1,59 @@
+import os
+from pathlib import Path
+
+from openhasp_config_manager.processing.file_tree import FileTree
+from tests import TestBase
+
+
+class TestFileTree(TestBase):
+    def test_find_files_matches_rglob(self, tmp_path):
+        # GIVEN
+        tree = FileTree(self.cfg_root).scan()
+
+        # WHEN
+        for suffix in [".jsonl", ".cmd", ".png", ".yaml"]:
+            result = [f.path for f in tree.find_files(self.cfg_root, suffix)]
+
+            # THEN
+            assert result == list(self.cfg_root.rglob(f"*{suffix}"))
+
+    def test_directories_are_listed_once(self, tmp_path, monkeypatch):
+        # GIVEN
+        Path(tmp_path, "a", "b").mkdir(parents=True)
+        Path(tmp_path, "a", "b", "c.jsonl").write_text("{}")
+        Path(tmp_path, "a", "d.yaml").write_text("x: 1")
+
+        scanned = []
+        original_scandir = os.scandir
+
+        def _scandir(path):
+            scanned.append(Path(path))
+            return original_scandir(path)
+
+        monkeypatch.setattr(os, "scandir", _scandir)
+        tree = FileTree(tmp_path).scan()
+
+        # WHEN
+        tree.find_files(tmp_path, ".jsonl")
+        tree.find_files(Path(tmp_path, "a"), ".yaml", recursive=False)
+        directories = list(tree.iter_directories(tmp_path))
+
+        # THEN
+        assert sorted(scanned) == sorted(directories)
+        assert len(scanned) == 3
+        file_info = tree.get_file_info(Path(tmp_path, "a", "b", "c.jsonl"))
+        assert file_info.size == 2
+
+    def test_symlinked_directories_are_not_followed(self, tmp_path):
+        # GIVEN
+        Path(tmp_path, "real").mkdir()
+        Path(tmp_path, "real", "a.cmd").write_text("")
+        Path(tmp_path, "link").symlink_to(Path(tmp_path, "real"))
+
+        # WHEN
+        tree = FileTree(tmp_path).scan()
+
+        # THEN
+        assert [f.path for f in tree.find_files(tmp_path, ".cmd")] == list(tmp_path.rglob("*.cmd"))
+        assert sorted(tree.list_directories(tmp_path)) == [Path(tmp_path, "link"), Path(tmp_path, "real")]
+        assert [f.path.name for f in tree.find_files(Path(tmp_path, "link"), ".cmd")] == ["a.cmd"]
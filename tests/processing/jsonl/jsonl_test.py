@@ -0,0 +1,58 @@
+from openhasp_config_manager.processing.jsonl.jsonl import ObjectDimensionsProcessor
+from tests import TestBase
+
+
+class TestObjectDimensionsProcessor(TestBase):
+    def test_percentages_and_numeric_strings(self):
+        # GIVEN
+        underTest = ObjectDimensionsProcessor()
+        ob = {
+            "page": "1",
+            "id": "2.0",
+            "x": "50%",
+            "w": "25%",
+            "y": "10%",
+            "h": "100",
+            "pad_top": "4",
+            "text": "50%",
+            "val": 3,
+        }
+
+        # WHEN
+        result = underTest.process(ob, self.default_config, {})
+
+        # THEN
+        assert result == {
+            "page": 1,
+            "id": 2,
+            "x": 160,
+            "w": 80,
+            "y": 48,
+            "h": 100,
+            "pad_top": 4,
+            "text": "50%",
+            "val": 3,
+        }
+        assert ob["x"] == "50%"
+
+    def test_invalid_numeric_string_is_kept(self):
+        # GIVEN
+        underTest = ObjectDimensionsProcessor()
+
+        # WHEN
+        result = underTest.process({"hidden": "true", "radius": "abc"}, self.default_config, {})
+
+        # THEN
+        assert result == {"hidden": "true", "radius": "abc"}
+
+    def test_process_objects_matches_process(self):
+        # GIVEN
+        underTest = ObjectDimensionsProcessor()
+        objects = [{"page": "1", "id": str(i), "x": f"{i}%", "text": str(i)} for i in range(10)]
+
+        # WHEN
+        result = underTest.process_objects(objects, self.default_config, {})
+
+        # THEN
+        assert result == [ObjectDimensionsProcessor().process(ob, self.default_config, {}) for ob in objects]
+        assert result[5] == {"page": 1, "id": 5, "x": 16, "text": "5"}
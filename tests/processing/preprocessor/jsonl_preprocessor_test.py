@@ -1,5 +1,8 @@
+import pickle
 import textwrap
 
+import pytest
+
 from openhasp_config_manager.processing.preprocessor.jsonl_preprocessor import JsonlPreProcessor
 from tests import TestBase
 
@@ -12,10 +15,10 @@ class TestJsonlPreProcessor(TestBase):
         content = ""
 
         # WHEN
-        result = underTest.cleanup_object_for_json_parsing(content)
+        result = underTest.parse_jsonl_objects(content)
 
         # THEN
-        assert result == ""
+        assert result == []
 
     def test_only_comment(self):
         # GIVEN
@@ -24,10 +27,10 @@ class TestJsonlPreProcessor(TestBase):
         content = "// test"
 
         # WHEN
-        result = underTest.cleanup_object_for_json_parsing(content)
+        result = underTest.parse_jsonl_objects(content)
 
         # THEN
-        assert result == ""
+        assert result == []
 
     def test_comment_before_object(self):
         # GIVEN
@@ -39,10 +42,10 @@ class TestJsonlPreProcessor(TestBase):
         """
 
         # WHEN
-        result = underTest.cleanup_object_for_json_parsing(content)
+        result = underTest.parse_jsonl_objects(content)
 
         # THEN
-        assert result == """{ "x": 0 }"""
+        assert [o.data for o in result] == [{"x": 0}]
 
     def test_comment_after_object(self):
         # GIVEN
@@ -54,10 +57,10 @@ class TestJsonlPreProcessor(TestBase):
         """
 
         # WHEN
-        result = underTest.cleanup_object_for_json_parsing(content)
+        result = underTest.parse_jsonl_objects(content)
 
         # THEN
-        assert result == """{ "x": 0 }"""
+        assert [o.data for o in result] == [{"x": 0}]
 
     def test_comment_between_object(self):
         # GIVEN
@@ -70,16 +73,10 @@ class TestJsonlPreProcessor(TestBase):
         """
 
         # WHEN
-        result = underTest.cleanup_object_for_json_parsing(content)
+        result = underTest.parse_jsonl_objects(content)
 
         # THEN
-        assert (
-            result
-            == textwrap.dedent("""
-        { "x": 0 }
-        { "y": 0 }
-        """).strip()
-        )
+        assert [o.data for o in result] == [{"x": 0}, {"y": 0}]
 
     def test_inline_comment_after_object_param_with_comma_is_stripped(self):
         # GIVEN
@@ -93,18 +90,10 @@ class TestJsonlPreProcessor(TestBase):
         """)
 
         # WHEN
-        result = underTest.cleanup_object_for_json_parsing(content)
+        result = underTest.parse_jsonl_objects(content)
 
         # THEN
-        assert (
-            result
-            == textwrap.dedent("""
-               {
-               "x": 0,
-               "y": 0
-               }
-               """).strip()
-        )
+        assert [o.data for o in result] == [{"x": 0, "y": 0}]
 
     def test_inline_comment_after_object_param_without_comma_is_stripped(self):
         # GIVEN
@@ -118,18 +107,10 @@ class TestJsonlPreProcessor(TestBase):
         """)
 
         # WHEN
-        result = underTest.cleanup_object_for_json_parsing(content)
+        result = underTest.parse_jsonl_objects(content)
 
         # THEN
-        assert (
-            result
-            == textwrap.dedent("""
-               {
-               "x": 0,
-               "y": 0
-               }
-               """).strip()
-        )
+        assert [o.data for o in result] == [{"x": 0, "y": 0}]
 
     def test_trailing_comma_on_last_object_is_stripped(self):
         # GIVEN
@@ -142,29 +123,10 @@ class TestJsonlPreProcessor(TestBase):
         """)
 
         # WHEN
-        result = underTest.cleanup_object_for_json_parsing(content)
+        result = underTest.parse_jsonl_objects(content)
 
         # THEN
-        assert (
-            result
-            == textwrap.dedent("""
-               {
-               "x": 0
-               }
-               """).strip()
-        )
-
-    def test_split_objects_empty_content(self):
-        # GIVEN
-        underTest = JsonlPreProcessor()
-
-        content = ""
-
-        # WHEN
-        result = underTest.split_jsonl_objects(content)
-
-        # THEN
-        assert result == []
+        assert [o.data for o in result] == [{"x": 0}]
 
     def test_split_objects_single_object_with_random_stuff_around_it(self):
         # GIVEN
@@ -181,10 +143,10 @@ class TestJsonlPreProcessor(TestBase):
         """).strip()
 
         # WHEN
-        result = underTest.split_jsonl_objects(content)
+        result = underTest.parse_jsonl_objects(content)
 
         # THEN
-        assert result == ["""{ "x": 0 }"""]
+        assert [o.data for o in result] == [{"x": 0}]
 
     def test_split_objects_multiple_objects_with_random_stuff_around_them(self):
         # GIVEN
@@ -206,13 +168,10 @@ class TestJsonlPreProcessor(TestBase):
         """).strip()
 
         # WHEN
-        result = underTest.split_jsonl_objects(content)
+        result = underTest.parse_jsonl_objects(content)
 
         # THEN
-        assert result == [
-            """{ "x": 0 }""",
-            """{ "y": 1 }""",
-        ]
+        assert [o.data for o in result] == [{"x": 0}, {"y": 1}]
 
     def test_src_is_url(self):
         # GIVEN
@@ -223,12 +182,73 @@ class TestJsonlPreProcessor(TestBase):
         """
 
         # WHEN
-        result = underTest.cleanup_object_for_json_parsing(content)
+        result = underTest.parse_jsonl_objects(content)
 
         # THEN
-        assert (
-            result
-            == textwrap.dedent("""
-        { "x": 0, "url": "https://upload.wikimedia.org/wikipedia/commons/b/bf/Test_card.png" }
-        """).strip()
-        )
+        assert [o.data for o in result] == [
+            {"x": 0, "url": "https://upload.wikimedia.org/wikipedia/commons/b/bf/Test_card.png"}
+        ]
+
+    def test_parse_objects_with_positions(self):
+        # GIVEN
+        underTest = JsonlPreProcessor()
+
+        content = textwrap.dedent("""
+        random text
+        { "x": 0, // comment
+          "url": "https://example.com/a//b", }
+        // { "ignored": 0 }
+          {
+            "y": "escaped \\" // quote",
+            "z": [1, 2,],
+          }
+        random stuff }
+        """)
+
+        # WHEN
+        result = underTest.parse_jsonl_objects(content)
+
+        # THEN
+        assert [o.data for o in result] == [
+            {"x": 0, "url": "https://example.com/a//b"},
+            {"y": 'escaped " // quote', "z": [1, 2]},
+        ]
+        assert [(o.line, o.column) for o in result] == [(3, 1), (6, 3)]
+
+    def test_parse_objects_is_cached_by_content(self):
+        # GIVEN
+        underTest = JsonlPreProcessor()
+        content = """{ "x": 0 }"""
+
+        # WHEN
+        first = underTest.parse_jsonl_objects(content)
+        second = underTest.parse_jsonl_objects("".join([content]))
+
+        # THEN
+        assert second is first
+
+    def test_parsed_objects_are_read_only(self):
+        # GIVEN
+        underTest = JsonlPreProcessor()
+        parsed = underTest.parse_jsonl_objects("""{ "x": 0 }""")
+
+        # WHEN
+        with pytest.raises(TypeError):
+            parsed[0].data["x"] = 1
+
+        # THEN
+        assert underTest.parse_jsonl_objects("""{ "x": 0 }""")[0].data == {"x": 0}
+        assert pickle.loads(pickle.dumps(parsed)) == parsed
+
+    def test_parse_objects_reports_position_of_invalid_object(self):
+        # GIVEN
+        underTest = JsonlPreProcessor()
+
+        content = textwrap.dedent("""
+        { "x": 0 }
+          { "y": }
+        """)
+
+        # WHEN
+        with pytest.raises(ValueError, match="line 3, column 3"):
+            underTest.parse_jsonl_objects(content)
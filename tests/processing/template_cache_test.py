@@ -0,0 +1,95 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+from openhasp_config_manager.processing.template_cache import CacheStats, LruCache
+from tests import TestBase
+
+
+class TestLruCache(TestBase):
+    def test_evicts_least_recently_used_entry(self):
+        # GIVEN
+        cache = LruCache(capacity=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+
+        # WHEN
+        cache.get("a")
+        cache.put("c", 3)
+
+        # THEN
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+
+    def test_stats(self):
+        # GIVEN
+        cache = LruCache(capacity=1)
+
+        # WHEN
+        cache.get("a")
+        cache.put("a", 1)
+        cache.get("a")
+        cache.put("b", 2)
+
+        # THEN
+        assert cache.stats() == CacheStats(hits=1, misses=1, evictions=1, size=1, capacity=1)
+
+    def test_resize(self):
+        # GIVEN
+        cache = LruCache(capacity=3)
+        for key in ["a", "b", "c"]:
+            cache.put(key, key)
+
+        # WHEN
+        cache.resize(1)
+
+        # THEN
+        assert cache.get("c") == "c"
+        assert len(cache) == 1
+        assert cache.stats().evictions == 2
+
+    def test_concurrent_access(self):
+        # GIVEN
+        cache = LruCache(capacity=8)
+
+        def use_cache(offset: int):
+            for i in range(2000):
+                key = (offset + i) % 16
+                if cache.get(key) is None:
+                    cache.put(key, key)
+
+        # WHEN
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(use_cache, range(4)))
+
+        # THEN
+        stats = cache.stats()
+        assert stats.hits + stats.misses == 4 * 2000
+        assert len(cache) == 8
+
+    def test_pickle(self):
+        # GIVEN
+        cache = LruCache(capacity=2)
+        cache.put("a", 1)
+
+        # WHEN
+        result = pickle.loads(pickle.dumps(cache))
+
+        # THEN
+        assert result.get("a") == 1
+        result.put("b", 2)
+        assert len(result) == 2
+
+
+class TestCacheStats(TestBase):
+    def test_add_sums_counters_and_keeps_largest_size(self):
+        # GIVEN
+        a = CacheStats(hits=1, misses=2, evictions=3, size=4, capacity=10)
+        b = CacheStats(hits=10, misses=20, evictions=30, size=7, capacity=10)
+
+        # WHEN
+        result = a + b
+
+        # THEN
+        assert result == CacheStats(hits=11, misses=22, evictions=33, size=7, capacity=10)
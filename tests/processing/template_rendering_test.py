@@ -1,7 +1,31 @@
-from openhasp_config_manager.processing.template_rendering import render_dict_recursive
+import os
+from pathlib import Path
+
+from openhasp_config_manager.processing.template_cache import TemplateCacheConfig
+from openhasp_config_manager.processing.template_rendering import (
+    _render_template,
+    configure_template_cache,
+    is_template,
+    render_dict_recursive,
+)
+from openhasp_config_manager.processing.variable_scope import VariableScope
 from tests import TestBase
 
 
+class RecordingDict(dict):
+    """
+    Records the keys whose values have been read.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_keys = []
+
+    def __getitem__(self, key):
+        self.read_keys.append(key)
+        return super().__getitem__(key)
+
+
 class TestTemplateRendering(TestBase):
     def test_render_dict_recursively__template_rendering_works(self):
         # GIVEN
@@ -83,3 +107,173 @@ class TestTemplateRendering(TestBase):
         assert result == {
             "key": ["value"],
         }
+
+    def test_render_dict_recursively__renders_in_dependency_order(self, monkeypatch):
+        # GIVEN
+        from openhasp_config_manager.processing import template_rendering
+
+        # each value references the next one, so a single pass in input order would only render the last one
+        input_data = {f"V{i}": f"{{{{ V{i + 1} }}}}" for i in range(20)}
+        input_data["V20"] = "end"
+
+        rendered_templates = []
+        original_render_template = template_rendering._render_template
+
+        def _render_template(content, template_vars):
+            rendered_templates.append(content)
+            return original_render_template(content, template_vars)
+
+        monkeypatch.setattr(template_rendering, "_render_template", _render_template)
+
+        # WHEN
+        result = render_dict_recursive(input=input_data, template_vars={})
+
+        # THEN
+        assert result == {f"V{i}": "end" for i in range(21)}
+        # each template is rendered exactly once, the literal value is not rendered at all
+        assert len(rendered_templates) == 20
+
+    def test_render_dict_recursively__nested_references(self):
+        # GIVEN
+        input_data = {
+            "p1b1": {"x": "{{ p1b2.x | int + 5 }}", "text": "{{ p1b2.text }}!"},
+            "p1b2": {"x": "{{ p1b3.x }}", "text": "B"},
+            "p1b3": {"x": 10},
+        }
+
+        # WHEN
+        result = render_dict_recursive(input=input_data, template_vars={})
+
+        # THEN
+        assert result == {
+            "p1b1": {"x": "15", "text": "B!"},
+            "p1b2": {"x": "10", "text": "B"},
+            "p1b3": {"x": 10},
+        }
+
+    def test_render_dict_recursively__templated_key_reference(self):
+        # GIVEN
+        input_data = {
+            "A": "{{ p1b2.text }}",
+            "p{{ page }}b2": {"text": "B"},
+        }
+        template_vars = {"page": 1}
+
+        # WHEN
+        result = render_dict_recursive(input=input_data, template_vars=template_vars)
+
+        # THEN
+        assert result == {"A": "B", "p1b2": {"text": "B"}}
+
+    def test_render_dict_recursively__inner_template_key(self):
+        # GIVEN
+        input_data = {
+            "{{ {{ B }}{{ C }} }}": "value",
+            "B": "x",
+            "C": "y",
+            "xy": "key",
+        }
+
+        # WHEN
+        result = render_dict_recursive(input=input_data, template_vars={})
+
+        # THEN
+        assert result == {"key": "value", "B": "x", "C": "y", "xy": "key"}
+
+    def test_render_dict_recursively__undefined_key_is_reported(self, capsys):
+        # GIVEN
+        input_data = {
+            "{{ missing }}": "value",
+            "A": {"{{ gone }}": 1},
+            "B": "b",
+        }
+
+        # WHEN
+        result = render_dict_recursive(input=input_data, template_vars={})
+
+        # THEN
+        assert result == {"A": {}, "B": "b"}
+        output = capsys.readouterr().out
+        assert "Unable to render templates: ['{{ missing }}', 'A.{{ gone }}']" in output
+        assert "Cyclic template references" not in output
+
+    def test_render_dict_recursively__cycle(self, capsys):
+        # GIVEN
+        input_data = {
+            "A": "{{ B }}",
+            "B": "{{ A }}",
+            "C": "c",
+        }
+
+        # WHEN
+        result = render_dict_recursive(input=input_data, template_vars={})
+
+        # THEN
+        assert result == {"C": "c"}
+        assert "Cyclic template references: A -> B -> A" in capsys.readouterr().out
+
+    def test_render_template__persisted_template_cache(self, tmp_path):
+        # GIVEN
+        cache_dir = Path(tmp_path, "templates")
+        configure_template_cache(TemplateCacheConfig(directory=cache_dir))
+
+        # WHEN
+        try:
+            result = _render_template("{{ value }} persisted", {"value": "is"})
+        finally:
+            configure_template_cache(TemplateCacheConfig())
+
+        # THEN
+        assert result == "is persisted"
+        assert len(list(cache_dir.iterdir())) == 1
+
+    def test_render_template__persisted_template_cache_is_pruned(self, tmp_path):
+        # GIVEN
+        cache_dir = Path(tmp_path, "templates")
+        configure_template_cache(TemplateCacheConfig(directory=cache_dir))
+        try:
+            for i in range(5):
+                _render_template(f"{{{{ value }}}} pruned {i}", {"value": "is"})
+        finally:
+            configure_template_cache(TemplateCacheConfig())
+        files = sorted(cache_dir.iterdir())
+        for i, file in enumerate(files):
+            os.utime(file, (i, i))
+
+        # WHEN
+        configure_template_cache(TemplateCacheConfig(capacity=2, directory=cache_dir))
+        configure_template_cache(TemplateCacheConfig())
+
+        # THEN
+        assert sorted(cache_dir.iterdir()) == files[3:]
+
+    def test_render_template__scope_only_reads_referenced_variables(self):
+        # GIVEN
+        layer = RecordingDict({f"p1b{i}": {"text": f"Button {i}"} for i in range(100)})
+        scope = VariableScope(layer, {"value": 5})
+
+        # WHEN
+        result = _render_template("{{ p1b7.text }}: {{ value * 2 }} {{ unknown }}", scope)
+
+        # THEN
+        assert result == "Button 7: 10 {{ unknown }}"
+        assert set(layer.read_keys) == {"p1b7"}
+
+    def test_render_template__literals_render_like_jinja(self):
+        # GIVEN
+        import jinja2
+
+        j2_env = jinja2.Environment(undefined=jinja2.DebugUndefined)
+        contents = ["plain text", "#FFFFFF", "L:/icon.png", "50%", "", "multi\nline", "trailing\n", "crlf\r\n"]
+
+        for content in contents:
+            # WHEN
+            result = _render_template(content, {})
+
+            # THEN
+            assert result == j2_env.from_string(content).render()
+
+        assert is_template("{{ a }}")
+        assert is_template("{% if a %}b{% endif %}")
+        assert is_template("trailing\n")
+        assert not is_template("plain text")
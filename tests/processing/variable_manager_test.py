@@ -111,3 +111,16 @@ class TestVariableManager(TestBase):
             "key_vars2": "value_vars2",
             "key_also_present_in_device_vars": "test_device_value",
         }
+
+    def test_get_var_files(self, tmp_path):
+        # GIVEN
+        variable_manager = VariableManager(self.cfg_root)
+        variable_manager.read()
+        tested_component_path = Path(self.cfg_root, "devices", "test_device", "home", "page.jsonl")
+
+        # WHEN
+        result = variable_manager.get_var_files(tested_component_path)
+
+        # THEN
+        assert list(map(lambda x: x.name, result))[0] == "global.vars.yaml"
+        assert set(map(lambda x: x.name, result)) == {"global.vars.yaml", "vars.yaml", "vars2.yaml"}
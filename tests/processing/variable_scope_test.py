@@ -0,0 +1,94 @@
+import pytest
+
+from openhasp_config_manager.processing.variable_scope import VariableScope
+from openhasp_config_manager.util import merge_dict_recursive
+from tests import TestBase
+
+
+class TestVariableScope(TestBase):
+    def test_lookup_matches_merge_dict_recursive(self, tmp_path):
+        # GIVEN
+        d1 = {"A": {"B": {"C": "D", "D": "E"}}, "X": 1}
+        d2 = {"A": {"B": {"D": "F"}, "G": "H"}, "Y": 2}
+
+        # WHEN
+        scope = VariableScope(d1, d2)
+
+        # THEN
+        assert scope == merge_dict_recursive(d1, d2)
+        assert scope["A"]["B"]["D"] == "F"
+        assert scope.to_dict() == merge_dict_recursive(d1, d2)
+        assert list(scope.keys()) == ["A", "X", "Y"]
+
+    def test_write_does_not_modify_layers(self, tmp_path):
+        # GIVEN
+        d1 = {"A": {"B": "C"}}
+        d2 = {"A": {"D": "E"}}
+        scope = VariableScope(d1, d2)
+
+        # WHEN
+        scope["A"]["B"] = "X"
+        scope["Z"] = {"only": "this"}
+
+        # THEN
+        assert scope.to_dict() == {"A": {"B": "X", "D": "E"}, "Z": {"only": "this"}}
+        assert d1 == {"A": {"B": "C"}}
+        assert d2 == {"A": {"D": "E"}}
+
+    def test_written_dict_replaces_lower_values(self, tmp_path):
+        # GIVEN
+        scope = VariableScope({"A": {"B": "C", "D": "E"}})
+
+        # WHEN
+        scope["A"] = {"B": "X"}
+
+        # THEN
+        assert scope["A"] == {"B": "X"}
+
+    def test_delete_hides_lower_values(self, tmp_path):
+        # GIVEN
+        layer = {"A": {"B": "C", "D": "E"}}
+        scope = VariableScope(layer)
+
+        # WHEN
+        scope["A"].pop("B")
+
+        # THEN
+        assert "B" not in scope["A"]
+        assert scope.to_dict() == {"A": {"D": "E"}}
+        assert layer == {"A": {"B": "C", "D": "E"}}
+
+    def test_nested_scope_sees_writes_of_its_layers(self, tmp_path):
+        # GIVEN
+        base = VariableScope({"A": {"B": "C"}})
+        base["A"]["D"] = "E"
+
+        # WHEN
+        scope = VariableScope(base, {"A": {"F": "G"}})
+
+        # THEN
+        assert scope.to_dict() == {"A": {"B": "C", "D": "E", "F": "G"}}
+
+    def test_incompatible_layers(self, tmp_path):
+        # GIVEN
+        scope = VariableScope({"A": {"B": "C"}}, {"A": "D"})
+
+        # WHEN
+        with pytest.raises(AssertionError):
+            _ = scope["A"]
+
+    def test_layers_of_nested_scopes_are_deduplicated(self, tmp_path):
+        # GIVEN
+        global_vars = {"A": {"B": "C"}, "X": 1}
+        scope = VariableScope()
+        expected = {}
+
+        # WHEN
+        for i in range(10):
+            layer = {"A": {f"D{i}": i}}
+            scope = VariableScope(layer, scope, global_vars)
+            expected = merge_dict_recursive(merge_dict_recursive(layer, expected), global_vars)
+
+        # THEN
+        assert scope.to_dict() == expected
+        assert [id(layer) for layer in scope._layers].count(id(global_vars)) == 1
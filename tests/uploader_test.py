@@ -0,0 +1,308 @@
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from openhasp_config_manager import util
+from openhasp_config_manager.manager import ConfigManager
+from openhasp_config_manager.processing.variables import VariableManager
+from openhasp_config_manager.uploader import ConfigUploader
+from tests import TestBase
+
+
+class FakeOpenHaspClient:
+    def __init__(self, files: Dict[str, bytes] = None):
+        self.files = dict(files or {})
+        self.uploaded: List[str] = []
+        self.deleted: List[str] = []
+        self.downloaded: List[str] = []
+        self.upload_failures: Dict[str, int] = {}
+        self.config: Dict[str, Any] = {}
+        self.config_writes: List[str] = []
+
+    def get_files(self) -> List[str]:
+        return list(self.files)
+
+    def get_file_sizes(self) -> Dict[str, int]:
+        return {name: len(content) for name, content in self.files.items()}
+
+    def get_file_content(self, file_name: str) -> bytes:
+        self.downloaded.append(file_name)
+        return self.files[file_name]
+
+    def upload_file(self, file_name: str, content: bytes):
+        if self.upload_failures.get(file_name, 0) > 0:
+            self.upload_failures[file_name] -= 1
+            raise ConnectionError("timeout")
+        self.uploaded.append(file_name)
+        self.files[file_name] = content
+
+    def upload_file_from_path(self, file_name: str, path: Path):
+        self.upload_file(file_name, path.read_bytes())
+
+    def delete_file(self, file_name: str):
+        self.deleted.append(file_name)
+        self.files.pop(file_name)
+
+    def get_mqtt_config(self):
+        return self.config.get("mqtt", None)
+
+    def set_mqtt_config(self, config):
+        self._set_config("mqtt", config)
+
+    def get_http_config(self):
+        return self.config.get("http", None)
+
+    def set_http_config(self, config):
+        self._set_config("http", config)
+
+    def get_gui_config(self):
+        return self.config.get("gui", None)
+
+    def set_gui_config(self, config):
+        self._set_config("gui", config)
+
+    def _set_config(self, section: str, config):
+        self.config_writes.append(section)
+        self.config[section] = config
+
+
+class TestConfigUploader(TestBase):
+    def test_upload_skips_unchanged_files(self, tmp_path):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient()
+        uploader = ConfigUploader(tmp_path, client)
+        uploader.upload(device)
+        client.uploaded.clear()
+
+        # WHEN
+        changed = uploader.upload(device)
+
+        # THEN
+        assert changed is False
+        assert client.uploaded == []
+        assert list(Path(tmp_path, ".cache").rglob("*.md5")) == []
+
+    def test_upload_migrates_legacy_checksum_files(self, tmp_path):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient()
+        uploader = ConfigUploader(tmp_path, client)
+        uploader.upload(device)
+        client.uploaded.clear()
+
+        # the upload state as written by previous versions
+        cache_dir = Path(tmp_path, ".cache", device.output_dir.name)
+        upload_state_file = Path(cache_dir, "uploaded.json")
+        upload_state_file.unlink()
+        for file_name, content in client.files.items():
+            Path(cache_dir, file_name + ".md5").write_text(util.calculate_checksum(content))
+
+        # WHEN
+        changed = uploader.upload(device)
+
+        # THEN
+        assert changed is False
+        assert client.uploaded == []
+        assert upload_state_file.is_file()
+        assert list(Path(tmp_path, ".cache").rglob("*.md5")) == []
+
+    def test_upload_uses_manifest_instead_of_reading_output_directory(self, tmp_path, monkeypatch):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient()
+        uploader = ConfigUploader(tmp_path, client)
+        expected_files = sorted(f.name for f in device.output_dir.iterdir() if f.stat().st_size > 0)
+
+        def _iterdir(self):
+            raise AssertionError(f"Unexpected listing of {self}")
+
+        monkeypatch.setattr(Path, "iterdir", _iterdir)
+
+        # WHEN
+        uploader.upload(device)
+
+        # THEN
+        assert sorted(client.uploaded) == expected_files
+        assert "home_page.jsonl" in client.uploaded
+
+    def test_upload_reuploads_file_changed_on_device(self, tmp_path):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient()
+        uploader = ConfigUploader(tmp_path, client)
+        uploader.upload(device)
+        client.uploaded.clear()
+        client.files["home_page.jsonl"] = b"{}"
+
+        # WHEN
+        changed = uploader.upload(device)
+
+        # THEN
+        assert changed is True
+        assert client.uploaded == ["home_page.jsonl"]
+
+    def test_trust_cache_skips_download_of_unchanged_files(self, tmp_path):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient()
+        uploader = ConfigUploader(tmp_path, client)
+        uploader.upload(device)
+        client.uploaded.clear()
+
+        # WHEN
+        changed = uploader.upload(device, trust_cache=True)
+
+        # THEN
+        assert changed is False
+        assert client.downloaded == []
+        assert client.uploaded == []
+
+    def test_trust_cache_verifies_files_whose_size_differs(self, tmp_path):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient()
+        uploader = ConfigUploader(tmp_path, client)
+        uploader.upload(device)
+        client.uploaded.clear()
+        client.files["home_page.jsonl"] = b"{}"
+
+        # WHEN
+        changed = uploader.upload(device, trust_cache=True)
+
+        # THEN
+        assert changed is True
+        assert client.downloaded == ["home_page.jsonl"]
+        assert client.uploaded == ["home_page.jsonl"]
+
+    def test_trust_cache_verifies_sample_of_unchanged_files(self, tmp_path):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient()
+        uploader = ConfigUploader(tmp_path, client)
+        uploader.upload(device)
+        client.uploaded.clear()
+
+        # WHEN
+        changed = uploader.upload(device, trust_cache=True, verify_sample=2)
+
+        # THEN
+        assert changed is False
+        assert len(client.downloaded) == 2
+        assert client.uploaded == []
+
+    def test_failed_upload_keeps_state_of_uploaded_files(self, tmp_path):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient()
+        client.upload_failures = {"home_image_50x50.png": 1}
+        uploader = ConfigUploader(tmp_path, client)
+
+        # WHEN
+        with pytest.raises(Exception, match="home_image_50x50.png"):
+            uploader.upload(device)
+        client.uploaded.clear()
+        uploader.upload(device)
+
+        # THEN
+        assert client.uploaded == ["home_image_50x50.png"]
+        assert client.files["home_image_50x50.png"] == Path(device.output_dir, "home_image_50x50.png").read_bytes()
+
+    def test_cleanup_deletes_files_missing_from_manifest(self, tmp_path):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient({"config.json": b"{}", "home_page.jsonl": b"{}", "old_page.jsonl": b"{}"})
+        uploader = ConfigUploader(tmp_path, client)
+
+        # WHEN
+        changed = uploader.cleanup_device(device)
+
+        # THEN
+        assert changed is True
+        assert client.deleted == ["old_page.jsonl"]
+
+    def test_upload_sends_text_files_before_binaries_ordered_by_size(self, tmp_path):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient()
+        uploader = ConfigUploader(tmp_path, client)
+
+        # WHEN
+        uploader.upload(device)
+
+        # THEN
+        sizes = {name: len(content) for name, content in client.files.items()}
+        text_files = [name for name in client.uploaded if name.endswith(".jsonl")]
+        assert client.uploaded[-1] == "home_image_50x50.png"
+        assert text_files == sorted(text_files, key=lambda name: sizes[name])
+
+    def test_upload_writes_only_changed_config_sections(self, tmp_path):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient()
+        client.config = {"mqtt": device.config.mqtt, "gui": device.config.gui}
+        uploader = ConfigUploader(tmp_path, client)
+
+        # WHEN
+        plan = uploader.plan(device)
+        changed = uploader.execute(device, plan)
+
+        # THEN
+        assert list(plan.config_changes) == ["http"]
+        assert client.config_writes == ["http"]
+        assert changed is True
+
+    def test_dry_run_does_not_change_device(self, tmp_path):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient({"old_page.jsonl": b"{}"})
+        uploader = ConfigUploader(tmp_path, client)
+
+        # WHEN
+        changed = uploader.upload(device, purge=True, dry_run=True)
+
+        # THEN
+        assert changed is False
+        assert client.uploaded == []
+        assert client.deleted == []
+        assert client.config_writes == []
+
+    def test_plan_contains_all_changes(self, tmp_path):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient({"old_page.jsonl": b"{}"})
+        uploader = ConfigUploader(tmp_path, client)
+
+        # WHEN
+        plan = uploader.plan(device, purge=True)
+
+        # THEN
+        assert plan.deletions == ["old_page.jsonl"]
+        assert sorted(upload.name for upload in plan.uploads) == sorted(
+            f.name for f in device.output_dir.iterdir() if f.stat().st_size > 0
+        )
+        assert plan.upload_size == sum(upload.entry.size for upload in plan.uploads)
+        assert list(plan.config_changes) == ["mqtt", "http", "gui"]
+
+    def test_plan_keeps_device_content_of_text_files_only(self, tmp_path):
+        # GIVEN
+        device = self._generate(tmp_path)
+        client = FakeOpenHaspClient({"home_page.jsonl": b"{}", "home_image_50x50.png": b"outdated"})
+        uploader = ConfigUploader(tmp_path, client)
+
+        # WHEN
+        plan = uploader.plan(device)
+
+        # THEN
+        uploads = {upload.name: upload for upload in plan.uploads}
+        assert uploads["home_page.jsonl"].device_content == b"{}"
+        assert uploads["home_image_50x50.png"].device_content is None
+        assert uploads["home_image_50x50.png"].device_checksum == util.calculate_checksum(b"outdated")
+
+    def _generate(self, output_root: Path):
+        variable_manager = VariableManager(self.cfg_root)
+        manager = ConfigManager(self.cfg_root, output_root, variable_manager)
+        device = next(d for d in manager.analyze() if d.name == "test_device")
+        manager.process(device)
+        return device